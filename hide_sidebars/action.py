@@ -1,152 +1,288 @@
 #!/usr/bin/env python3
 """A module that stores the actions"""
 
-import json
+import copy
+import asyncio
 import logging
 from pathlib import Path
-from dataclasses import dataclass
-from typing import Dict, Optional
-
-import websocket
+from typing import TYPE_CHECKING, Callable, Dict, Iterator, List, Optional
+
+from hide_sidebars.lazy import lazy_import
+from hide_sidebars.build import build_js
+from hide_sidebars.class_names import apply
+from hide_sidebars.log_utils import Abbreviated
+from hide_sidebars.connection import ConnectionPool, AsyncConnectionPool, Dispatcher, send_command_sync
+from hide_sidebars.timing import SPANS
+
+if TYPE_CHECKING:
+    import websocket
+    import websockets
+else:
+    websocket = lazy_import("websocket")
+    websockets = lazy_import("websockets")
 
 logger = logging.getLogger(__name__)
 
 JS_DIR_PATH = Path(__file__).resolve().parent.parent / "js"
 JS_NAMES = {
-    "init": "init.min.js",
+    "init": "init.js",
 }
+# Where the payload scripts say they come from, so that profiles can tell them apart
+SOURCE_URL_ROOT = "discord-hide-sidebar:///"
 
 
 class Action:
     """One action object
 
     Class variables:
-        SOCKET_URL_KEY [str]: Key name for socket URL
+        SOCKET_URL_KEY  [str]           : Key name for socket URL
+        TITLE_BLACKLIST [FrozenSet[str]]: Lowercase titles of windows never to inject into
 
     Properties:
-        name    [str]         : Name of action
-        js_path [pathlib.Path]: Path of JavaScript file
-        payload [str]         : JSON payload
+        name       [str]           : Name of action
+        js_path    [pathlib.Path]  : Path of JavaScript file
+        source_url [str]           : URL of the script the payload runs as
+        built_js   [str]           : Minified JavaScript, as built
+        js         [str]           : Minified JavaScript, with live class names if resolved and the source URL
+        resolved   [Dict[str, str]]: Live class name by hashed class name, once resolved
+        params     [Dict]          : `Runtime.evaluate` parameters
     """
 
     SOCKET_URL_KEY = "webSocketDebuggerUrl"
-    TITLE_BLACKLIST = [
+    TITLE_BLACKLIST = frozenset([
         "discord updater",
         "",
         "index.html",
-    ]
+    ])
 
     def __init__(self, name: str) -> None:
         log = f"[{type(self).__name__}.__init__]"
         self.name = name
         self.js_path = JS_DIR_PATH / JS_NAMES[name]
-        self.payload = self.get_js_payload()
-        logger.debug(f"{log} Initialized: {self.__dict__}")
+        self.source_url = SOURCE_URL_ROOT + JS_NAMES[name]
+        self.built_js = ""
+        self.js = ""
+        self.resolved: Dict[str, str] = {}
+        self.params = self.get_js_params()
+        logger.debug("%s Initialized: %s", log, Abbreviated(dict(self.__dict__)))
 
-    def get_js_payload(self) -> str:
-        """Get JS and generate JSON
+    def get_js_params(self) -> Dict:
+        """Get minified JS and generate `Runtime.evaluate` parameters
 
         Returns:
-            [str]: JSON payload for the JavaScript
+            [Dict]: `Runtime.evaluate` parameters for the JavaScript
         """
-        log = f"[{type(self).__name__}.get_js_payload]"
+        log = f"[{type(self).__name__}.get_js_params]"
         # Test JavaScript path validity
         if not self.js_path.is_file():
-            logger.critical(f"{log} \"{self.js_path}\" is not a file")
+            logger.critical("%s \"%s\" is not a file", log, self.js_path)
             raise FileNotFoundError(f"\"{self.js_path}\" is not a file!")
-        # Read JavaScript
-        with self.js_path.open("r") as file_obj:
-            js = file_obj.read().strip()
+        # Build JavaScript
+        self.built_js = build_js(self.js_path).strip()
+        self.js = self.with_source_url(self.built_js)
         # Assemble data
-        payload = self.gen_payload(js)
-        return payload
+        params = self.gen_params(self.js)
+        logger.debug("%s Parameters: %s", log, Abbreviated(params))
+        return params
 
-    def gen_payload(self, js: str) -> str:
-        """Generate payload JSON from JavaScript
+    def with_source_url(self, js: str) -> str:
+        """Name the script JavaScript runs as, however it is run
 
         Args:
             js [str]: JavaScript string
 
         Returns:
-            [str]: JSON payload
-        """
-        log = f"[{type(self).__name__}.gen_payload]"
-        data = {
-            "id": 1,
-            "method": "Runtime.evaluate",
-            "params": {
-                "expression": js,
-                "objectGroup": "discordHideSidebar",
-                "userGesture": True,
-            },
+            [str]: The JavaScript with a `sourceURL` comment
+        """
+        return f"{js}\n//# sourceURL={self.source_url}"
+
+    def gen_params(self, js: str) -> Dict:
+        """Generate `Runtime.evaluate` parameters from JavaScript
+
+        Args:
+            js [str]: JavaScript string
+
+        Returns:
+            [Dict]: `Runtime.evaluate` parameters
+        """
+        return {
+            "expression": js,
+            "objectGroup": "discordHideSidebar",
+            "userGesture": True,
         }
-        data_json = json.dumps(data)
-        logger.debug(f"{log} Payload: {data_json}")
-        return data_json
+
+    def use_class_names(self, resolved: Dict[str, str]) -> None:
+        """Substitute live class names into the JavaScript
+
+        Args:
+            resolved [Dict[str, str]]: Live class name by hashed class name
+        """
+        self.resolved = resolved
+        self.js = self.with_source_url(apply(self.built_js, resolved))
+        self.params = self.gen_params(self.js)
+
+    def reload(self) -> None:
+        """Rebuild the JavaScript from its source, keeping the live class
+        names in use
+
+        Raises:
+            [OSError]    : The source cannot be read
+            [SyntaxError]: The source cannot be minified
+        """
+        self.built_js = build_js(self.js_path).strip()
+        self.use_class_names(self.resolved)
 
     def run(self) -> None:
         log = f"[{type(self).__name__}.run]"
-        logger.critical(f"{log} Unimplemented `run`")
+        logger.critical("%s Unimplemented `run`", log)
         raise NotImplementedError(
             f"Class `{type(self).__name__}` does not have `run` method!"
         )
 
-    def ws_req_and_res(self, window: Dict[str, str]) -> int:
+    async def run_async(self) -> None:
+        log = f"[{type(self).__name__}.run_async]"
+        logger.critical("%s Unimplemented `run_async`", log)
+        raise NotImplementedError(
+            f"Class `{type(self).__name__}` does not have `run_async` method!"
+        )
+
+    def ws_req_and_res(self, window: Dict[str, str], pool: ConnectionPool) -> int:
         """Send request to WebSocket and check success
 
         Args:
             window [Dict[str, str]]: Window info
+            pool   [ConnectionPool]: Pool of connections to the windows
 
         Returns:
             [int]: Error codes: 0 is successful, 1 is error, -1 is unknown
         """
         log = f"[{type(self).__name__}.ws_req_and_res]"
-        logger.debug(f'{log} Title: \"{window["title"]}\"')
+        logger.debug("%s Title: \"%s\"", log, window["title"])
         if window["title"].lower() in self.TITLE_BLACKLIST:
-            logger.debug(f"{log} Title in lacklist (1)")
+            logger.debug("%s Title in lacklist (1)", log)
             return 1
         socket_url = window[self.SOCKET_URL_KEY]
-        ws = self.ws_req(socket_url)
+        ws = pool.get(socket_url)
         if ws is None:
-            logger.debug(f"{log} No response from WebSocket (1)")
+            logger.debug("%s No response from WebSocket (1)", log)
             return 1
-        ws.send(self.payload)
-        response: Optional[str] = ws.recv()
+        try:
+            with SPANS.span("evaluate", action=self.name, url=socket_url):
+                response = send_command_sync(ws, "Runtime.evaluate", self.params)
+        except (OSError, websocket.WebSocketException) as err:
+            # Possibly the window is closed mid-request
+            logger.warning("%s WebSocket to \"%s\" failed %s", log, socket_url, err)
+            pool.evict(socket_url)
+            return -1
         err_code = self.parse_ws_response(response, window)
         return err_code
 
-    def ws_req(self, url: str) -> Optional[websocket.WebSocket]:
-        """Establish WebSocket to URL, with proper error handling
+    async def ws_req_and_res_async(
+        self,
+        window: Dict[str, str],
+        pool: AsyncConnectionPool,
+        script_ids: Optional[Dict[str, str]] = None
+    ) -> int:
+        """Send request to WebSocket and check success, without blocking
+        other targets
 
         Args:
-            url [str]: URL to WebSocket
+            window     [Dict[str, str]]          : Window info
+            pool       [AsyncConnectionPool]     : Pool of connections to the windows
+            script_ids [Optional[Dict[str, str]]]: Compiled script IDs by action and socket URL; evaluate if `None`
 
         Returns:
-            [Optional[websocket.WebSocket]]: WebSocket connection, if any
+            [int]: Error codes: 0 is successful, 1 is error, -1 is unknown
         """
-        log = f"[{type(self).__name__}.ws_req]"
+        log = f"[{type(self).__name__}.ws_req_and_res_async]"
+        logger.debug("%s Title: \"%s\"", log, window["title"])
+        if window["title"].lower() in self.TITLE_BLACKLIST:
+            logger.debug("%s Title in blacklist (1)", log)
+            return 1
+        socket_url = window[self.SOCKET_URL_KEY]
+        dispatcher = await pool.get(socket_url)
+        if dispatcher is None:
+            logger.debug("%s No response from WebSocket (1)", log)
+            return 1
         try:
-            ws = websocket.create_connection(url)
-        except ConnectionRefusedError as err:
-            # Possibly the program has exited
-            logger.warn(f"{log} WebSocket to \"{url}\" refused {err}")
-            return
-        except ConnectionResetError as err:
-            # Possibly the program has crashed
-            logger.warn(f"{log} WebSocket to \"{url}\" reset {err}")
-            return
-        except websocket.WebSocketBadStatusException as err:
-            # Possibly the window is changed
-            logger.warn(f"{log} WebSocket to \"{url}\" bad status {err}")
-            return
-        logger.info(f"{log} WebSocket to \"{url}\" successful")
-        return ws
-
-    def parse_ws_response(self, response: Optional[str], window: Dict[str, str]) -> int:
+            if script_ids is None:
+                with SPANS.span("evaluate", action=self.name, url=socket_url):
+                    response = await dispatcher.send("Runtime.evaluate", self.params)
+            else:
+                response = await self.compile_and_run(dispatcher, socket_url, script_ids)
+        except (OSError, websockets.ConnectionClosed) as err:
+            # Possibly the window is closed mid-request
+            logger.warning("%s WebSocket to \"%s\" failed %s", log, socket_url, err)
+            await pool.evict(socket_url)
+            return -1
+        err_code = self.parse_ws_response(response, window)
+        return err_code
+
+    async def compile_and_run(
+        self,
+        dispatcher: Dispatcher,
+        socket_url: str,
+        script_ids: Dict[str, str]
+    ) -> Dict:
+        """Run the script compiled in the target's execution context,
+        compiling it first if it is not cached
+
+        Args:
+            dispatcher [Dispatcher]    : Connection to the target
+            socket_url [str]           : Socket URL of the target
+            script_ids [Dict[str, str]]: Compiled script IDs by action and socket URL
+
+        Returns:
+            [Dict]: Response of running the script, or of a failed compilation
+        """
+        log = f"[{type(self).__name__}.compile_and_run]"
+        # Several actions may share a target
+        key = f"{self.name} {socket_url}"
+        script_id = script_ids.get(key)
+        if script_id is not None:
+            response = await self.run_script(dispatcher, script_id)
+            if "error" not in response:
+                logger.debug("%s Cached script %s run", log, script_id)
+                return response
+            # Execution context is gone, e.g. the page has reloaded
+            logger.info("%s Cached script %s expired", log, script_id)
+            del script_ids[key]
+        with SPANS.span("compile", action=self.name, url=socket_url):
+            response = await dispatcher.send("Runtime.compileScript", {
+                "expression": self.js,
+                "sourceURL": self.source_url,
+                "persistScript": True,
+            })
+        result: Dict = response.get("result", {})
+        if "scriptId" not in result:
+            # Compilation failed; let the caller report it
+            return response
+        script_id = result["scriptId"]
+        script_ids[key] = script_id
+        logger.debug("%s Script compiled as %s", log, script_id)
+        return await self.run_script(dispatcher, script_id)
+
+    async def run_script(self, dispatcher: Dispatcher, script_id: str) -> Dict:
+        """Run a compiled script
+
+        Args:
+            dispatcher [Dispatcher]: Connection to the target
+            script_id  [str]       : ID of the compiled script
+
+        Returns:
+            [Dict]: The response
+        """
+        with SPANS.span("evaluate", action=self.name, url=dispatcher.url):
+            return await dispatcher.send("Runtime.runScript", {
+                "scriptId": script_id,
+                "objectGroup": "discordHideSidebar",
+            })
+
+    def parse_ws_response(self, response: Optional[Dict], window: Dict[str, str]) -> int:
         """Parse WebSocket response and act accordingly
 
         Args:
-            response [Optional[str]] : Response from WebSocket
+            response [Optional[Dict]]: Response from WebSocket
             window   [Dict[str, str]]: Window info
 
         Returns:
@@ -155,31 +291,25 @@ class Action:
         log = f"[{type(self).__name__}.parse_ws_response]"
         title = f"\'{window['title']}\'"
         if response is None:
-            logger.warn(f"{log} \"{title} {self.name}\" response empty")
+            logger.warning("%s \"%s %s\" response empty", log, title, self.name)
             return -1
-        response_dict: Dict = json.loads(response)
         logger.debug(
-            f"{log} Got response from \"{window[self.SOCKET_URL_KEY]}\": {response_dict}"
+            "%s Got response from \"%s\": %s",
+            log, window[self.SOCKET_URL_KEY], Abbreviated(response)
         )
-        if "result" not in response_dict:
-            logger.warn(
-                f"{log} {title} {self.name} response has no 'result'"
-            )
+        if "result" not in response:
+            logger.warning("%s %s %s response has no 'result'", log, title, self.name)
             return -1
-        result = response_dict["result"]
+        result = response["result"]
         if "exceptionDetails" in result:
             exception_details = result["exceptionDetails"]
             if "exception" not in exception_details:
-                logger.warn(
-                    f"{log} {title} {self.name} failed but no details"
-                )
+                logger.warning("%s %s %s failed but no details", log, title, self.name)
             else:
                 exception = exception_details["exception"]
-                logger.warn(
-                    f"{log} {title} {self.name} failed by {exception}"
-                )
+                logger.warning("%s %s %s failed by %s", log, title, self.name, exception)
             return 1
-        logger.info(f"{log} {title} {self.name} successful")
+        logger.info("%s %s %s successful", log, title, self.name)
         return 0
 
 
@@ -189,38 +319,133 @@ class InitAction(Action):
     def __init__(self) -> None:
         super().__init__("init")
 
-    def run(self, window: Dict[str, str]) -> bool:
+    def run(self, window: Dict[str, str], pool: ConnectionPool) -> bool:
         """Initialization
 
         Args:
             window [Dict[str, str]]: The window info
+            pool   [ConnectionPool]: Pool of connections to the windows
 
         Return:
             [bool]: Whether the initialization is successful
         """
         log = f"[{type(self).__name__}.run]"
-        err_code = self.ws_req_and_res(window)
+        err_code = self.ws_req_and_res(window, pool)
         if err_code == 0:
-            logger.info(
-                f"{log} WebSocket request and response returned {err_code}"
-            )
+            logger.info("%s WebSocket request and response returned %s", log, err_code)
             return True
         else:
-            logger.warn(
-                f"{log} WebSocket request and response returned {err_code}"
-            )
+            logger.warning("%s WebSocket request and response returned %s", log, err_code)
+            return False
+
+    async def run_async(
+        self,
+        window: Dict[str, str],
+        pool: AsyncConnectionPool,
+        script_ids: Optional[Dict[str, str]] = None
+    ) -> bool:
+        """Initialization, run concurrently with other windows
+
+        Args:
+            window     [Dict[str, str]]          : The window info
+            pool       [AsyncConnectionPool]     : Pool of connections to the windows
+            script_ids [Optional[Dict[str, str]]]: Compiled script IDs by action and socket URL; evaluate if `None`
+
+        Return:
+            [bool]: Whether the initialization is successful
+        """
+        log = f"[{type(self).__name__}.run_async]"
+        err_code = await self.ws_req_and_res_async(window, pool, script_ids)
+        if err_code == 0:
+            logger.info("%s WebSocket request and response returned %s", log, err_code)
+            return True
+        else:
+            logger.warning("%s WebSocket request and response returned %s", log, err_code)
             return False
 
 
-@dataclass
 class Actions:
-    """A collection of actions
+    """A registry of actions, keyed by name
+    Actions are also reachable as attributes, e.g. `ACTIONS.init`. They are
+    made on first use, since making one builds its payload
 
-    Properties:
-        init   [InitAction]  : `init` action
+    Instance variables:
+        factories [List[Callable[[], Action]]]: Makers of the actions not made yet
+        registry  [Dict[str, Action]]         : Made actions by name
     """
 
-    init: InitAction
+    def __init__(self, *factories: Callable[[], Action]) -> None:
+        self.factories = list(factories)
+        self.registry: Dict[str, Action] = {}
+
+    def register(self, action: Action) -> None:
+        """Add an action, replacing any of the same name
+
+        Args:
+            action [Action]: The action
+        """
+        self.registry[action.name] = action
+
+    def load(self) -> Dict[str, Action]:
+        """Make the actions not made yet
+
+        Returns:
+            [Dict[str, Action]]: All actions by name
+        """
+        while self.factories:
+            self.register(self.factories.pop(0)())
+        return self.registry
+
+    def __getattr__(self, name: str) -> Action:
+        # Also reached for `factories` and `registry` before `__init__`, e.g. by `copy`
+        if "registry" not in self.__dict__:
+            raise AttributeError(name)
+        try:
+            return self.load()[name]
+        except KeyError:
+            raise AttributeError(f"No action named `{name}`!") from None
+
+    def __iter__(self) -> Iterator[Action]:
+        return iter(list(self.load().values()))
+
+    def copy(self) -> "Actions":
+        """Copy the registry, so one instance can adapt its actions
+        without affecting other instances
+
+        Returns:
+            [Actions]: Registry of copied actions
+        """
+        copied = Actions()
+        for action in self:
+            copied.register(copy.copy(action))
+        return copied
+
+    async def run_async(
+        self,
+        window: Dict[str, str],
+        pool: AsyncConnectionPool,
+        names: Optional[List[str]] = None,
+        script_ids: Optional[Dict[str, str]] = None
+    ) -> Dict[str, bool]:
+        """Run several actions on a window, pipelined over its one connection
+        All commands are sent before any response is awaited
+
+        Args:
+            window     [Dict[str, str]]          : The window info
+            pool       [AsyncConnectionPool]     : Pool of connections to the windows
+            names      [Optional[List[str]]]     : Names of the actions in order; all if `None`
+            script_ids [Optional[Dict[str, str]]]: Compiled script IDs by action and socket URL; evaluate if `None`
+
+        Returns:
+            [Dict[str, bool]]: Whether each action is successful, by name
+        """
+        actions = list(self) if names is None else [self.load()[name] for name in names]
+        # Connect once up front, rather than racing a connection per action
+        await pool.get(window[Action.SOCKET_URL_KEY])
+        results = await asyncio.gather(*(
+            action.run_async(window, pool, script_ids) for action in actions
+        ))
+        return {action.name: result for action, result in zip(actions, results)}
 
 
-ACTIONS = Actions(InitAction())
+ACTIONS = Actions(InitAction)
@@ -0,0 +1,446 @@
+#!/usr/bin/env python3
+"""Offline benchmark of the injector against the fake debug endpoint
+
+Run as `python -m hide_sidebars.bench`
+Exits non-zero if any scenario fails to inject, so it can gate CI
+
+With `--replay TRACE`, a trace recorded with `hideside.py --record` is
+served in place of the fake endpoint, so a real-world session can be rerun
+as a latency regression test
+
+With `--startup`, the cold start of `hideside.py` is measured instead: from
+spawning the interpreter to its first `/json` poll of the fake endpoint. It
+runs from a temporary copy of the checkout, so its logs and cache stay there
+"""
+
+import re
+import sys
+import shutil
+import subprocess
+import asyncio
+import logging
+import tempfile
+import statistics
+from pathlib import Path
+from time import monotonic, time
+from itertools import product
+from argparse import ArgumentParser, Namespace
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from hide_sidebars.timing import SPANS
+from hide_sidebars.runner_obj import Runner
+from hide_sidebars.cache import use_cache_dir
+from hide_sidebars.measure_utils import free_port, ms, percentile
+from hide_sidebars.custom_types import RunnerArgs
+from hide_sidebars.trace import read_trace
+
+logger = logging.getLogger(__name__)
+
+ENTRY_PATH = Path(__file__).resolve().parent.parent / "hideside.py"
+# What `hideside.py` needs to run, relative to the checkout
+CHECKOUT_PATHS = ["hideside.py", "hide_sidebars", "js"]
+PLACEHOLDER_NAME = "Discord"
+# Span of each payload round trip, as the actions name it
+EVALUATE_SPAN = "evaluate"
+POLL_PATTERN = re.compile(r"Polled at (\d+\.\d+)")
+# Cumulative microseconds in a `-X importtime` line
+IMPORT_PATTERN = re.compile(r"\|\s*(\d+)\s*\|\s*hide_sidebars\.main$", re.M)
+
+
+@dataclass
+class BenchResult:
+    """Measurements of one benchmark run
+
+    Instance variables:
+        targets   [int]              : Number of simulated targets
+        delay     [float]            : Milliseconds of injected response delay
+        injected  [int]              : Number of targets injected
+        latency   [Optional[float]]  : Seconds from launch to first injection, if any
+        total     [float]            : Seconds from launch to the end of injection
+        rtts      [List[float]]      : Seconds of each payload round trip, `Runtime.evaluate` or `Runtime.runScript`
+    """
+
+    targets: int
+    delay: float
+    injected: int = 0
+    latency: Optional[float] = None
+    total: float = 0.0
+    rtts: List[float] = field(default_factory=list)
+
+
+@dataclass
+class StartupResult:
+    """Measurements of one cold start
+
+    Instance variables:
+        interpreter [float]          : Seconds to start and exit a bare interpreter
+        imports     [Optional[float]]: Seconds to import `hide_sidebars.main`, as `-X importtime` reports
+        first_poll  [Optional[float]]: Seconds from spawning `hideside.py` to its first `/json` poll, if any
+        finished    [float]          : Seconds from spawning `hideside.py` to its exit
+    """
+
+    interpreter: float
+    imports: Optional[float] = None
+    first_poll: Optional[float] = None
+    finished: float = 0.0
+
+
+class BenchRunner(Runner):
+    """Runner that launches the fake debug endpoint, or replays a trace,
+    instead of Discord, and times the injections
+
+    Instance variables:
+        targets  [int]                   : Number of simulated targets
+        delay    [float]                 : Milliseconds of injected response delay
+        replay   [Optional[pathlib.Path]]: Trace to replay instead, if any
+        speed    [float]                 : Multiple of the recorded pace of the trace
+        result   [BenchResult]           : Measurements of this run
+    """
+
+    def __init__(
+        self,
+        args: RunnerArgs,
+        targets: int,
+        delay: float,
+        replay: Optional[Path] = None,
+        speed: float = 1.0
+    ) -> None:
+        super().__init__(args)
+        self.targets = targets
+        self.delay = delay
+        self.replay = replay
+        self.speed = speed
+        self.result = BenchResult(targets, delay)
+
+    def program_command(self) -> List[str]:
+        """Get the command to start the fake debug endpoint, or the replay, with
+
+        Returns:
+            [List[str]]: The command
+        """
+        if self.replay is not None:
+            return [
+                sys.executable,
+                "-m", "hide_sidebars.replay",
+                str(self.replay),
+                self.DEBUG_PARAMETER.substitute(port=self.port),
+                "--speed", str(self.speed),
+            ]
+        return [
+            sys.executable,
+            "-m", "hide_sidebars.fake_devtools",
+            self.DEBUG_PARAMETER.substitute(port=self.port),
+            "--targets", str(self.targets),
+            "--delay", str(self.delay),
+        ]
+
+    def kill_running(self) -> None:
+        """Nothing to kill; every run gets its own port"""
+
+    def patch_boot(self) -> None:
+        """Never patch boot in a benchmark"""
+
+    async def inject_window(self, window: Dict[str, str]) -> bool:
+        """Inject into a window and note when the first one is injected
+
+        Args:
+            window [Dict[str, str]]: Window info
+
+        Returns:
+            [bool]: Whether the injection is successful
+        """
+        success = await super().inject_window(window)
+        if success:
+            self.result.injected += 1
+            if self.result.latency is None:
+                self.result.latency = monotonic() - self.launched
+        return success
+
+    def measure(self) -> BenchResult:
+        """Launch, inject and shut down once
+
+        Returns:
+            [BenchResult]: Measurements of this run
+        """
+        # Both engines time each payload round trip as an `evaluate` span
+        evaluated = len(SPANS.durations.get(EVALUATE_SPAN, []))
+        self.start_program()
+        try:
+            if self.sync:
+                if self.inject_sync():
+                    self.result.injected = 1
+                    self.result.latency = monotonic() - self.launched
+            else:
+                asyncio.run(self.inject_async())
+            self.result.total = monotonic() - self.launched
+        finally:
+            self.process.terminate()
+            self.process.wait()
+        self.result.rtts = SPANS.durations.get(EVALUATE_SPAN, [])[evaluated:]
+        return self.result
+
+
+def copy_checkout(destination: Path) -> Path:
+    """Copy what `hideside.py` needs to run, so that its logs and cache land
+    in the copy rather than the checkout
+    A placeholder Discord executable is made there too, which nothing runs:
+    should attaching fail, `kill_running` looks for its processes and finds
+    none, where the interpreter as `-d` would kill every Python process
+
+    Args:
+        destination [pathlib.Path]: Directory to copy into
+
+    Returns:
+        [pathlib.Path]: Path of the copied `hideside.py`
+    """
+    (destination / PLACEHOLDER_NAME).touch()
+    for name in CHECKOUT_PATHS:
+        source = ENTRY_PATH.parent / name
+        if source.is_dir():
+            # Bytecode is copied with its source times, so it stays valid
+            shutil.copytree(source, destination / name)
+        else:
+            shutil.copy2(source, destination / name)
+    return destination / ENTRY_PATH.name
+
+
+def measure_startup(entry_path: Path, port: int) -> StartupResult:
+    """Cold-start `hideside.py` once, attaching to a fake endpoint already listening
+
+    Args:
+        entry_path [pathlib.Path]: Path of the `hideside.py` to start
+        port       [int]         : Port for the fake endpoint
+
+    Returns:
+        [StartupResult]: Measurements of this start
+    """
+    started = time()
+    subprocess.run([sys.executable, "-c", "pass"], check=True)
+    result = StartupResult(time() - started)
+    report = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import hide_sidebars.main"],
+        cwd=entry_path.parent, capture_output=True, text=True
+    ).stderr
+    if (match := IMPORT_PATTERN.search(report)) is not None:
+        result.imports = int(match.group(1)) / 1e6
+    fake = subprocess.Popen(
+        [
+            sys.executable, "-m", "hide_sidebars.fake_devtools",
+            Runner.DEBUG_PARAMETER.substitute(port=port), "--polls",
+        ],
+        cwd=entry_path.parent, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True
+    )
+    try:
+        # Listening once announced
+        fake.stderr.readline()
+        started = time()
+        subprocess.run(
+            [
+                sys.executable, str(entry_path), "-x",
+                "-d", str(entry_path.parent / PLACEHOLDER_NAME), "-p", str(port),
+            ],
+            cwd=entry_path.parent, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+        )
+        result.finished = time() - started
+    finally:
+        fake.terminate()
+        polls, _ = fake.communicate()
+    if (match := POLL_PATTERN.search(polls)) is not None:
+        result.first_poll = float(match.group(1)) - started
+    return result
+
+
+def parse_arguments() -> Namespace:
+    """Parse command line arguments
+
+    Returns:
+        [argparse.Namespace]: The object containing all arguments
+    """
+    parser = ArgumentParser(description="Benchmark the injector offline")
+    parser.add_argument(
+        "-n", "--targets",
+        nargs="+",
+        default=[1, 10, 100],
+        type=int,
+        help="Numbers of simulated targets",
+        dest="targets"
+    )
+    parser.add_argument(
+        "-l", "--delays",
+        nargs="+",
+        default=[0.0, 50.0],
+        type=float,
+        help="Milliseconds of response delay to inject",
+        dest="delays"
+    )
+    parser.add_argument(
+        "-r", "--repeat",
+        default=3,
+        type=int,
+        help="Runs per scenario",
+        dest="repeat"
+    )
+    parser.add_argument(
+        "-s", "--sync",
+        action="store_true",
+        help="Use this to benchmark the synchronous fallback engine",
+        dest="sync"
+    )
+    parser.add_argument(
+        "-c", "--compile-once",
+        action="store_true",
+        help="Use this to benchmark compile-once mode",
+        dest="compile_once"
+    )
+    parser.add_argument(
+        "-R", "--replay",
+        type=Path,
+        help="Path of a trace recorded with `hideside.py --record` to replay instead of simulating targets",
+        dest="replay"
+    )
+    parser.add_argument(
+        "--speed",
+        default=1.0,
+        type=float,
+        help="Multiple of the recorded pace to replay at; 0 for no waits",
+        dest="speed"
+    )
+    parser.add_argument(
+        "-t", "--startup",
+        action="store_true",
+        help="Use this to benchmark the cold start to the first poll instead",
+        dest="startup"
+    )
+    parser.add_argument(
+        "-v", "--verbose",
+        action="store_true",
+        help="Use this to log the runs to STDERR",
+        dest="verbose"
+    )
+    return parser.parse_args()
+
+
+def bench_startup(repeat: int) -> bool:
+    """Cold-start several times and print the medians
+
+    Args:
+        repeat [int]: Number of starts
+
+    Returns:
+        [bool]: Whether every start polled the endpoint
+    """
+    with tempfile.TemporaryDirectory(prefix="dhs-startup-") as checkout_dir:
+        entry_path = copy_checkout(Path(checkout_dir))
+        results = [measure_startup(entry_path, free_port()) for _ in range(repeat)]
+
+    def median(values: List[Optional[float]]) -> Optional[float]:
+        measured = [value for value in values if value is not None]
+        return statistics.median(measured) if measured else None
+
+    polled = sum(result.first_poll is not None for result in results)
+    print(f"{'starts':>7} {'polled':>7} {'python':>9} {'import':>9} {'1st poll':>9} {'exit':>9}")
+    print(
+        f"{repeat:>7} {polled:>7} "
+        f"{ms(median([result.interpreter for result in results])):>9} "
+        f"{ms(median([result.imports for result in results])):>9} "
+        f"{ms(median([result.first_poll for result in results])):>9} "
+        f"{ms(median([result.finished for result in results])):>9}"
+    )
+    return polled == repeat
+
+
+def replay_scenario(path: Path) -> int:
+    """Get the number of windows a trace has recorded connections to
+
+    Args:
+        path [pathlib.Path]: Path of the trace
+
+    Returns:
+        [int]: Number of page socket paths
+    """
+    try:
+        trace = read_trace(path)
+    except (OSError, ValueError) as err:
+        print(f"Trace not read: {err}", file=sys.stderr)
+        sys.exit(2)
+    return sum(path.startswith("/devtools/page/") for path in trace.sessions)
+
+
+def bench_scenarios(args: Namespace, scenarios: Iterable[Tuple[int, float]]) -> bool:
+    """Run every scenario and print a summary table
+
+    Args:
+        args      [argparse.Namespace]         : Command line arguments
+        scenarios [Iterable[Tuple[int, float]]]: Number of targets and milliseconds of delay of each scenario
+
+    Returns:
+        [bool]: Whether every scenario injected every target
+    """
+    failed = False
+    print(
+        f"{'targets':>7} {'delay':>7} {'injected':>9} {'launch':>9} "
+        f"{'total':>9} {'rtt p50':>9} {'rtt p95':>9} {'rtt max':>9}"
+    )
+    for targets, delay in scenarios:
+        results: List[BenchResult] = []
+        for _ in range(args.repeat):
+            runner_args = RunnerArgs(
+                discord_path=Path(sys.executable),
+                discord_paths=None,
+                all_builds=False,
+                port=free_port(),
+                boot=None,
+                minimized=False,
+                ptb=False,
+                sync=args.sync,
+                attach=False,
+                compile_once=args.compile_once,
+                supervise=False,
+                monitor=None,
+                watch=None,
+                restart=None,
+                profile=None,
+                record=None
+            )
+            results.append(
+                BenchRunner(runner_args, targets, delay, args.replay, args.speed).measure()
+            )
+        latencies = [result.latency for result in results if result.latency is not None]
+        rtts = [rtt for result in results for rtt in result.rtts]
+        injected = min(result.injected for result in results)
+        expected = 1 if args.sync else targets
+        if injected < expected:
+            failed = True
+        print(
+            f"{targets:>7} {delay:>5.0f}ms {injected:>4}/{expected:<4} "
+            f"{ms(statistics.median(latencies) if latencies else None):>9} "
+            f"{ms(statistics.median(result.total for result in results)):>9} "
+            f"{ms(percentile(rtts, 0.5) if rtts else None):>9} "
+            f"{ms(percentile(rtts, 0.95) if rtts else None):>9} "
+            f"{ms(max(rtts) if rtts else None):>9}"
+        )
+    return not failed
+
+
+def main() -> None:
+    """Run every scenario, or the cold start, and print a summary table"""
+    args = parse_arguments()
+    logging.basicConfig(level=logging.DEBUG if args.verbose else logging.CRITICAL)
+    if args.startup:
+        if not bench_startup(args.repeat):
+            sys.exit(1)
+        return
+    scenarios = product(args.targets, args.delays)
+    if args.replay is not None:
+        # The trace fixes the targets and their delays
+        scenarios = [(replay_scenario(args.replay), 0.0)]
+    with tempfile.TemporaryDirectory(prefix="dhs-bench-") as cache_dir:
+        # The fake endpoints report a made-up Discord version; keep it out of the real cache
+        use_cache_dir(Path(cache_dir))
+        if not bench_scenarios(args, scenarios):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+"""A module that builds the JavaScript payloads"""
+
+import hashlib
+import logging
+from pathlib import Path
+from contextlib import suppress
+
+from hide_sidebars.cache import cache_dir, cache_path, write_text
+from hide_sidebars.minify import minify
+
+logger = logging.getLogger(__name__)
+
+# Bump this whenever the minifier output changes
+MINIFIER_VERSION = "1"
+
+
+def build_js(source_path: Path) -> str:
+    """Minify JavaScript, reusing the cached build if the source is unchanged
+
+    Args:
+        source_path [pathlib.Path]: Path of the JavaScript source
+
+    Returns:
+        [str]: Minified JavaScript
+    """
+    log = "[build_js]"
+    source = source_path.read_bytes()
+    digest = hashlib.sha256(MINIFIER_VERSION.encode() + source).hexdigest()[:16]
+    built_path = cache_path(f"{source_path.stem}.{digest}.min.js")
+    if built_path.is_file():
+        logger.debug("%s Cached build \"%s\" used", log, built_path)
+        return built_path.read_text(encoding="utf-8")
+    minified = minify(source.decode("utf-8"))
+    for stale_path in cache_dir().glob(f"{source_path.stem}.*.min.js"):
+        # A concurrent run may have removed it already
+        with suppress(FileNotFoundError):
+            stale_path.unlink()
+    try:
+        write_text(built_path, minified)
+    except OSError as err:
+        logger.warning("%s \"%s\" not cached %s", log, built_path, err)
+        return minified
+    logger.info(
+        "%s \"%s\" built into \"%s\": %s -> %s bytes",
+        log, source_path, built_path, len(source), len(minified)
+    )
+    return minified
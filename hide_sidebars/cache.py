@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""A module that locates and writes the on-disk cache"""
+
+import os
+import tempfile
+from pathlib import Path
+from contextlib import suppress
+
+CACHE_DIR_PATH = Path(__file__).resolve().parent.parent / ".cache"
+
+# Cache directory in use; see `use_cache_dir`
+cache_dir_path = CACHE_DIR_PATH
+
+
+def use_cache_dir(path: Path) -> None:
+    """Cache into another directory from now on, e.g. a temporary one so that
+    benchmarks against fake endpoints leave the real cache alone
+
+    Args:
+        path [pathlib.Path]: Cache directory
+    """
+    global cache_dir_path
+    cache_dir_path = path
+
+
+def cache_dir() -> Path:
+    """Get the cache directory in use, creating it
+
+    Returns:
+        [pathlib.Path]: Path of the cache directory
+    """
+    cache_dir_path.mkdir(exist_ok=True)
+    return cache_dir_path
+
+
+def cache_path(name: str) -> Path:
+    """Get the path of a cache file, creating the cache directory
+
+    Args:
+        name [str]: Name of the cache file
+
+    Returns:
+        [pathlib.Path]: Path of the cache file
+    """
+    return cache_dir() / name
+
+
+def write_text(path: Path, text: str) -> None:
+    """Write a cache file through a temporary file of its own in the same
+    directory, then rename it, so that a concurrent run never reads a partial
+    file and concurrent writers never share a temporary file
+
+    Args:
+        path [pathlib.Path]: Path of the cache file
+        text [str]         : Content
+
+    Raises:
+        OSError: If the file cannot be written
+    """
+    temp = tempfile.NamedTemporaryFile(
+        "w", encoding="utf-8", dir=path.parent, prefix=f"{path.name}.", suffix=".tmp", delete=False
+    )
+    try:
+        with temp:
+            temp.write(text)
+        os.replace(temp.name, path)
+    except BaseException:
+        with suppress(OSError):
+            os.unlink(temp.name)
+        raise
@@ -0,0 +1,340 @@
+#!/usr/bin/env python3
+"""A module that resolves the hashed Discord class names in the payload
+
+Discord class names end in a hash, e.g. `sidebar-2K8pFh`, which changes with
+Discord updates. The names are looked up by prefix in the live DOM once, and
+the mapping is cached on disk by Discord version. Names left unresolved are
+cached as such, and looked up again by later runs
+"""
+
+import re
+import json
+import asyncio
+import logging
+from weakref import WeakKeyDictionary
+from typing import TYPE_CHECKING, Dict, List, Optional
+
+from hide_sidebars.lazy import lazy_import
+from hide_sidebars.cache import cache_path, write_text
+from hide_sidebars.connection import Dispatcher, send_command_sync
+
+if TYPE_CHECKING:
+    import websocket
+    import websockets
+else:
+    websocket = lazy_import("websocket")
+    websockets = lazy_import("websockets")
+
+logger = logging.getLogger(__name__)
+
+INDEX_NAME = "class_names.json"
+# A quoted class name with a 6-character hash, e.g. "sidebar-2K8pFh"
+HASHED_PATTERN = re.compile(r"""(["'])([A-Za-z][A-Za-z0-9]*)-[\w-]{6}\1""")
+VERSION_PATTERN = re.compile(r"discord/(\d+(?:\.\d+)+)", re.IGNORECASE)
+USER_AGENT_EXPRESSION = "navigator.userAgent"
+# Elements `discordHideSidebar` needs before it can do anything
+REQUIRED_PREFIXES = ["toolbar", "sidebar"]
+QUERY_TIMEOUT = 15.0
+QUERY_EXPRESSION = """(async ({prefixes, required, timeout}) => {
+    const deadline = Date.now() + timeout;
+    for (;;) {
+        const found = {};
+        for (const prefix of prefixes) {
+            const pattern = new RegExp(`^${prefix}-[\\\\w-]{6}$`);
+            const names = new Set();
+            for (const element of document.querySelectorAll(`[class*="${prefix}-"]`)) {
+                for (const name of element.classList) {
+                    if (pattern.test(name)) names.add(name);
+                }
+            }
+            if (names.size) found[prefix] = [...names];
+        }
+        if (required.every((prefix) => prefix in found) || Date.now() >= deadline) return found;
+        await new Promise((resolve) => setTimeout(resolve, 250));
+    }
+})(%s)"""
+
+
+def hashed_names(js: str) -> Dict[str, str]:
+    """Get the hashed class names in a payload
+
+    Args:
+        js [str]: Payload JavaScript
+
+    Returns:
+        [Dict[str, str]]: Prefix of each class name, by class name
+    """
+    return {
+        match.group()[1:-1]: match.group(2)
+        for match in HASHED_PATTERN.finditer(js)
+    }
+
+
+def parse_version(user_agent: str) -> str:
+    """Get the Discord version from the user agent of a window
+
+    Args:
+        user_agent [str]: User agent, e.g. `... discord/1.0.9003 Chrome/91...`
+
+    Returns:
+        [str]: The version, or the whole user agent if there is none
+    """
+    match = VERSION_PATTERN.search(user_agent)
+    return user_agent if match is None else match.group(1)
+
+
+def choose(names: Dict[str, str], found: Dict[str, List[str]]) -> Dict[str, str]:
+    """Pick the live class name of each hashed class name
+    A name still in the DOM is kept; otherwise the only live name with its
+    prefix is taken. Names with no or several candidates stay unresolved
+
+    Args:
+        names [Dict[str, str]]      : Prefix of each class name, by class name
+        found [Dict[str, List[str]]]: Live class names by prefix
+
+    Returns:
+        [Dict[str, str]]: Live class name by hashed class name, for the resolved ones
+    """
+    log = "[choose]"
+    resolved: Dict[str, str] = {}
+    for name, prefix in names.items():
+        candidates = found.get(prefix, [])
+        if name in candidates:
+            resolved[name] = name
+        elif len(candidates) == 1:
+            resolved[name] = candidates[0]
+            logger.info("%s \"%s\" is now \"%s\"", log, name, candidates[0])
+        elif candidates:
+            logger.warning("%s \"%s\" ambiguous among %s; kept", log, name, candidates)
+        else:
+            logger.warning("%s \"%s\" not in the DOM; kept", log, name)
+    return resolved
+
+
+def apply(js: str, resolved: Dict[str, str]) -> str:
+    """Substitute the resolved class names into a payload
+
+    Args:
+        js       [str]           : Payload JavaScript
+        resolved [Dict[str, str]]: Live class name by hashed class name
+
+    Returns:
+        [str]: The payload with live class names
+    """
+    def substitute(match: re.Match) -> str:
+        quote = match.group(1)
+        return f"{quote}{resolved.get(match.group()[1:-1], match.group()[1:-1])}{quote}"
+
+    return HASHED_PATTERN.sub(substitute, js)
+
+
+class ClassNameResolver:
+    """Resolves the hashed class names once per instance, through the on-disk index
+
+    Instance variables:
+        names    [Dict[str, str]]          : Prefix of each hashed class name, by class name
+        resolved [Optional[Dict[str, str]]]: Live class name by hashed class name, once resolved
+        locks    [WeakKeyDictionary]       : Lets one window resolve while the others wait, by event loop
+    """
+
+    def __init__(self, names: Dict[str, str]) -> None:
+        self.names = names
+        self.resolved: Optional[Dict[str, str]] = None
+        self.locks: "WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Lock]" = WeakKeyDictionary()
+
+    def unresolved(self, resolved: Dict[str, str]) -> Dict[str, str]:
+        """Get the class names a mapping lacks
+
+        Args:
+            resolved [Dict[str, str]]: Live class name by hashed class name
+
+        Returns:
+            [Dict[str, str]]: Prefix of each class name not in the mapping, by class name
+        """
+        return {name: prefix for name, prefix in self.names.items() if name not in resolved}
+
+    @staticmethod
+    def query_params(names: Dict[str, str]) -> Dict:
+        """Get the `Runtime.evaluate` parameters of the DOM query
+
+        Args:
+            names [Dict[str, str]]: Prefix of each class name to look up, by class name
+
+        Returns:
+            [Dict]: The parameters
+        """
+        prefixes = sorted(set(names.values()))
+        return {
+            "expression": QUERY_EXPRESSION % json.dumps({
+                "prefixes": prefixes,
+                "required": [prefix for prefix in REQUIRED_PREFIXES if prefix in prefixes],
+                "timeout": QUERY_TIMEOUT * 1000,
+            }),
+            "awaitPromise": True,
+            "returnByValue": True,
+        }
+
+    def lookup(self, version: str) -> Dict[str, str]:
+        """Get the class names of a Discord version resolved by earlier runs
+
+        Args:
+            version [str]: Discord version
+
+        Returns:
+            [Dict[str, str]]: Live class name by hashed class name, for the names cached as resolved
+        """
+        log = f"[{type(self).__name__}.lookup]"
+        try:
+            index: Dict[str, Dict[str, Optional[str]]] = json.loads(
+                cache_path(INDEX_NAME).read_text(encoding="utf-8")
+            )
+        except (OSError, ValueError):
+            return {}
+        cached = {
+            name: live for name, live in index.get(version, {}).items()
+            if name in self.names and live is not None
+        }
+        if cached:
+            logger.info(
+                "%s %s/%s class names of version %s cached", log, len(cached), len(self.names), version
+            )
+        return cached
+
+    def conclude(
+        self, version: str, cached: Dict[str, str], response: Dict
+    ) -> Optional[Dict[str, str]]:
+        """Resolve the class names missing from the cache from the DOM query
+        response, and cache the outcome
+        Names left unresolved, e.g. ambiguous ones or those of a window still
+        loading, are cached as unresolved so that later runs look them up again
+
+        Args:
+            version  [str]           : Discord version
+            cached   [Dict[str, str]]: Live class name by hashed class name, for the names cached as resolved
+            response [Dict]          : Response of the DOM query for the other names
+
+        Returns:
+            [Optional[Dict[str, str]]]: Live class name by hashed class name; `None` if the query failed
+        """
+        log = f"[{type(self).__name__}.conclude]"
+        result: Dict = response.get("result", {})
+        if "error" in response or "exceptionDetails" in result:
+            logger.warning("%s DOM query failed: %s", log, response)
+            return
+        found: Dict[str, List[str]] = result.get("result", {}).get("value") or {}
+        resolved = {**cached, **choose(self.unresolved(cached), found)}
+        if len(resolved) < len(self.names):
+            logger.warning(
+                "%s %s/%s class names resolved; the rest are looked up again next run",
+                log, len(resolved), len(self.names)
+            )
+        index_path = cache_path(INDEX_NAME)
+        try:
+            index: Dict[str, Dict[str, Optional[str]]] = json.loads(
+                index_path.read_text(encoding="utf-8")
+            )
+        except (OSError, ValueError):
+            index = {}
+        index.setdefault(version, {}).update({name: resolved.get(name) for name in self.names})
+        try:
+            write_text(index_path, json.dumps(index, indent=2))
+        except OSError as err:
+            logger.warning("%s Class names of version %s not cached %s", log, version, err)
+            return resolved
+        logger.info("%s Class names of version %s cached", log, version)
+        return resolved
+
+    @staticmethod
+    def user_agent(response: Dict) -> Optional[str]:
+        """Get the user agent from its `Runtime.evaluate` response
+
+        Args:
+            response [Dict]: The response
+
+        Returns:
+            [Optional[str]]: The user agent, if any
+        """
+        value = response.get("result", {}).get("result", {}).get("value")
+        return value if isinstance(value, str) else None
+
+    def lock(self) -> asyncio.Lock:
+        """Get the lock of the running event loop
+        The resolver outlives its event loop when Discord is relaunched, and a
+        lock cannot be shared across loops
+
+        Returns:
+            [asyncio.Lock]: The lock
+        """
+        loop = asyncio.get_running_loop()
+        lock = self.locks.get(loop)
+        if lock is None:
+            lock = self.locks[loop] = asyncio.Lock()
+        return lock
+
+    async def resolve(self, dispatcher: Dispatcher) -> Optional[Dict[str, str]]:
+        """Resolve the class names in a window, unless resolved already
+
+        Args:
+            dispatcher [Dispatcher]: Connection to the window
+
+        Returns:
+            [Optional[Dict[str, str]]]: Live class name by hashed class name; `None` if not resolved
+        """
+        log = f"[{type(self).__name__}.resolve]"
+        async with self.lock():
+            if self.resolved is not None:
+                return self.resolved
+            try:
+                user_agent = self.user_agent(await dispatcher.send(
+                    "Runtime.evaluate", {"expression": USER_AGENT_EXPRESSION, "returnByValue": True}
+                ))
+                if user_agent is None:
+                    return
+                version = parse_version(user_agent)
+                cached = self.lookup(version)
+                unresolved = self.unresolved(cached)
+                if not unresolved:
+                    self.resolved = cached
+                else:
+                    logger.info("%s Querying the DOM of version %s", log, version)
+                    self.resolved = self.conclude(
+                        version, cached,
+                        await dispatcher.send("Runtime.evaluate", self.query_params(unresolved))
+                    )
+            except (OSError, websockets.ConnectionClosed) as err:
+                logger.warning("%s Class names unresolved %s", log, err)
+            return self.resolved
+
+    def resolve_sync(self, ws: "websocket.WebSocket") -> Optional[Dict[str, str]]:
+        """Resolve the class names in a window, unless resolved already,
+        through a synchronous connection
+
+        Args:
+            ws [websocket.WebSocket]: Connection to the window
+
+        Returns:
+            [Optional[Dict[str, str]]]: Live class name by hashed class name; `None` if not resolved
+        """
+        log = f"[{type(self).__name__}.resolve_sync]"
+        if self.resolved is not None:
+            return self.resolved
+        try:
+            user_agent = self.user_agent(send_command_sync(
+                ws, "Runtime.evaluate", {"expression": USER_AGENT_EXPRESSION, "returnByValue": True}
+            ))
+            if user_agent is None:
+                return
+            version = parse_version(user_agent)
+            cached = self.lookup(version)
+            unresolved = self.unresolved(cached)
+            if not unresolved:
+                self.resolved = cached
+            else:
+                logger.info("%s Querying the DOM of version %s", log, version)
+                self.resolved = self.conclude(
+                    version, cached,
+                    send_command_sync(ws, "Runtime.evaluate", self.query_params(unresolved))
+                )
+        except (OSError, websocket.WebSocketException) as err:
+            logger.warning("%s Class names unresolved %s", log, err)
+        return self.resolved
@@ -0,0 +1,363 @@
+#!/usr/bin/env python3
+"""A module that pools the WebSocket connections to the debugging targets"""
+
+import json
+import asyncio
+import logging
+from itertools import count
+from typing import TYPE_CHECKING, Any, Dict, Iterable, Iterator, List, Optional
+
+from hide_sidebars.lazy import lazy_import
+from hide_sidebars.timing import SPANS
+from hide_sidebars.trace import TRACE
+
+if TYPE_CHECKING:
+    import websocket
+    import websockets
+else:
+    websocket = lazy_import("websocket")
+    websockets = lazy_import("websockets")
+
+logger = logging.getLogger(__name__)
+
+MESSAGE_IDS = count(1)
+
+
+class ConnectionPool:
+    """Persistent synchronous WebSocket connections, keyed by socket URL
+
+    Instance variables:
+        connections [Dict[str, websocket.WebSocket]]: Open connections
+    """
+
+    def __init__(self) -> None:
+        self.connections: "Dict[str, websocket.WebSocket]" = {}
+
+    def get(self, url: str) -> "Optional[websocket.WebSocket]":
+        """Get the open connection to URL, connecting if necessary
+
+        Args:
+            url [str]: URL to WebSocket
+
+        Returns:
+            [Optional[websocket.WebSocket]]: WebSocket connection, if any
+        """
+        log = f"[{type(self).__name__}.get]"
+        ws = self.connections.get(url)
+        if ws is not None:
+            if ws.connected:
+                logger.debug("%s WebSocket to \"%s\" reused", log, url)
+                return ws
+            self.evict(url)
+        ws = self.connect(url)
+        if ws is not None:
+            self.connections[url] = ws
+        return ws
+
+    def connect(self, url: str) -> "Optional[websocket.WebSocket]":
+        """Establish WebSocket to URL, with proper error handling
+
+        Args:
+            url [str]: URL to WebSocket
+
+        Returns:
+            [Optional[websocket.WebSocket]]: WebSocket connection, if any
+        """
+        log = f"[{type(self).__name__}.connect]"
+        try:
+            with SPANS.span("connect", url=url):
+                ws = websocket.create_connection(url)
+        except ConnectionRefusedError as err:
+            # Possibly the program has exited
+            logger.warning("%s WebSocket to \"%s\" refused %s", log, url, err)
+            return
+        except ConnectionResetError as err:
+            # Possibly the program has crashed
+            logger.warning("%s WebSocket to \"%s\" reset %s", log, url, err)
+            return
+        except websocket.WebSocketBadStatusException as err:
+            # Possibly the window is changed
+            logger.warning("%s WebSocket to \"%s\" bad status %s", log, url, err)
+            return
+        logger.info("%s WebSocket to \"%s\" successful", log, url)
+        TRACE.opened(ws, url)
+        return ws
+
+    def evict(self, url: str) -> None:
+        """Close and forget the connection to URL
+
+        Args:
+            url [str]: URL to WebSocket
+        """
+        log = f"[{type(self).__name__}.evict]"
+        ws = self.connections.pop(url, None)
+        if ws is None:
+            return
+        TRACE.closed(ws)
+        try:
+            ws.close()
+        except (OSError, websocket.WebSocketException) as err:
+            logger.debug("%s WebSocket to \"%s\" close failed %s", log, url, err)
+        logger.info("%s WebSocket to \"%s\" evicted", log, url)
+
+    def prune(self, urls: Iterable[str]) -> None:
+        """Evict connections whose targets are gone
+
+        Args:
+            urls [Iterable[str]]: Socket URLs of the targets still alive
+        """
+        alive = set(urls)
+        for url in [url for url in self.connections if url not in alive]:
+            self.evict(url)
+
+    def close_all(self) -> None:
+        """Close all connections"""
+        for url in list(self.connections):
+            self.evict(url)
+
+
+class Dispatcher:
+    """Multiplexes CDP commands and events over one connection
+    A background task reads every message, resolving each response to the
+    command with its ID and handing each event to its subscribers, so several
+    commands can be in flight at once
+
+    Instance variables:
+        ws          [websockets.WebSocketClientProtocol]: The connection
+        url         [str]                                : Socket URL of the connection
+        ids         [Iterator[int]]                      : Message ID counter
+        waiters     [Dict[int, asyncio.Future]]          : Pending commands by message ID
+        subscribers [Dict[str, List[asyncio.Queue]]]     : Event queues by event name
+        reader      [asyncio.Task]                       : Background reading task
+    """
+
+    def __init__(self, ws: "websockets.WebSocketClientProtocol", url: str) -> None:
+        self.ws = ws
+        self.url = url
+        self.ids = count(1)
+        self.waiters: Dict[int, asyncio.Future] = {}
+        self.subscribers: Dict[str, List[asyncio.Queue]] = {}
+        TRACE.opened(ws, url)
+        self.reader = asyncio.ensure_future(self.read())
+
+    @property
+    def open(self) -> bool:
+        """Whether commands can still be sent"""
+        return self.ws.open and not self.reader.done()
+
+    async def read(self) -> None:
+        """Route every message until the connection closes"""
+        log = f"[{type(self).__name__}.read]"
+        closed: Exception = ConnectionError("Connection closed")
+        try:
+            async for message in self.ws:
+                TRACE.received(self.ws, message)
+                try:
+                    data: Dict = json.loads(message)
+                except ValueError as err:
+                    logger.warning("%s Malformed message from \"%s\" skipped %s", log, self.url, err)
+                    continue
+                if "id" in data:
+                    waiter = self.waiters.pop(data["id"], None)
+                    if waiter is not None and not waiter.done():
+                        waiter.set_result(data)
+                    continue
+                for queue in self.subscribers.get(data.get("method"), []):
+                    queue.put_nowait(data)
+        except websockets.ConnectionClosed as err:
+            logger.debug("%s Connection closed %s", log, err)
+            closed = err
+        finally:
+            TRACE.closed(self.ws, remote=bool(self.ws.close_rcvd_then_sent))
+            for waiter in self.waiters.values():
+                if not waiter.done():
+                    waiter.set_exception(closed)
+            self.waiters.clear()
+            # Tell the subscribers there is nothing more to come
+            for queues in self.subscribers.values():
+                for queue in queues:
+                    queue.put_nowait(None)
+
+    async def send(self, method: str, params: Dict[str, Any]) -> Dict:
+        """Send a CDP command and wait for its own response
+
+        Args:
+            method [str]           : CDP method name
+            params [Dict[str, Any]]: CDP method parameters
+
+        Returns:
+            [Dict]: The response
+        """
+        if self.reader.done():
+            raise ConnectionError("Connection closed")
+        message_id = next(self.ids)
+        waiter = asyncio.get_running_loop().create_future()
+        self.waiters[message_id] = waiter
+        try:
+            message = json.dumps({"id": message_id, "method": method, "params": params})
+            TRACE.sent(self.ws, message)
+            await self.ws.send(message)
+            return await waiter
+        finally:
+            self.waiters.pop(message_id, None)
+
+    def subscribe(self, *methods: str) -> asyncio.Queue:
+        """Get a queue of the events of some methods
+        `None` is queued once the connection closes
+
+        Args:
+            methods [str]: CDP event names
+
+        Returns:
+            [asyncio.Queue]: The event queue
+        """
+        queue: asyncio.Queue = asyncio.Queue()
+        if self.reader.done():
+            queue.put_nowait(None)
+        for method in methods:
+            self.subscribers.setdefault(method, []).append(queue)
+        return queue
+
+    def unsubscribe(self, queue: asyncio.Queue) -> None:
+        """Stop queuing events into a queue
+
+        Args:
+            queue [asyncio.Queue]: The event queue
+        """
+        for queues in self.subscribers.values():
+            if queue in queues:
+                queues.remove(queue)
+
+    async def close(self) -> None:
+        """Close the connection and stop reading"""
+        await self.ws.close()
+        await asyncio.gather(self.reader, return_exceptions=True)
+
+
+class AsyncConnectionPool:
+    """Persistent asynchronous CDP connections, keyed by socket URL
+
+    Instance variables:
+        connections [Dict[str, Dispatcher]]    : Open connections
+        connecting  [Dict[str, asyncio.Future]]: Connections being established, by socket URL
+    """
+
+    def __init__(self) -> None:
+        self.connections: Dict[str, Dispatcher] = {}
+        self.connecting: Dict[str, asyncio.Future] = {}
+
+    async def get(self, url: str) -> Optional[Dispatcher]:
+        """Get the open connection to URL, connecting if necessary
+        Concurrent callers share one connection attempt
+
+        Args:
+            url [str]: URL to WebSocket
+
+        Returns:
+            [Optional[Dispatcher]]: CDP connection, if any
+        """
+        log = f"[{type(self).__name__}.get]"
+        dispatcher = self.connections.get(url)
+        if dispatcher is not None:
+            if dispatcher.open:
+                logger.debug("%s WebSocket to \"%s\" reused", log, url)
+                return dispatcher
+            await self.evict(url)
+        if url in self.connecting:
+            return await asyncio.shield(self.connecting[url])
+        attempt = asyncio.ensure_future(self.connect(url))
+        self.connecting[url] = attempt
+        try:
+            dispatcher = await asyncio.shield(attempt)
+        finally:
+            self.connecting.pop(url, None)
+        if dispatcher is not None:
+            self.connections[url] = dispatcher
+        return dispatcher
+
+    async def connect(self, url: str) -> Optional[Dispatcher]:
+        """Establish WebSocket to URL, with proper error handling
+
+        Args:
+            url [str]: URL to WebSocket
+
+        Returns:
+            [Optional[Dispatcher]]: CDP connection, if any
+        """
+        log = f"[{type(self).__name__}.connect]"
+        try:
+            with SPANS.span("connect", url=url):
+                ws = await websockets.connect(url, max_size=None, ping_interval=None)
+        except ConnectionRefusedError as err:
+            # Possibly the program has exited
+            logger.warning("%s WebSocket to \"%s\" refused %s", log, url, err)
+            return
+        except ConnectionResetError as err:
+            # Possibly the program has crashed
+            logger.warning("%s WebSocket to \"%s\" reset %s", log, url, err)
+            return
+        except websockets.InvalidStatusCode as err:
+            # Possibly the window is changed
+            logger.warning("%s WebSocket to \"%s\" bad status %s", log, url, err)
+            return
+        except (OSError, websockets.InvalidHandshake, asyncio.TimeoutError) as err:
+            # Possibly the program is still starting or shutting down
+            logger.warning("%s WebSocket to \"%s\" failed %s", log, url, err)
+            return
+        logger.info("%s WebSocket to \"%s\" successful", log, url)
+        return Dispatcher(ws, url)
+
+    async def evict(self, url: str) -> None:
+        """Close and forget the connection to URL
+
+        Args:
+            url [str]: URL to WebSocket
+        """
+        log = f"[{type(self).__name__}.evict]"
+        dispatcher = self.connections.pop(url, None)
+        if dispatcher is None:
+            return
+        await dispatcher.close()
+        logger.info("%s WebSocket to \"%s\" evicted", log, url)
+
+    async def prune(self, urls: Iterable[str]) -> None:
+        """Evict connections whose targets are gone
+
+        Args:
+            urls [Iterable[str]]: Socket URLs of the targets still alive
+        """
+        alive = set(urls)
+        for url in [url for url in self.connections if url not in alive]:
+            await self.evict(url)
+
+    async def close_all(self) -> None:
+        """Close all connections"""
+        for url in list(self.connections):
+            await self.evict(url)
+
+
+def send_command_sync(ws: "websocket.WebSocket", method: str, params: Dict[str, Any]) -> Dict:
+    """Send a CDP command and wait for its response, skipping events
+
+    Args:
+        ws     [websocket.WebSocket]: Connection to the target
+        method [str]                : CDP method name
+        params [Dict[str, Any]]     : CDP method parameters
+
+    Returns:
+        [Dict]: The response
+    """
+    message_id = next(MESSAGE_IDS)
+    message = json.dumps({"id": message_id, "method": method, "params": params})
+    TRACE.sent(ws, message)
+    ws.send(message)
+    while True:
+        try:
+            message = ws.recv()
+        except (OSError, websocket.WebSocketException):
+            TRACE.closed(ws, remote=True)
+            raise
+        TRACE.received(ws, message)
+        response: Dict = json.loads(message)
+        if response.get("id") == message_id:
+            return response
@@ -0,0 +1,382 @@
+#!/usr/bin/env python3
+"""CPU profile of the payload in a running Discord, through the debug endpoint
+
+Run as `python -m hide_sidebars.cpu_profile` while Discord runs in debug mode,
+e.g. after `hideside.py`. Each window is profiled for the given duration, with
+the sidebar optionally toggled meanwhile, and the self and total time of the
+payload functions are reported along with how many times each was called
+"""
+
+import sys
+import json
+import asyncio
+import logging
+from pathlib import Path
+from http.client import HTTPException
+from argparse import ArgumentParser, Namespace
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Set, Tuple
+
+import websockets
+
+from hide_sidebars.action import JS_NAMES, SOURCE_URL_ROOT, Action
+from hide_sidebars.runner_obj import Runner
+from hide_sidebars.connection import AsyncConnectionPool, Dispatcher
+from hide_sidebars.http_json import JsonClient
+
+logger = logging.getLogger(__name__)
+
+TOGGLE_EXPRESSION = "toggleSidebar()"
+
+# Function name, line and column; the same function in every injected copy
+FunctionKey = Tuple[str, int, int]
+
+
+@dataclass
+class FunctionCost:
+    """Aggregated cost of one payload function
+
+    Instance variables:
+        name     [str]  : Function name, or `(anonymous)` with its position
+        self_ms  [float]: Milliseconds sampled in the function itself
+        total_ms [float]: Milliseconds sampled in the function and its callees
+        calls    [int]  : Number of calls, from precise coverage; named functions only
+    """
+
+    name: str
+    self_ms: float = 0.0
+    total_ms: float = 0.0
+    calls: int = 0
+
+
+def function_key(call_frame: Dict) -> FunctionKey:
+    """Get the aggregation key of a profile call frame
+
+    Args:
+        call_frame [Dict]: `Runtime.CallFrame`
+
+    Returns:
+        [FunctionKey]: Name, line and column
+    """
+    return (call_frame["functionName"], call_frame["lineNumber"], call_frame["columnNumber"])
+
+
+def display_name(key: FunctionKey) -> str:
+    """Format a function for the report
+
+    Args:
+        key [FunctionKey]: Name, line and column
+
+    Returns:
+        [str]: Display name
+    """
+    name, line, column = key
+    return name or f"(anonymous):{line + 1}:{column + 1}"
+
+
+def sample_durations(profile: Dict) -> List[float]:
+    """Get the microseconds each sample stands for
+    Each sample lasts until the next one; the last until the profile ends
+
+    Args:
+        profile [Dict]: `Profiler.Profile`
+
+    Returns:
+        [List[float]]: Microseconds of each sample
+    """
+    deltas: List[float] = profile.get("timeDeltas", [])
+    durations = deltas[1:]
+    if deltas:
+        durations.append(max(profile["endTime"] - profile["startTime"] - sum(deltas), 0))
+    return durations
+
+
+def aggregate(profile: Dict, urls: Set[str]) -> Dict[FunctionKey, FunctionCost]:
+    """Sum the self and total time of the payload functions
+    The payload scripts are those with a payload source URL; every function
+    in them is reported, including anonymous callbacks
+
+    Args:
+        profile [Dict]    : `Profiler.Profile`
+        urls    [Set[str]]: Source URLs of the payload scripts
+
+    Returns:
+        [Dict[FunctionKey, FunctionCost]]: Cost of each payload function
+    """
+    nodes: Dict[int, Dict] = {node["id"]: node for node in profile["nodes"]}
+    parents: Dict[int, int] = {
+        child: node["id"] for node in profile["nodes"] for child in node.get("children", [])
+    }
+    script_ids = {
+        node["callFrame"]["scriptId"] for node in nodes.values()
+        if node["callFrame"]["url"] in urls
+    }
+    self_us: Dict[int, float] = {}
+    for node_id, duration in zip(profile.get("samples", []), sample_durations(profile)):
+        self_us[node_id] = self_us.get(node_id, 0.0) + duration
+    costs: Dict[FunctionKey, FunctionCost] = {}
+    for node_id, duration in self_us.items():
+        node = nodes[node_id]
+        if node["callFrame"]["scriptId"] in script_ids:
+            key = function_key(node["callFrame"])
+            costs.setdefault(key, FunctionCost(display_name(key))).self_ms += duration / 1000
+        # Credit every payload function on the stack once, even if recursive
+        seen: Set[FunctionKey] = set()
+        current: Optional[int] = node_id
+        while current is not None:
+            call_frame = nodes[current]["callFrame"]
+            if call_frame["scriptId"] in script_ids:
+                key = function_key(call_frame)
+                if key not in seen:
+                    seen.add(key)
+                    costs.setdefault(key, FunctionCost(display_name(key))).total_ms += duration / 1000
+            current = parents.get(current)
+    return costs
+
+
+def add_calls(costs: Dict[FunctionKey, FunctionCost], coverage: List[Dict], urls: Set[str]) -> None:
+    """Add the call counts of the named payload functions from precise coverage
+    Coverage has source offsets instead of positions, so functions are matched by name
+
+    Args:
+        costs    [Dict[FunctionKey, FunctionCost]]: Cost of each payload function
+        coverage [List[Dict]]                     : `Profiler.ScriptCoverage` of all scripts
+        urls     [Set[str]]                       : Source URLs of the payload scripts
+    """
+    calls: Dict[str, int] = {}
+    for script in coverage:
+        if script["url"] not in urls:
+            continue
+        for function in script["functions"]:
+            name = function["functionName"]
+            if name and function["ranges"]:
+                calls[name] = calls.get(name, 0) + function["ranges"][0]["count"]
+    by_name = {key[0]: cost for key, cost in costs.items() if key[0]}
+    for name, count in calls.items():
+        if not count:
+            continue
+        # Called, but too quick to be sampled
+        cost = by_name.get(name) or costs.setdefault((name, -1, -1), FunctionCost(name))
+        cost.calls += count
+
+
+class CpuProfiler:
+    """Profiles the payload in the windows of a running Discord
+
+    Instance variables:
+        pool     [AsyncConnectionPool]   : Pool of connections to the windows
+        urls     [Set[str]]              : Source URLs of the payload scripts
+        duration [float]                 : Seconds to profile
+        interval [int]                   : Microseconds between samples
+        toggles  [int]                   : Number of sidebar toggles to trigger
+        gap      [float]                 : Seconds between toggles
+        output   [Optional[pathlib.Path]]: Directory to save the raw profiles to, if any
+    """
+
+    def __init__(
+        self,
+        urls: Set[str],
+        duration: float,
+        interval: int,
+        toggles: int,
+        gap: float,
+        output: Optional[Path] = None
+    ) -> None:
+        self.pool = AsyncConnectionPool()
+        self.urls = urls
+        self.duration = duration
+        self.interval = interval
+        self.toggles = toggles
+        self.gap = gap
+        self.output = output
+
+    async def run(self, windows: List[Dict[str, str]]) -> Dict[str, Dict[FunctionKey, FunctionCost]]:
+        """Profile all windows at once
+
+        Args:
+            windows [List[Dict[str, str]]]: Window infos
+
+        Returns:
+            [Dict[str, Dict[FunctionKey, FunctionCost]]]: Cost of each payload function by window title and ID
+        """
+        try:
+            reports = await asyncio.gather(*(self.profile(window) for window in windows))
+        finally:
+            await self.pool.close_all()
+        return {
+            f"{window['title']} ({window['id']})": report
+            for window, report in zip(windows, reports) if report is not None
+        }
+
+    async def profile(self, window: Dict[str, str]) -> Optional[Dict[FunctionKey, FunctionCost]]:
+        """Profile one window
+
+        Args:
+            window [Dict[str, str]]: Window info
+
+        Returns:
+            [Optional[Dict[FunctionKey, FunctionCost]]]: Cost of each payload function, if profiled
+        """
+        log = f"[{type(self).__name__}.profile]"
+        dispatcher = await self.pool.get(window[Action.SOCKET_URL_KEY])
+        if dispatcher is None:
+            return
+        try:
+            for method, params in (
+                ("Profiler.enable", {}),
+                ("Profiler.setSamplingInterval", {"interval": self.interval}),
+                ("Profiler.startPreciseCoverage", {"callCount": True, "detailed": False}),
+                ("Profiler.start", {}),
+            ):
+                response = await dispatcher.send(method, params)
+                if "error" in response:
+                    logger.warning("%s \"%s\" refused %s: %s", log, window["title"], method, response["error"])
+                    return
+            await self.toggle(window, dispatcher)
+            stopped, covered = await asyncio.gather(
+                dispatcher.send("Profiler.stop", {}),
+                dispatcher.send("Profiler.takePreciseCoverage", {}),
+            )
+            await dispatcher.send("Profiler.stopPreciseCoverage", {})
+        except (OSError, websockets.ConnectionClosed) as err:
+            logger.warning("%s WebSocket to \"%s\" failed %s", log, window["title"], err)
+            return
+        if "error" in stopped:
+            logger.warning("%s \"%s\" refused Profiler.stop: %s", log, window["title"], stopped["error"])
+            return
+        profile: Dict = stopped["result"]["profile"]
+        if self.output is not None:
+            self.output.mkdir(parents=True, exist_ok=True)
+            path = self.output / f"{window['id']}.cpuprofile"
+            path.write_text(json.dumps(profile), encoding="utf-8")
+            logger.info("%s \"%s\" profile written to \"%s\"", log, window["title"], path)
+        costs = aggregate(profile, self.urls)
+        add_calls(costs, covered.get("result", {}).get("result", []), self.urls)
+        return costs
+
+    async def toggle(self, window: Dict[str, str], dispatcher: Dispatcher) -> None:
+        """Toggle the sidebar evenly within the profiling duration
+
+        Args:
+            window     [Dict[str, str]]: Window info
+            dispatcher [Dispatcher]    : Connection to the window
+        """
+        log = f"[{type(self).__name__}.toggle]"
+        loop = asyncio.get_running_loop()
+        end = loop.time() + self.duration
+        for _ in range(self.toggles):
+            if loop.time() + self.gap > end:
+                logger.warning("%s \"%s\" out of time for more toggles", log, window["title"])
+                break
+            await asyncio.sleep(self.gap)
+            response = await dispatcher.send(
+                "Runtime.evaluate", {"expression": TOGGLE_EXPRESSION, "userGesture": True}
+            )
+            if "exceptionDetails" in response.get("result", {}) or "error" in response:
+                logger.warning("%s \"%s\" toggle failed; is the script injected?", log, window["title"])
+                break
+        await asyncio.sleep(max(end - loop.time(), 0))
+
+
+def parse_arguments() -> Namespace:
+    """Parse command line arguments
+
+    Returns:
+        [argparse.Namespace]: Parsed arguments
+    """
+    parser = ArgumentParser(description="Profile the payload in a running Discord")
+    parser.add_argument(
+        "-p", "--port",
+        default=Runner.DEFAULT_PORT,
+        type=int,
+        choices=range(65536),
+        help="Port of the debugging session",
+        metavar="{0-65535}",
+        dest="port"
+    )
+    parser.add_argument(
+        "-d", "--duration",
+        default=10.0,
+        type=float,
+        help="Seconds to profile",
+        dest="duration"
+    )
+    parser.add_argument(
+        "-i", "--interval",
+        default=100,
+        type=int,
+        help="Microseconds between samples",
+        dest="interval"
+    )
+    parser.add_argument(
+        "-t", "--toggles",
+        default=0,
+        type=int,
+        help="Number of sidebar toggles to trigger while profiling",
+        dest="toggles"
+    )
+    parser.add_argument(
+        "-g", "--gap",
+        default=0.5,
+        type=float,
+        help="Seconds between toggles",
+        dest="gap"
+    )
+    parser.add_argument(
+        "-o", "--output",
+        default=None,
+        type=Path,
+        help="Directory to save the raw profiles to, for DevTools' Performance panel",
+        dest="output"
+    )
+    parser.add_argument(
+        "-v", "--verbose",
+        action="store_true",
+        help="Use this to log to STDERR",
+        dest="verbose"
+    )
+    return parser.parse_args()
+
+
+def main() -> None:
+    """Profile every window and print a report per window"""
+    args = parse_arguments()
+    logging.basicConfig(level=logging.DEBUG if args.verbose else logging.WARNING)
+    url = Runner.URL.substitute(host=Runner.DEFAULT_HOST, port=args.port)
+    try:
+        info: List[Dict[str, str]] = JsonClient(timeout=5).get(url).json()
+    except (OSError, HTTPException, ValueError) as err:
+        print(f"No debug endpoint at {url}: {err}", file=sys.stderr)
+        sys.exit(1)
+    windows = [
+        window for window in info
+        if window.get("type") == "page"
+        and Action.SOCKET_URL_KEY in window
+        and window["title"].lower() not in Action.TITLE_BLACKLIST
+    ]
+    if not windows:
+        print("No windows to profile", file=sys.stderr)
+        sys.exit(1)
+    profiler = CpuProfiler(
+        {SOURCE_URL_ROOT + name for name in JS_NAMES.values()}, args.duration, args.interval,
+        args.toggles, args.gap, args.output
+    )
+    reports = asyncio.run(profiler.run(windows))
+    for title, costs in reports.items():
+        print(title)
+        print(f"{'function':<28} {'calls':>7} {'self':>10} {'total':>10} {'per call':>10}")
+        for cost in sorted(costs.values(), key=lambda cost: cost.total_ms, reverse=True):
+            per_call = f"{cost.total_ms / cost.calls * 1000:.1f}us" if cost.calls else "-"
+            print(
+                f"{cost.name:<28} {cost.calls:>7} {cost.self_ms:>8.2f}ms "
+                f"{cost.total_ms:>8.2f}ms {per_call:>10}"
+            )
+        if not costs:
+            print("(payload not sampled; is the script injected?)")
+        print()
+    if not reports:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -4,7 +4,7 @@
 from pathlib import Path
 from argparse import Namespace
 from dataclasses import dataclass
-from typing import Dict, Union, Optional
+from typing import Dict, List, Union, Optional
 
 
 @dataclass
@@ -13,25 +13,58 @@ class RunnerArgs(Namespace):
     Mainly used for type notation and logging
 
     Instance variables:
-        discord_path  [Optional[pathlib.Path]]: Path of Discord executable
-        port          [Optional[int]]         : Port for the debugging session to run
-        boot          [Union[bool, str, None]]: Whether to patch registry to override boot, and optionally the script path
-        minimized     [bool]                  : Whether to start Discord minimized
-        ptb           [bool]                  : Whether Discord is PTB
+        discord_path  [Optional[pathlib.Path]]      : Path of Discord executable
+        discord_paths [Optional[List[pathlib.Path]]]: Paths of Discord executables to run side by side
+        all_builds    [bool]                        : Whether to run every Discord build found in default paths
+        port          [Optional[int]]               : Port for the debugging session to run
+        boot          [Union[bool, str, None]]      : Whether to patch registry to override boot, and optionally the script path
+        minimized     [bool]                        : Whether to start Discord minimized
+        ptb           [bool]                        : Whether Discord is PTB
+        sync          [bool]                        : Whether to use the synchronous injection engine
+        attach        [bool]                        : Whether to attach to a running Discord if the port serves the debug endpoint
+        compile_once  [bool]                        : Whether to compile the payload once per page
+        supervise     [bool]                        : Whether to keep the payload live for the process lifetime
+        monitor       [Optional[float]]             : Seconds between renderer metric samples, if monitoring
+        watch         [Optional[float]]             : Seconds between checks of the payload sources, if hot-reloading
+        restart       [Optional[int]]               : Relaunches allowed in a row if Discord goes down, if restarting
+        profile       [Optional[pathlib.Path]]      : Path to write cProfile stats to, if profiling
+        record        [Optional[pathlib.Path]]      : Path to write the traffic trace to, if recording
     """
 
     discord_path: Optional[Path]
+    discord_paths: Optional[List[Path]]
+    all_builds: bool
     port: Optional[int]
     boot: Union[bool, str, None]
     minimized: bool
     ptb: bool
+    sync: bool
+    attach: bool
+    compile_once: bool
+    supervise: bool
+    monitor: Optional[float]
+    watch: Optional[float]
+    restart: Optional[int]
+    profile: Optional[Path]
+    record: Optional[Path]
 
     @classmethod
     def args_dict(cls) -> Dict:
         return {
             "discord_path": cls.discord_path,
+            "discord_paths": cls.discord_paths,
+            "all_builds": cls.all_builds,
             "port": cls.port,
             "boot": cls.boot,
             "minimized": cls.minimized,
-            "ptb": cls.ptb
+            "ptb": cls.ptb,
+            "sync": cls.sync,
+            "attach": cls.attach,
+            "compile_once": cls.compile_once,
+            "supervise": cls.supervise,
+            "monitor": cls.monitor,
+            "watch": cls.watch,
+            "restart": cls.restart,
+            "profile": cls.profile,
+            "record": cls.record,
         }
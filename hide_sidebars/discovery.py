@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""A module that discovers the debugging targets from browser events"""
+
+import asyncio
+import logging
+from string import Template
+from urllib.parse import urlsplit
+from typing import TYPE_CHECKING, AsyncIterator, Dict, Optional, Tuple
+
+from hide_sidebars.lazy import lazy_import
+from hide_sidebars.connection import Dispatcher
+
+if TYPE_CHECKING:
+    import websockets
+else:
+    websockets = lazy_import("websockets")
+
+logger = logging.getLogger(__name__)
+
+
+class TargetDiscovery:
+    """Event-driven target discovery through the browser-level socket
+
+    Class variables:
+        SOCKET_URL_KEY [str]     : Key name for socket URL
+        PAGE_URL       [Template]: Socket URL template of a page target
+        CREATED        [str]     : Event name for a created target
+        CHANGED        [str]     : Event name for a changed target
+        DESTROYED      [str]     : Event name for a destroyed target
+
+    Instance variables:
+        available  [bool]                     : Whether the browser endpoint is usable
+        dispatcher [Optional[Dispatcher]]     : Browser-level connection, if any
+        events     [Optional[asyncio.Queue]]  : Queue of the target events, if connected
+        host       [str]                      : Host and port of the browser endpoint
+        windows    [Dict[str, Dict[str, str]]]: Window infos by target ID
+    """
+
+    SOCKET_URL_KEY = "webSocketDebuggerUrl"
+    PAGE_URL = Template("ws://${host}/devtools/page/${target_id}")
+    CREATED = "Target.targetCreated"
+    CHANGED = "Target.targetInfoChanged"
+    DESTROYED = "Target.targetDestroyed"
+
+    def __init__(self) -> None:
+        self.available = True
+        self.dispatcher: Optional[Dispatcher] = None
+        self.events: Optional[asyncio.Queue] = None
+        self.host = ""
+        self.windows: Dict[str, Dict[str, str]] = {}
+
+    async def connect(self, url: str) -> bool:
+        """Connect to the browser endpoint and subscribe to target events
+
+        Args:
+            url [str]: Browser-level socket URL
+
+        Returns:
+            [bool]: Whether the subscription is successful
+        """
+        log = f"[{type(self).__name__}.connect]"
+        await self.close()
+        try:
+            self.dispatcher = Dispatcher(await websockets.connect(
+                url, max_size=None, ping_interval=None
+            ), url)
+            # Subscribe first, since the existing targets are announced at once
+            self.events = self.dispatcher.subscribe(self.CREATED, self.CHANGED, self.DESTROYED)
+            response = await self.dispatcher.send(
+                "Target.setDiscoverTargets", {"discover": True}
+            )
+        except (OSError, websockets.InvalidHandshake, websockets.ConnectionClosed) as err:
+            # Possibly the program has exited
+            logger.warning("%s Browser socket \"%s\" failed %s", log, url, err)
+            await self.close()
+            return False
+        if "error" in response:
+            logger.warning("%s Browser socket \"%s\" refused %s", log, url, response["error"])
+            await self.close()
+            return False
+        self.host = urlsplit(url).netloc
+        logger.info("%s Browser socket \"%s\" subscribed", log, url)
+        return True
+
+    async def watch(self) -> AsyncIterator[Tuple[str, Dict[str, str]]]:
+        """Yield target events until the browser socket closes
+
+        Yields:
+            [Tuple[str, Dict[str, str]]]: Event name and window info
+        """
+        log = f"[{type(self).__name__}.watch]"
+        if self.events is None:
+            return
+        while (event := await self.events.get()) is not None:
+            method = event.get("method")
+            if method in (self.CREATED, self.CHANGED):
+                window = self.to_window(event["params"]["targetInfo"])
+                self.windows[window["id"]] = window
+                logger.debug("%s %s: \"%s\"", log, method, window['title'])
+                yield method, window
+            elif method == self.DESTROYED:
+                window = self.windows.pop(event["params"]["targetId"], None)
+                if window is not None:
+                    logger.debug("%s %s: \"%s\"", log, method, window['title'])
+                    yield method, window
+        # Possibly the program has exited
+        logger.warning("%s Browser socket closed", log)
+        await self.close()
+
+    def to_window(self, target_info: Dict[str, str]) -> Dict[str, str]:
+        """Convert `Target.TargetInfo` into the window info format of `/json`
+
+        Args:
+            target_info [Dict[str, str]]: Target info from the event
+
+        Returns:
+            [Dict[str, str]]: Window info
+        """
+        target_id = target_info["targetId"]
+        return {
+            "id": target_id,
+            "type": target_info["type"],
+            "title": target_info["title"],
+            "url": target_info["url"],
+            self.SOCKET_URL_KEY: self.PAGE_URL.substitute(
+                host=self.host, target_id=target_id
+            ),
+        }
+
+    async def close(self) -> None:
+        """Close the browser socket, if any"""
+        if self.dispatcher is not None:
+            await self.dispatcher.close()
+            self.dispatcher = None
+            self.events = None
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""A module that finds the newest Discord executable, through an on-disk index"""
+
+import re
+import json
+import logging
+from pathlib import Path, PurePath
+from typing import Dict, List, Optional, Tuple
+
+from hide_sidebars.cache import cache_path, write_text
+
+logger = logging.getLogger(__name__)
+
+INDEX_NAME = "executables.json"
+VERSION_PATTERN = re.compile(r"\d+(?:\.\d+)+")
+WILDCARD_PATTERN = re.compile(r"[*?\[]")
+
+Version = Tuple[int, ...]
+
+
+def parse_version(path: PurePath) -> Version:
+    """Get the version in the path, e.g. `1.0.9003` of `app-1.0.9003`
+
+    Args:
+        path [pathlib.PurePath]: Path relative to the install root
+
+    Returns:
+        [Version]: Version numbers; empty if none
+    """
+    for part in reversed(path.parts):
+        match = VERSION_PATTERN.search(part)
+        if match is not None:
+            return tuple(int(number) for number in match.group().split("."))
+    return ()
+
+
+def watched_dir(root: Path, pattern: str) -> Path:
+    """Get the directory whose entries the pattern's first wildcard expands
+    New builds show up as new entries, so its mtime invalidates the index
+
+    Args:
+        root    [pathlib.Path]: Install root
+        pattern [str]         : glob pattern under the root
+
+    Returns:
+        [pathlib.Path]: The directory
+    """
+    directory = root
+    for part in PurePath(pattern).parts:
+        if WILDCARD_PATTERN.search(part) is not None:
+            break
+        directory /= part
+    return directory
+
+
+def scan(root: Path, pattern: str) -> List[Dict]:
+    """Glob the executables and sort them by version, oldest first
+
+    Args:
+        root    [pathlib.Path]: Install root
+        pattern [str]         : glob pattern under the root
+
+    Returns:
+        [List[Dict]]: Path and version of each executable
+    """
+    found = [
+        {"path": str(path), "version": list(parse_version(path.relative_to(root)))}
+        for path in root.glob(pattern)
+    ]
+    found.sort(key=lambda entry: (entry["version"], entry["path"]))
+    return found
+
+
+def newest_executable(root: Path, pattern: str) -> Optional[Path]:
+    """Get the newest executable matching the pattern
+    The index is reused while the watched directory is unchanged
+
+    Args:
+        root    [pathlib.Path]: Install root
+        pattern [str]         : glob pattern under the root
+
+    Returns:
+        [Optional[pathlib.Path]]: The newest executable, if any
+    """
+    log = "[newest_executable]"
+    index_path = cache_path(INDEX_NAME)
+    try:
+        index: Dict[str, Dict] = json.loads(index_path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        index = {}
+    key = str(root / pattern)
+    try:
+        mtime: Optional[int] = watched_dir(root, pattern).stat().st_mtime_ns
+    except OSError:
+        mtime = None
+    entry = index.get(key)
+    if (
+        entry is not None
+        and entry["mtime"] == mtime
+        and (not entry["found"] or Path(entry["found"][-1]["path"]).is_file())
+    ):
+        logger.debug("%s Index hit for \"%s\"", log, key)
+    else:
+        logger.debug("%s Index miss for \"%s\"; scanning", log, key)
+        entry = {"mtime": mtime, "found": scan(root, pattern)}
+        index[key] = entry
+        try:
+            write_text(index_path, json.dumps(index, indent=2))
+        except OSError as err:
+            logger.warning("%s Index of \"%s\" not cached %s", log, key, err)
+    if not entry["found"]:
+        return
+    newest = entry["found"][-1]
+    logger.info(
+        "%s Newest of %s: \"%s\" (version %s)",
+        log, len(entry["found"]), newest["path"], ".".join(map(str, newest["version"])) or "-"
+    )
+    return Path(newest["path"])
@@ -0,0 +1,358 @@
+#!/usr/bin/env python3
+"""A module that stands in for Discord's debug endpoint
+Serves `/json`, `/json/version`, the browser socket and the page sockets,
+so the injector can be exercised without Discord or network access
+
+Run as `python -m hide_sidebars.fake_devtools --remote-debugging-port=PORT`
+"""
+
+import re
+import sys
+import json
+import http
+import asyncio
+import logging
+from time import monotonic, time
+from argparse import ArgumentParser
+from typing import Dict, List, Optional, Tuple
+
+import websockets
+
+from hide_sidebars.page_ready import DOCUMENT_READY, READY_EXPRESSION
+from hide_sidebars.action import JS_NAMES, SOURCE_URL_ROOT
+
+logger = logging.getLogger(__name__)
+
+# Arguments of the class name query of `hide_sidebars.class_names`
+QUERY_PATTERN = re.compile(r'\((\{"prefixes": .*\})\)$')
+# Script the payload runs as, in made-up profiles and coverage
+PAYLOAD_SCRIPT_ID = "42"
+PAYLOAD_URL = SOURCE_URL_ROOT + JS_NAMES["init"]
+
+Headers = List[Tuple[str, str]]
+
+
+class FakeDevTools:
+    """Fake DevTools endpoint with a number of page targets
+
+    Class variables:
+        HOST              [str]      : Host to listen on
+        SOCKET_URL_KEY    [str]      : Key name for socket URL
+        BROWSER_PATH      [str]      : Path of the browser-level socket
+        HEAP_SIZE         [int]      : Reported heap bytes of an untouched page
+        PAYLOAD_HEAP_SIZE [int]      : Reported heap bytes added by each payload run
+        USER_AGENT        [str]      : User agent of the pages
+        CLASS_NAMES       [List[str]]: Class names in the DOM of the pages, some rehashed
+
+    Instance variables:
+        port      [int]           : Port to listen on
+        targets   [int]           : Number of page targets
+        delay     [float]         : Seconds to wait before each response
+        startup   [float]         : Seconds to wait before listening
+        load      [float]         : Seconds from listening until the documents are loaded
+        loaded_at [float]         : Time the documents are loaded
+        polls     [bool]          : Whether to print the wall time of each `/json` poll
+        next_id   [int]           : Counter for compiled script IDs
+        scripts   [Dict[str, str]]: Compiled script sources by script ID
+        evaluated [Dict[str, int]]: Number of payload runs by target ID
+    """
+
+    HOST = "127.0.0.1"
+    SOCKET_URL_KEY = "webSocketDebuggerUrl"
+    BROWSER_PATH = "/devtools/browser/fake"
+    HEAP_SIZE = 8 * 1024 * 1024
+    PAYLOAD_HEAP_SIZE = 64 * 1024
+    USER_AGENT = "Mozilla/5.0 discord/0.0.0-fake Chrome/91.0.4472.164 Electron/13.6.6"
+    CLASS_NAMES = [
+        "toolbar-f4k3Ab", "sidebar-f4k3Cd", "chat-3bRxxu", "content-98HsJk",
+        "wrapper-f4k3Ef", "wrapper-f4k3Gh", "iconWrapper-2OrFZ1",
+    ]
+
+    def __init__(
+        self,
+        port: int,
+        targets: int = 1,
+        delay: float = 0.0,
+        startup: float = 0.0,
+        load: float = 0.0,
+        polls: bool = False
+    ) -> None:
+        self.port = port
+        self.targets = targets
+        self.delay = delay
+        self.startup = startup
+        self.load = load
+        self.loaded_at = 0.0
+        self.polls = polls
+        self.next_id = 0
+        self.scripts: Dict[str, str] = {}
+        self.evaluated: Dict[str, int] = {}
+
+    def target_infos(self) -> List[Dict]:
+        """Get `Target.TargetInfo` of all page targets
+
+        Returns:
+            [List[Dict]]: Target infos
+        """
+        return [
+            {
+                "targetId": f"FAKE{index:04d}",
+                "type": "page",
+                "title": "Discord",
+                "url": "https://discord.com/channels/@me",
+                "attached": False,
+            }
+            for index in range(self.targets)
+        ]
+
+    def windows(self) -> List[Dict[str, str]]:
+        """Get window infos in the format of `/json`
+
+        Returns:
+            [List[Dict[str, str]]]: Window infos
+        """
+        return [
+            {
+                "id": info["targetId"],
+                "type": info["type"],
+                "title": info["title"],
+                "url": info["url"],
+                self.SOCKET_URL_KEY: f"ws://{self.HOST}:{self.port}/devtools/page/{info['targetId']}",
+            }
+            for info in self.target_infos()
+        ]
+
+    async def process_request(self, path: str, headers) -> Optional[Tuple[http.HTTPStatus, Headers, bytes]]:
+        """Answer plain HTTP requests; let socket upgrades through
+
+        Args:
+            path    [str]                              : Requested path
+            headers [websockets.datastructures.Headers]: Request headers
+
+        Returns:
+            [Optional[Tuple[http.HTTPStatus, Headers, bytes]]]: HTTP response, or `None` to upgrade
+        """
+        if path.startswith("/devtools/"):
+            return
+        if path.rstrip("/") == "/json/version":
+            body = {
+                "Browser": "Chrome/91.0.4472.164",
+                "Protocol-Version": "1.3",
+                self.SOCKET_URL_KEY: f"ws://{self.HOST}:{self.port}{self.BROWSER_PATH}",
+            }
+        elif path.rstrip("/") in ("/json", "/json/list"):
+            if self.polls:
+                print(f"Polled at {time():.6f}", flush=True)
+            body = self.windows()
+        else:
+            return http.HTTPStatus.NOT_FOUND, [], b""
+        return (
+            http.HTTPStatus.OK,
+            [("Content-Type", "application/json")],
+            json.dumps(body).encode()
+        )
+
+    async def handle(self, ws: websockets.WebSocketServerProtocol, path: str) -> None:
+        """Answer the commands of one socket
+
+        Args:
+            ws   [websockets.WebSocketServerProtocol]: Connection to the client
+            path [str]                               : Socket path
+        """
+        target_id = path.rsplit("/", 1)[-1]
+        try:
+            async for message in ws:
+                command: Dict = json.loads(message)
+                if self.delay:
+                    await asyncio.sleep(self.delay)
+                expression: str = command.get("params", {}).get("expression", "")
+                if command.get("method") == "Page.enable":
+                    asyncio.ensure_future(self.fire_loaded(ws))
+                elif READY_EXPRESSION in expression and expression != READY_EXPRESSION:
+                    # The promise settles once the document loads
+                    await asyncio.sleep(max(self.loaded_at - monotonic(), 0))
+                for reply in self.answer(target_id, command):
+                    await ws.send(json.dumps(reply))
+        except websockets.ConnectionClosed:
+            pass
+
+    async def fire_loaded(self, ws: websockets.WebSocketServerProtocol) -> None:
+        """Send the document loaded event once the documents load, if not yet
+
+        Args:
+            ws [websockets.WebSocketServerProtocol]: Connection to the client
+        """
+        if monotonic() >= self.loaded_at:
+            return
+        await asyncio.sleep(self.loaded_at - monotonic())
+        try:
+            await ws.send(json.dumps({"method": DOCUMENT_READY, "params": {"timestamp": monotonic()}}))
+        except websockets.ConnectionClosed:
+            pass
+
+    def answer(self, target_id: str, command: Dict) -> List[Dict]:
+        """Build the replies to a command, events first
+
+        Args:
+            target_id [str] : ID of the target, or of the browser
+            command   [Dict]: The command
+
+        Returns:
+            [List[Dict]]: Replies
+        """
+        method = command.get("method")
+        params: Dict = command.get("params", {})
+        replies: List[Dict] = []
+        result: Dict = {}
+        if method == "Target.setDiscoverTargets":
+            replies.extend(
+                {"method": "Target.targetCreated", "params": {"targetInfo": info}}
+                for info in self.target_infos()
+            )
+        elif method == "Runtime.evaluate":
+            result = self.run(target_id, params.get("expression", ""))
+        elif method == "Runtime.compileScript":
+            self.next_id += 1
+            script_id = str(self.next_id)
+            self.scripts[script_id] = params.get("expression", "")
+            result = {"scriptId": script_id}
+        elif method == "Runtime.runScript":
+            if params.get("scriptId") not in self.scripts:
+                return [{
+                    "id": command.get("id"),
+                    "error": {"code": -32000, "message": "Invalid script id"},
+                }]
+            result = self.run(target_id, self.scripts[params["scriptId"]])
+        elif method == "Page.addScriptToEvaluateOnNewDocument":
+            result = {"identifier": "1"}
+        elif method == "Profiler.stop":
+            result = {"profile": self.profile(target_id)}
+        elif method == "Profiler.takePreciseCoverage":
+            runs = self.evaluated.get(target_id, 0)
+            result = {"result": [{
+                "scriptId": PAYLOAD_SCRIPT_ID,
+                "url": PAYLOAD_URL,
+                "functions": [
+                    {"functionName": name, "isBlockCoverage": False,
+                     "ranges": [{"startOffset": 0, "endOffset": 1, "count": runs}]}
+                    for name in ("checkSidebarMutation", "discordHideSidebar")
+                ],
+            }]}
+        elif method == "Runtime.getHeapUsage":
+            used = self.HEAP_SIZE + self.PAYLOAD_HEAP_SIZE * self.evaluated.get(target_id, 0)
+            result = {"usedSize": used, "totalSize": 2 * used}
+        elif method == "Performance.getMetrics":
+            runs = self.evaluated.get(target_id, 0)
+            result = {"metrics": [
+                {"name": "Nodes", "value": 1000 + 50 * runs},
+                {"name": "LayoutCount", "value": 10 + runs},
+                {"name": "TaskDuration", "value": 0.5 + 0.01 * runs},
+            ]}
+        replies.append({"id": command.get("id"), "result": result})
+        return replies
+
+    def profile(self, target_id: str) -> Dict:
+        """Make up a `Profiler.Profile` with the payload on the stack of every
+        other sample, once per payload run
+
+        Args:
+            target_id [str]: ID of the target
+
+        Returns:
+            [Dict]: The profile
+        """
+        def node(node_id: int, name: str, script_id: str, children: List[int]) -> Dict:
+            return {
+                "id": node_id,
+                "callFrame": {
+                    "functionName": name, "scriptId": script_id,
+                    "url": PAYLOAD_URL if script_id == PAYLOAD_SCRIPT_ID else "",
+                    "lineNumber": node_id, "columnNumber": 0,
+                },
+                "children": children,
+            }
+
+        runs = self.evaluated.get(target_id, 0)
+        samples = [1, 4] * runs
+        return {
+            "nodes": [
+                node(1, "(root)", "0", [2, 3]),
+                node(2, "(program)", "0", []),
+                node(3, "checkSidebarMutation", PAYLOAD_SCRIPT_ID, [4]),
+                node(4, "discordHideSidebar", PAYLOAD_SCRIPT_ID, []),
+            ],
+            "startTime": 0,
+            "endTime": 100 * len(samples),
+            "samples": samples,
+            "timeDeltas": [100] * len(samples),
+        }
+
+    def run(self, target_id: str, expression: str) -> Dict:
+        """Pretend to run a payload
+
+        Args:
+            target_id  [str]: ID of the target
+            expression [str]: JavaScript source
+
+        Returns:
+            [Dict]: `Runtime.evaluate` result
+        """
+        if READY_EXPRESSION in expression:
+            return {"result": {"type": "boolean", "value": monotonic() >= self.loaded_at}}
+        if expression == "navigator.userAgent":
+            return {"result": {"type": "string", "value": self.USER_AGENT}}
+        match = QUERY_PATTERN.search(expression)
+        if match is not None:
+            prefixes: List[str] = json.loads(match.group(1))["prefixes"]
+            found: Dict[str, List[str]] = {}
+            for name in self.CLASS_NAMES:
+                prefix = name.rsplit("-", 1)[0]
+                if prefix in prefixes:
+                    found.setdefault(prefix, []).append(name)
+            return {"result": {"type": "object", "value": found}}
+        self.evaluated[target_id] = self.evaluated.get(target_id, 0) + 1
+        return {"result": {"type": "undefined"}}
+
+    async def serve(self) -> None:
+        """Listen until cancelled"""
+        if self.startup:
+            await asyncio.sleep(self.startup)
+        async with websockets.serve(
+            self.handle,
+            self.HOST,
+            self.port,
+            process_request=self.process_request,
+            max_size=None,
+            ping_interval=None
+        ):
+            self.loaded_at = monotonic() + self.load
+            # Same announcement as Chromium, for readiness detection
+            print(
+                f"DevTools listening on ws://{self.HOST}:{self.port}{self.BROWSER_PATH}",
+                file=sys.stderr,
+                flush=True
+            )
+            await asyncio.Future()
+
+
+def main() -> None:
+    """Parse arguments like Discord would get them, and serve"""
+    parser = ArgumentParser(description="Fake Discord debug endpoint")
+    parser.add_argument("--remote-debugging-port", type=int, required=True, dest="port")
+    parser.add_argument("--targets", type=int, default=1, help="Number of page targets")
+    parser.add_argument("--delay", type=float, default=0.0, help="Milliseconds before each response")
+    parser.add_argument("--startup", type=float, default=0.0, help="Milliseconds before listening")
+    parser.add_argument("--load", type=float, default=0.0, help="Milliseconds from listening until the documents load")
+    parser.add_argument("--polls", action="store_true", help="Print the wall time of each `/json` poll")
+    args, _ = parser.parse_known_args()
+    server = FakeDevTools(
+        args.port, args.targets, args.delay / 1000, args.startup / 1000, args.load / 1000, args.polls
+    )
+    try:
+        asyncio.run(server.serve())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,434 @@
+#!/usr/bin/env python3
+"""Injection across a fleet of Discord debug endpoints, e.g. in sandboxes or VMs
+
+Run as `python -m hide_sidebars.fleet -e ENDPOINTS`, where the file lists one
+`host:port` per line; `#` starts a comment. Endpoints are attached to, never
+launched, a bounded number at a time and each within a timeout. A report of
+every endpoint and of the whole fleet is printed, and the exit code is `1`
+unless every endpoint got injected
+
+With `-k COUNT`, that many fake endpoints are started locally and added to
+the fleet, so the fleet mode can be tried without any Discord
+"""
+
+import sys
+import asyncio
+import tempfile
+import logging
+import statistics
+import subprocess
+from pathlib import Path
+from time import monotonic
+from urllib.parse import urlsplit
+from argparse import ArgumentParser, Namespace
+from dataclasses import dataclass
+from typing import List, NamedTuple, Optional
+
+from hide_sidebars.measure_utils import free_port, ms, percentile
+from hide_sidebars.runner_obj import Runner
+from hide_sidebars.cache import use_cache_dir
+from hide_sidebars.targets import TargetRegistry
+from hide_sidebars.http_json import JsonClient
+from hide_sidebars.process_watch import OutputReader, probe_port
+from hide_sidebars.custom_types import RunnerArgs
+
+logger = logging.getLogger(__name__)
+
+FAKE_READY_TIMEOUT = 10.0
+
+
+class Endpoint(NamedTuple):
+    """A debug endpoint
+
+    Instance variables:
+        host [str]: Host name or address, without brackets
+        port [int]: Port
+    """
+
+    host: str
+    port: int
+
+    @property
+    def url_host(self) -> str:
+        """Host as it goes in a URL, with IPv6 addresses bracketed"""
+        return f"[{self.host}]" if ":" in self.host else self.host
+
+    def __str__(self) -> str:
+        return f"{self.url_host}:{self.port}"
+
+
+@dataclass
+class EndpointResult:
+    """Outcome of one endpoint
+
+    Instance variables:
+        endpoint [str]            : The endpoint, as `host:port`
+        status   [str]            : One of the statuses of `Fleet`
+        windows  [int]            : Number of windows injected
+        latency  [Optional[float]]: Seconds from the endpoint's turn to its first injection, if injected
+        total    [float]          : Seconds the endpoint's turn took
+    """
+
+    endpoint: str
+    status: str = ""
+    windows: int = 0
+    latency: Optional[float] = None
+    total: float = 0.0
+
+
+def parse_endpoint(text: str) -> Endpoint:
+    """Parse `host:port`, with IPv6 hosts in brackets
+
+    Args:
+        text [str]: The endpoint
+
+    Returns:
+        [Endpoint]: The parsed endpoint
+
+    Raises:
+        [ValueError]: The text is not `host:port`
+    """
+    parts = urlsplit(f"//{text}")
+    if not parts.hostname or parts.port is None:
+        raise ValueError(f"\"{text}\" is not host:port!")
+    return Endpoint(parts.hostname, parts.port)
+
+
+def read_endpoints(path: Path) -> List[Endpoint]:
+    """Read the endpoints listed in a file, one per line, skipping duplicates
+
+    Args:
+        path [pathlib.Path]: The file
+
+    Returns:
+        [List[Endpoint]]: The endpoints in order
+
+    Raises:
+        [ValueError]: A line is not `host:port`
+    """
+    endpoints: List[Endpoint] = []
+    for number, line in enumerate(path.read_text(encoding="utf-8").splitlines(), 1):
+        line = line.split("#", 1)[0].strip()
+        if not line:
+            continue
+        try:
+            endpoint = parse_endpoint(line)
+        except ValueError as err:
+            raise ValueError(f"{path}:{number}: {err}") from None
+        if endpoint not in endpoints:
+            endpoints.append(endpoint)
+    return endpoints
+
+
+class EndpointRunner(Runner):
+    """Runner that attaches to a debug endpoint on any host, and never launches Discord
+
+    Instance variables:
+        endpoint [Endpoint]: The endpoint
+    """
+
+    def __init__(self, endpoint: Endpoint, timeout: float) -> None:
+        super().__init__(RunnerArgs(
+            # Never launched; only required to be a file
+            discord_path=Path(sys.executable),
+            discord_paths=None,
+            all_builds=False,
+            port=endpoint.port,
+            boot=None,
+            minimized=False,
+            ptb=False,
+            sync=False,
+            attach=True,
+            compile_once=False,
+            supervise=False,
+            monitor=None,
+            watch=None,
+            restart=None,
+            profile=None,
+            record=None
+        ))
+        self.endpoint = endpoint
+        self.host = endpoint.host
+        self.url = self.URL.substitute(host=endpoint.url_host, port=endpoint.port)
+        self.version_url = self.VERSION_URL.substitute(host=endpoint.url_host, port=endpoint.port)
+        self.http = JsonClient(timeout)
+        self.name = str(endpoint)
+
+    def reach(self) -> bool:
+        """Check that the endpoint serves the window list, and start its clock
+
+        Returns:
+            [bool]: Whether the endpoint is reachable
+        """
+        self.launched = monotonic()
+        self.attached = probe_port(self.host, self.port) and self.get_info() is not None
+        return self.attached
+
+    def kill_running(self) -> None:
+        """Never kill anything on another host"""
+
+    def patch_boot(self) -> None:
+        """Never patch boot on another host"""
+
+
+class Fleet:
+    """Injects into many debug endpoints concurrently, a bounded number at a time
+
+    Class variables:
+        INJECTED    [str]: Status of an endpoint with a window injected
+        FAILED      [str]: Status of a reachable endpoint with no window injected
+        UNREACHABLE [str]: Status of an endpoint not serving the window list
+        TIMED_OUT   [str]: Status of an endpoint that ran out of time
+        ERRORED     [str]: Status of an endpoint that raised
+
+    Instance variables:
+        runners [List[EndpointRunner]]: Runner of each endpoint
+        limit   [int]                 : Number of endpoints handled at once
+        timeout [float]               : Seconds each endpoint gets
+    """
+
+    INJECTED = "injected"
+    FAILED = "failed"
+    UNREACHABLE = "unreachable"
+    TIMED_OUT = "timed out"
+    ERRORED = "error"
+
+    def __init__(self, endpoints: List[Endpoint], limit: int, timeout: float) -> None:
+        self.runners = [EndpointRunner(endpoint, timeout) for endpoint in endpoints]
+        self.limit = limit
+        self.timeout = timeout
+
+    async def run(self) -> List[EndpointResult]:
+        """Inject into every endpoint
+
+        Returns:
+            [List[EndpointResult]]: Outcome of each endpoint, in order
+        """
+        # Made on the running loop, for Python 3.8 and 3.9
+        semaphore = asyncio.Semaphore(self.limit)
+        return list(await asyncio.gather(*(
+            self.inject(runner, semaphore) for runner in self.runners
+        )))
+
+    async def inject(self, runner: EndpointRunner, semaphore: asyncio.Semaphore) -> EndpointResult:
+        """Inject into one endpoint once a slot is free
+
+        Args:
+            runner    [EndpointRunner]   : Runner of the endpoint
+            semaphore [asyncio.Semaphore]: Bounds the endpoints handled at once
+
+        Returns:
+            [EndpointResult]: Outcome of the endpoint
+        """
+        log = f"[{type(self).__name__}.inject]"
+        result = EndpointResult(runner.name)
+        async with semaphore:
+            started = monotonic()
+            try:
+                result.status = await asyncio.wait_for(self.attach_and_inject(runner), self.timeout)
+            except asyncio.TimeoutError:
+                result.status = self.TIMED_OUT
+            except Exception:
+                # One endpoint failing should not take the others down
+                logger.exception("%s %s failed", log, runner.name)
+                result.status = self.ERRORED
+            result.total = monotonic() - started
+        result.windows = sum(
+            record.state == TargetRegistry.INJECTED
+            for record in runner.target_states.records.values()
+        )
+        result.latency = runner.injected_after
+        logger.info("%s %s %s in %.3fs", log, runner.name, result.status, result.total)
+        return result
+
+    async def attach_and_inject(self, runner: EndpointRunner) -> str:
+        """Attach to an endpoint and inject into its windows
+
+        Args:
+            runner [EndpointRunner]: Runner of the endpoint
+
+        Returns:
+            [str]: Status of the endpoint
+        """
+        loop = asyncio.get_running_loop()
+        try:
+            if not await loop.run_in_executor(None, runner.reach):
+                return self.UNREACHABLE
+            return self.INJECTED if await runner.inject_async() else self.FAILED
+        finally:
+            runner.http.close()
+
+
+def start_fakes(count: int, targets: int, delay: float) -> List[subprocess.Popen]:
+    """Start fake debug endpoints on free local ports, and wait until they listen
+
+    Args:
+        count   [int]  : Number of endpoints
+        targets [int]  : Number of windows of each endpoint
+        delay   [float]: Milliseconds before each response
+
+    Returns:
+        [List[subprocess.Popen]]: The processes; their ports are in their arguments
+    """
+    processes: List[subprocess.Popen] = []
+    readers: List[OutputReader] = []
+    for _ in range(count):
+        process = subprocess.Popen(
+            [
+                sys.executable, "-m", "hide_sidebars.fake_devtools",
+                Runner.DEBUG_PARAMETER.substitute(port=free_port()),
+                "--targets", str(targets),
+                "--delay", str(delay),
+            ],
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE
+        )
+        processes.append(process)
+        readers.append(OutputReader(process))
+    deadline = monotonic() + FAKE_READY_TIMEOUT
+    for reader in readers:
+        reader.ready.wait(max(deadline - monotonic(), 0))
+    return processes
+
+
+def fake_endpoint(process: subprocess.Popen) -> Endpoint:
+    """Get the endpoint of a fake started by `start_fakes`
+
+    Args:
+        process [subprocess.Popen]: The fake
+
+    Returns:
+        [Endpoint]: Its endpoint
+    """
+    parameter = next(arg for arg in process.args if arg.startswith("--remote-debugging-port="))
+    return Endpoint("127.0.0.1", int(parameter.split("=", 1)[1]))
+
+
+def parse_arguments() -> Namespace:
+    """Parse command line arguments
+
+    Returns:
+        [argparse.Namespace]: Parsed arguments
+    """
+    parser = ArgumentParser(description="Inject into a fleet of Discord debug endpoints")
+    parser.add_argument(
+        "-e", "--endpoints",
+        default=None,
+        type=Path,
+        help="File listing one host:port per line",
+        dest="endpoints"
+    )
+    parser.add_argument(
+        "-j", "--jobs",
+        default=8,
+        type=int,
+        help="Number of endpoints handled at once",
+        dest="jobs"
+    )
+    parser.add_argument(
+        "-t", "--timeout",
+        default=30.0,
+        type=float,
+        help="Seconds each endpoint gets",
+        dest="timeout"
+    )
+    parser.add_argument(
+        "-k", "--fake",
+        default=0,
+        type=int,
+        help="Number of fake endpoints to start locally and add to the fleet",
+        metavar="COUNT",
+        dest="fake"
+    )
+    parser.add_argument(
+        "-n", "--targets",
+        default=1,
+        type=int,
+        help="Number of windows of each fake endpoint",
+        dest="targets"
+    )
+    parser.add_argument(
+        "-l", "--delay",
+        default=0.0,
+        type=float,
+        help="Milliseconds of response delay of each fake endpoint",
+        dest="delay"
+    )
+    parser.add_argument(
+        "-v", "--verbose",
+        action="store_true",
+        help="Use this to log to STDERR",
+        dest="verbose"
+    )
+    args = parser.parse_args()
+    if args.endpoints is None and not args.fake:
+        parser.error("give an endpoints file, fake endpoints, or both")
+    if args.jobs < 1:
+        parser.error("at least one endpoint has to be handled at a time")
+    return args
+
+
+def report(results: List[EndpointResult], wall: float) -> None:
+    """Print the outcome of every endpoint and of the fleet
+
+    Args:
+        results [List[EndpointResult]]: Outcome of each endpoint
+        wall    [float]               : Seconds the whole fleet took
+    """
+    width = max([len("endpoint")] + [len(result.endpoint) for result in results])
+    print(f"{'endpoint':<{width}} {'status':<11} {'windows':>7} {'latency':>9} {'total':>9}")
+    for result in results:
+        print(
+            f"{result.endpoint:<{width}} {result.status:<11} {result.windows:>7} "
+            f"{ms(result.latency):>9} {ms(result.total):>9}"
+        )
+    latencies = [result.latency for result in results if result.latency is not None]
+    injected = sum(result.status == Fleet.INJECTED for result in results)
+    print(
+        f"{injected}/{len(results)} endpoints injected, "
+        f"{sum(result.windows for result in results)} windows, in {ms(wall)}; latency "
+        f"p50 {ms(statistics.median(latencies) if latencies else None)}, "
+        f"p95 {ms(percentile(latencies, 0.95) if latencies else None)}, "
+        f"max {ms(max(latencies) if latencies else None)}"
+    )
+
+
+def main() -> None:
+    """Inject into every endpoint and print the report"""
+    args = parse_arguments()
+    logging.basicConfig(level=logging.DEBUG if args.verbose else logging.WARNING)
+    endpoints: List[Endpoint] = []
+    if args.endpoints is not None:
+        try:
+            endpoints = read_endpoints(args.endpoints)
+        except (OSError, ValueError) as err:
+            print(f"Endpoints not read: {err}", file=sys.stderr)
+            sys.exit(2)
+    fakes = start_fakes(args.fake, args.targets, args.delay) if args.fake else []
+    cache_dir = None
+    if fakes:
+        # Fake endpoints report a made-up Discord version; keep it out of the real cache
+        cache_dir = tempfile.TemporaryDirectory(prefix="dhs-fleet-")
+        use_cache_dir(Path(cache_dir.name))
+    try:
+        endpoints += [fake_endpoint(process) for process in fakes]
+        if not endpoints:
+            print("No endpoints", file=sys.stderr)
+            sys.exit(1)
+        fleet = Fleet(endpoints, args.jobs, args.timeout)
+        started = monotonic()
+        results = asyncio.run(fleet.run())
+        report(results, monotonic() - started)
+    finally:
+        for process in fakes:
+            process.terminate()
+        for process in fakes:
+            process.wait()
+        if cache_dir is not None:
+            cache_dir.cleanup()
+    if any(result.status != Fleet.INJECTED for result in results):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
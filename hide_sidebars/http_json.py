@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""A module that GETs JSON from the debug endpoint
+Only the standard library is used, and the connection is kept alive between
+polls, so polling neither imports nor reconnects anything heavy
+"""
+
+import json
+import logging
+import threading
+from urllib.parse import urlsplit
+from http.client import HTTPConnection, HTTPException
+from typing import Any, NamedTuple, Optional
+
+from hide_sidebars.trace import TRACE
+
+logger = logging.getLogger(__name__)
+
+TIMEOUT = 10.0
+
+
+class JsonResponse(NamedTuple):
+    """A response read in full
+
+    Instance variables:
+        status_code [int]: HTTP status
+        text        [str]: Body
+    """
+
+    status_code: int
+    text: str
+
+    def json(self) -> Any:
+        """Parse the body
+
+        Returns:
+            [Any]: The JSON object
+        """
+        return json.loads(self.text)
+
+
+class JsonClient:
+    """GETs over one kept-alive connection, reconnecting when it goes stale
+    Safe to share across executor threads; requests take turns
+
+    Instance variables:
+        timeout    [float]                   : Seconds to wait for the endpoint
+        netloc     [Optional[str]]           : Host and port of the connection
+        connection [Optional[HTTPConnection]]: The connection, if open
+        lock       [threading.Lock]          : Lets one request use the connection at a time
+    """
+
+    def __init__(self, timeout: float = TIMEOUT) -> None:
+        self.timeout = timeout
+        self.netloc: Optional[str] = None
+        self.connection: Optional[HTTPConnection] = None
+        self.lock = threading.Lock()
+
+    def get(self, url: str) -> JsonResponse:
+        """GET URL
+        A kept-alive connection the endpoint has since dropped is retried once
+        on a new connection; a new connection that fails is not
+
+        Args:
+            url [str]: URL to GET
+
+        Returns:
+            [JsonResponse]: The response
+
+        Raises:
+            [OSError]      : The endpoint is unreachable
+            [HTTPException]: The endpoint broke the protocol
+        """
+        log = f"[{type(self).__name__}.get]"
+        parts = urlsplit(url)
+        path = parts.path or "/"
+        with self.lock:
+            if parts.netloc != self.netloc:
+                self.close()
+                self.netloc = parts.netloc
+            while True:
+                reused = self.connection is not None
+                if self.connection is None:
+                    self.connection = HTTPConnection(parts.netloc, timeout=self.timeout)
+                try:
+                    self.connection.request("GET", path)
+                    response = self.connection.getresponse()
+                    body = response.read()
+                except (OSError, HTTPException) as err:
+                    self.close()
+                    if not reused:
+                        raise
+                    logger.debug("%s Kept-alive connection to \"%s\" dropped %s", log, self.netloc, err)
+                    continue
+                if response.will_close:
+                    self.close()
+                text = body.decode("utf-8", "replace")
+                TRACE.http(url, response.status, text)
+                return JsonResponse(response.status, text)
+
+    def close(self) -> None:
+        """Close the connection, if open"""
+        if self.connection is not None:
+            self.connection.close()
+            self.connection = None
@@ -0,0 +1,33 @@
+#!/usr/bin/env python3
+"""A module that defers imports until first use
+Dependencies only one engine needs are not paid for on every start
+"""
+
+import sys
+import importlib.util
+from types import ModuleType
+
+
+def lazy_import(name: str) -> ModuleType:
+    """Import a module on the first access to one of its attributes
+
+    Args:
+        name [str]: Name of the module
+
+    Returns:
+        [ModuleType]: The module, loaded once used
+
+    Raises:
+        [ModuleNotFoundError]: The module is not installed
+    """
+    if name in sys.modules:
+        return sys.modules[name]
+    spec = importlib.util.find_spec(name)
+    if spec is None or spec.loader is None:
+        raise ModuleNotFoundError(f"No module named `{name}`!", name=name)
+    loader = importlib.util.LazyLoader(spec.loader)
+    spec.loader = loader
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    loader.exec_module(module)
+    return module
@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+"""A module that keeps logging off the injection path
+Records are queued and written by a background thread into size-capped files
+"""
+
+import json
+import queue
+import hashlib
+import logging
+import logging.handlers
+from pathlib import Path
+from typing import Any, Dict
+
+LOG_FORMAT = "%(asctime)s.%(msecs)03d %(levelname)-8s [%(name)s]: %(message)s"
+LOG_DATE_FORMAT = r"%Y-%m-%d %H:%M:%S"
+LOG_MAX_BYTES = 5 * 1024 * 1024
+LOG_BACKUP_COUNT = 3
+SPANS_LOGGER_NAME = "hide_sidebars.timing"
+MONITOR_LOGGER_NAME = "hide_sidebars.monitor.samples"
+
+
+class Abbreviated:
+    """Lazily abbreviated value for log records
+    Nothing is converted unless the record is actually written
+
+    Class variables:
+        LIMIT [int]: Default maximum number of characters kept
+
+    Instance variables:
+        value [Any]: Value to log
+        limit [int]: Maximum number of characters kept
+    """
+
+    LIMIT = 300
+
+    def __init__(self, value: Any, limit: int = LIMIT) -> None:
+        self.value = value
+        self.limit = limit
+
+    def __str__(self) -> str:
+        if isinstance(self.value, bytes):
+            text = self.value.decode(errors="replace")
+        else:
+            text = str(self.value)
+        if len(text) <= self.limit:
+            return text
+        digest = hashlib.sha256(text.encode(errors="replace")).hexdigest()[:12]
+        return f"{text[:self.limit]}... [{len(text)} chars, sha256 {digest}]"
+
+
+class JsonLine:
+    """Value serialized to JSON only when the record is written
+
+    Instance variables:
+        value [Any]: Value to log
+    """
+
+    def __init__(self, value: Any) -> None:
+        self.value = value
+
+    def __str__(self) -> str:
+        return json.dumps(self.value, default=str)
+
+
+class DeferredQueueHandler(logging.handlers.QueueHandler):
+    """Queue handler that leaves the formatting to the listener thread
+    The stock handler formats the message in the logging thread so the record
+    can be pickled; the queue here never leaves the process
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        """Queue the record as is, apart from rendering any traceback now
+
+        Args:
+            record [logging.LogRecord]: The record
+
+        Returns:
+            [logging.LogRecord]: The record to queue
+        """
+        if record.exc_info and not record.exc_text:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+        return record
+
+
+def start_logging(
+    logger: logging.Logger,
+    log_path: Path,
+    series_paths: Dict[str, Path],
+    level: int
+) -> logging.handlers.QueueListener:
+    """Route a logger through a queue into rotating files
+
+    Args:
+        logger       [logging.Logger]         : Logger to route, with its children
+        log_path     [pathlib.Path]           : Path of the main log file
+        series_paths [Dict[str, pathlib.Path]]: Paths of the JSON line files by logger name,
+                                                 e.g. the timing spans
+        level        [int]                    : Logging level of the main log; the series are
+                                                 always logged at INFO
+
+    Returns:
+        [logging.handlers.QueueListener]: The started listener; stop it to flush
+    """
+    log_path.parent.mkdir(parents=True, exist_ok=True)
+    # Main logging file handler
+    fh = logging.handlers.RotatingFileHandler(
+        log_path, maxBytes=LOG_MAX_BYTES, backupCount=LOG_BACKUP_COUNT, encoding="utf-8"
+    )
+    fh.setLevel(level)
+    fh.setFormatter(logging.Formatter(LOG_FORMAT, LOG_DATE_FORMAT))
+    # The series share the queue but go to their own files only, not into the main log as well
+    series_filters = [logging.Filter(name) for name in series_paths]
+    fh.addFilter(lambda record: not any(series.filter(record) for series in series_filters))
+    handlers = [fh]
+    # One JSON object per line
+    for name, path in series_paths.items():
+        path.parent.mkdir(parents=True, exist_ok=True)
+        sh = logging.handlers.RotatingFileHandler(
+            path, maxBytes=LOG_MAX_BYTES, backupCount=LOG_BACKUP_COUNT, encoding="utf-8"
+        )
+        sh.setLevel(logging.INFO)
+        sh.addFilter(logging.Filter(name))
+        sh.setFormatter(logging.Formatter("%(message)s"))
+        handlers.append(sh)
+    # Keep the previous runs as backups instead of appending to them
+    for handler in handlers:
+        if Path(handler.baseFilename).stat().st_size:
+            handler.doRollover()
+    log_queue: queue.SimpleQueue = queue.SimpleQueue()
+    queue_handler = DeferredQueueHandler(log_queue)
+    logger.setLevel(level)
+    logger.addHandler(queue_handler)
+    # The series are recorded whatever the level of the main log,
+    # and queued once by their own loggers rather than through `logger`
+    for name in series_paths:
+        series_logger = logging.getLogger(name)
+        series_logger.setLevel(logging.INFO)
+        series_logger.propagate = False
+        series_logger.addHandler(queue_handler)
+    listener = logging.handlers.QueueListener(
+        log_queue, *handlers, respect_handler_level=True
+    )
+    listener.start()
+    return listener
@@ -1,16 +1,26 @@
 #!/usr/bin/env python3
 """Main module. Decides which functions to call"""
 
+import io
 import platform
 import logging
 from pathlib import Path
 from argparse import ArgumentParser
+from typing import Optional, Type, Union
 
-from hide_sidebars.runner_obj import WinRunner, MacOsRunner, LinuxRunner
+from hide_sidebars.runner_obj import Runner, WinRunner, MacOsRunner, LinuxRunner
+from hide_sidebars.orchestrator import Orchestrator, instance_args
+from hide_sidebars.monitor import RendererMonitor
+from hide_sidebars.reloader import PayloadReloader
+from hide_sidebars.restart import RestartPolicy
+from hide_sidebars.trace import TRACE
 from hide_sidebars.custom_types import RunnerArgs
 
 logger = logging.getLogger(__name__)
 
+PROFILE_PATH = Path(__file__).resolve().parent.parent / "logs" / "dhs.pstats"
+TRACE_PATH = Path(__file__).resolve().parent.parent / "logs" / "dhs.trace.jsonl.gz"
+
 
 def parse_arguments() -> RunnerArgs:
     """Parse command line arguments
@@ -22,15 +32,20 @@ def parse_arguments() -> RunnerArgs:
     parser = ArgumentParser(description="Hide sidebar on Discord!")
     parser.add_argument(
         "-d", "--discord-path",
-        nargs=1,
+        nargs="+",
         default=None,
         type=Path,
-        help="Path of Discord executable",
-        dest="discord_path"
+        help="Path of Discord executable. Specify several to run them side by side",
+        dest="discord_paths"
+    )
+    parser.add_argument(
+        "-a", "--all-builds",
+        action="store_true",
+        help="Use this to run every Discord build found in default paths side by side",
+        dest="all_builds"
     )
     parser.add_argument(
         "-p", "--port",
-        nargs=1,
         default=None,
         type=int,
         choices=range(65536),
@@ -58,11 +73,137 @@ def parse_arguments() -> RunnerArgs:
         help="Use this to indicate Discord is PTB",
         dest="ptb"
     )
+    parser.add_argument(
+        "-s", "--sync",
+        action="store_true",
+        help="Use this to inject with the synchronous fallback engine",
+        dest="sync"
+    )
+    parser.add_argument(
+        "-x", "--attach",
+        action="store_true",
+        help="Use this to inject into a Discord already running on the port instead of restarting it",
+        dest="attach"
+    )
+    parser.add_argument(
+        "-c", "--compile-once",
+        action="store_true",
+        help="Use this to compile the payload once per page and rerun the compiled script",
+        dest="compile_once"
+    )
+    parser.add_argument(
+        "-u", "--supervise",
+        action="store_true",
+        help="Use this to keep the script live in every window across reloads until Discord exits",
+        dest="supervise"
+    )
+    parser.add_argument(
+        "-o", "--monitor",
+        nargs="?",
+        const=RendererMonitor.INTERVAL,
+        default=None,
+        type=float,
+        help="Use this to sample renderer heap and performance metrics until Discord exits. Specify seconds between samples as necessary",
+        metavar="SECONDS",
+        dest="monitor"
+    )
+    parser.add_argument(
+        "-w", "--watch",
+        nargs="?",
+        const=PayloadReloader.INTERVAL,
+        default=None,
+        type=float,
+        help="Use this to reload edited scripts into the windows without restarting Discord, until Discord exits. Specify seconds between checks as necessary",
+        metavar="SECONDS",
+        dest="watch"
+    )
+    parser.add_argument(
+        "-r", "--restart",
+        nargs="?",
+        const=RestartPolicy.BUDGET,
+        default=None,
+        type=int,
+        help="Use this to relaunch and reinject Discord if it crashes or exits. Specify relaunches allowed in a row as necessary",
+        metavar="RESTARTS",
+        dest="restart"
+    )
+    parser.add_argument(
+        "-f", "--profile",
+        nargs="?",
+        const=PROFILE_PATH,
+        default=None,
+        type=Path,
+        help="Use this to write cProfile stats of the run. Specify stats path as necessary",
+        dest="profile"
+    )
+    parser.add_argument(
+        "-R", "--record",
+        nargs="?",
+        const=TRACE_PATH,
+        default=None,
+        type=Path,
+        help="Use this to record every debug endpoint response and WebSocket frame for replay. Specify trace path as necessary",
+        dest="record"
+    )
     args = parser.parse_args(namespace=RunnerArgs)
-    logger.info(f"{log} Args: {args.args_dict()}")
+    args.discord_path = args.discord_paths[0] if args.discord_paths else None
+    logger.info("%s Args: %s", log, args.args_dict())
     return args
 
 
+def make_runner(runner_class: Type[Runner], args: RunnerArgs) -> Union[Runner, Orchestrator]:
+    """Make the runner, or an orchestrator if several Discord builds are to run
+
+    Args:
+        runner_class [Type[Runner]]: Runner class for this operating system
+        args         [RunnerArgs]  : Parsed command line arguments
+
+    Returns:
+        [Union[Runner, Orchestrator]]: The runner or orchestrator
+    """
+    log = "[make_runner]"
+    paths = list(args.discord_paths or [])
+    if args.all_builds:
+        paths += [path for path in runner_class.default_builds() if path not in paths]
+    if len(paths) <= 1:
+        return runner_class(args)
+    logger.info("%s %s instances: %s", log, len(paths), paths)
+    base_port = args.port or runner_class.DEFAULT_PORT
+    return Orchestrator([
+        runner_class(instance) for instance in instance_args(args, paths, base_port)
+    ])
+
+
+def run(runner: Union[Runner, Orchestrator], profile: Optional[Path], record: Optional[Path]) -> None:
+    """Run the runner, under cProfile and recording the traffic if asked to
+
+    Args:
+        runner  [Union[Runner, Orchestrator]]: The runner or orchestrator for this operating system
+        profile [Optional[pathlib.Path]]: Path to write cProfile stats to, if profiling
+        record  [Optional[pathlib.Path]]: Path to write the traffic trace to, if recording
+    """
+    log = "[run]"
+    if record is not None:
+        TRACE.start(record)
+    try:
+        if profile is None:
+            runner.run()
+            return
+        # Only needed when profiling
+        import pstats
+        import cProfile
+        profiler = cProfile.Profile()
+        try:
+            profiler.runcall(runner.run)
+        finally:
+            profiler.dump_stats(str(profile))
+            stream = io.StringIO()
+            pstats.Stats(profiler, stream=stream).sort_stats("cumulative").print_stats(20)
+            logger.info("%s Stats written to \"%s\"\n%s", log, profile, stream.getvalue())
+    finally:
+        TRACE.close()
+
+
 def main() -> None:
     """Main function
     Gets command line options
@@ -73,26 +214,30 @@ def main() -> None:
     args = parse_arguments()
 
     operating_system = platform.system()
-    logger.info(f"{log} Operating system: {operating_system}")
+    logger.info("%s Operating system: %s", log, operating_system)
 
     if operating_system == "Windows":
-        runner = WinRunner(args)
+        runner = make_runner(WinRunner, args)
+        profile = args.profile
+        record = args.record
         del args
-        runner.run()
+        run(runner, profile, record)
         return
     if operating_system == "Darwin":
-        runner = MacOsRunner(args)
+        runner = make_runner(MacOsRunner, args)
+        profile = args.profile
+        record = args.record
         del args
-        runner.run()
+        run(runner, profile, record)
         return
     if operating_system == "Linux":
-        runner = LinuxRunner(args)
+        runner = make_runner(LinuxRunner, args)
+        profile = args.profile
+        record = args.record
         del args
-        runner.run()
+        run(runner, profile, record)
         return
-    logger.critical(
-        f"Your operating system \"{platform.platform()}\" is not yet supported"
-    )
+    logger.critical("Your operating system \"%s\" is not yet supported", platform.platform())
     raise NotImplementedError(
         f"Your operating system \"{platform.platform()}\" is not yet supported"
     )
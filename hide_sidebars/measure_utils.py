@@ -0,0 +1,42 @@
+#!/usr/bin/env python3
+"""A module of helpers shared by the benchmark and fleet reports"""
+
+import socket
+from typing import List, Optional
+
+
+def free_port() -> int:
+    """Get a port nothing is listening on
+
+    Returns:
+        [int]: The port
+    """
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def percentile(values: List[float], fraction: float) -> float:
+    """Get a percentile by the nearest-rank method
+
+    Args:
+        values   [List[float]]: Values, not necessarily sorted
+        fraction [float]      : Percentile as a fraction in (0, 1]
+
+    Returns:
+        [float]: The percentile
+    """
+    ordered = sorted(values)
+    return ordered[max(0, min(len(ordered) - 1, round(fraction * len(ordered)) - 1))]
+
+
+def ms(seconds: Optional[float]) -> str:
+    """Format seconds as milliseconds
+
+    Args:
+        seconds [Optional[float]]: Seconds, if measured
+
+    Returns:
+        [str]: Milliseconds, or `-` if not measured
+    """
+    return "-" if seconds is None else f"{seconds * 1000:.1f}ms"
@@ -0,0 +1,595 @@
+#!/usr/bin/env python3
+"""A small JavaScript minifier for the payload
+
+Strips comments and whitespace, and shortens the names local to each
+top-level function. Names declared at top level are kept as they are,
+since the keyboard shortcuts and re-injections look them up globally.
+"""
+
+import re
+import logging
+from collections import Counter
+from itertools import count, product
+from string import ascii_letters
+from typing import Dict, Iterator, List, NamedTuple, Optional, Set, Tuple
+
+from hide_sidebars.log_utils import Abbreviated
+
+logger = logging.getLogger(__name__)
+
+IDENT_PATTERN = re.compile(r"[A-Za-z_$][\w$]*")
+WORD_PATTERN = re.compile(r"[\w$]")
+NUMBER_PATTERN = re.compile(
+    r"(?:0[xXbBoO][\da-fA-F_]+|(?:\d[\d_]*\.?[\d_]*|\.\d[\d_]*)(?:[eE][+-]?\d+)?)n?"
+)
+PUNCTUATORS = sorted([
+    ">>>=", "...", "===", "!==", "**=", "<<=", ">>=", ">>>", "&&=", "||=", "??=",
+    "=>", "==", "!=", "<=", ">=", "&&", "||", "??", "?.", "++", "--", "+=", "-=",
+    "*=", "/=", "%=", "&=", "|=", "^=", "**", "<<", ">>",
+    "{", "}", "(", ")", "[", "]", ";", ",", "<", ">", "+", "-", "*", "/", "%",
+    "&", "|", "^", "!", "~", "?", ":", "=", ".", "@", "#",
+], key=len, reverse=True)
+KEYWORDS = frozenset([
+    "await", "break", "case", "catch", "class", "const", "continue", "debugger",
+    "default", "delete", "do", "else", "enum", "export", "extends", "false",
+    "finally", "for", "function", "if", "implements", "import", "in",
+    "instanceof", "interface", "let", "new", "null", "of", "package", "private",
+    "protected", "public", "return", "static", "super", "switch", "this",
+    "throw", "true", "try", "typeof", "var", "void", "while", "with", "yield",
+    "async", "arguments", "eval", "undefined",
+])
+# Keywords after which a `/` starts a regular expression
+REGEX_PREFIX_KEYWORDS = frozenset([
+    "return", "typeof", "instanceof", "in", "of", "new", "delete", "void",
+    "throw", "case", "do", "else", "yield", "await",
+])
+# Keywords after which a line break ends the statement
+RESTRICTED_KEYWORDS = frozenset(["return", "throw", "break", "continue", "yield"])
+# Punctuators that may start a statement on a new line
+STATEMENT_START_PUNCTUATORS = frozenset(["++", "--", "!", "~", "{"])
+DECLARATION_KEYWORDS = frozenset(["var", "let", "const"])
+
+
+class Token(NamedTuple):
+    """One JavaScript token
+
+    Properties:
+        kind    [str] : One of "ident", "num", "str", "tpl", "regex", "punct"
+        text    [str] : Source text
+        newline [bool]: Whether a line break precedes the token
+    """
+
+    kind: str
+    text: str
+    newline: bool
+
+
+def tokenize(js: str) -> List[Token]:
+    """Split JavaScript into tokens, dropping comments and whitespace
+
+    Args:
+        js [str]: JavaScript source
+
+    Returns:
+        [List[Token]]: Tokens
+    """
+    tokens: List[Token] = []
+    # Open brace counts of the template substitutions being read
+    templates: List[int] = []
+    pos = 0
+    newline = False
+    while pos < len(js):
+        char = js[pos]
+        if char in " \t\r\n\f\v\u00a0\ufeff":
+            newline = newline or char in "\r\n"
+            pos += 1
+            continue
+        if js.startswith("//", pos):
+            end = js.find("\n", pos)
+            pos = len(js) if end == -1 else end
+            continue
+        if js.startswith("/*", pos):
+            end = js.find("*/", pos + 2)
+            if end == -1:
+                raise SyntaxError(f"Unterminated comment at {pos}")
+            newline = newline or "\n" in js[pos:end]
+            pos = end + 2
+            continue
+        if char == "`" or (char == "}" and templates and templates[-1] == 0):
+            if char == "}":
+                templates.pop()
+            end, opened = read_template(js, pos)
+            if opened:
+                templates.append(0)
+            tokens.append(Token("tpl", js[pos:end], newline))
+        elif char in "\"'":
+            end = read_string(js, pos)
+            tokens.append(Token("str", js[pos:end], newline))
+        elif char == "/" and regex_allowed(tokens):
+            end = read_regex(js, pos)
+            tokens.append(Token("regex", js[pos:end], newline))
+        elif (match := IDENT_PATTERN.match(js, pos)) is not None:
+            end = match.end()
+            tokens.append(Token("ident", match.group(), newline))
+        elif (match := NUMBER_PATTERN.match(js, pos)) is not None and match.group() != ".":
+            end = match.end()
+            tokens.append(Token("num", match.group(), newline))
+        else:
+            for punctuator in PUNCTUATORS:
+                if js.startswith(punctuator, pos):
+                    break
+            else:
+                raise SyntaxError(f"Unexpected character {char!r} at {pos}")
+            end = pos + len(punctuator)
+            if templates and punctuator == "{":
+                templates[-1] += 1
+            elif templates and punctuator == "}":
+                templates[-1] -= 1
+            tokens.append(Token("punct", punctuator, newline))
+        pos = end
+        newline = False
+    return tokens
+
+
+def read_string(js: str, pos: int) -> int:
+    """Find the end of a string literal
+
+    Args:
+        js  [str]: JavaScript source
+        pos [int]: Position of the opening quote
+
+    Returns:
+        [int]: Position after the closing quote
+    """
+    quote = js[pos]
+    pos += 1
+    while pos < len(js):
+        if js[pos] == "\\":
+            pos += 2
+            continue
+        if js[pos] == quote:
+            return pos + 1
+        if js[pos] == "\n":
+            break
+        pos += 1
+    raise SyntaxError(f"Unterminated string at {pos}")
+
+
+def read_template(js: str, pos: int) -> Tuple[int, bool]:
+    """Find the end of a template literal chunk
+
+    Args:
+        js  [str]: JavaScript source
+        pos [int]: Position of the opening backtick or closing brace
+
+    Returns:
+        [int] : Position after the chunk
+        [bool]: Whether the chunk opens a substitution
+    """
+    pos += 1
+    while pos < len(js):
+        if js[pos] == "\\":
+            pos += 2
+            continue
+        if js[pos] == "`":
+            return pos + 1, False
+        if js.startswith("${", pos):
+            return pos + 2, True
+        pos += 1
+    raise SyntaxError(f"Unterminated template at {pos}")
+
+
+def read_regex(js: str, pos: int) -> int:
+    """Find the end of a regular expression literal, including its flags
+
+    Args:
+        js  [str]: JavaScript source
+        pos [int]: Position of the opening slash
+
+    Returns:
+        [int]: Position after the flags
+    """
+    pos += 1
+    in_class = False
+    while pos < len(js):
+        char = js[pos]
+        if char == "\\":
+            pos += 2
+            continue
+        if char == "\n":
+            break
+        if char == "[":
+            in_class = True
+        elif char == "]":
+            in_class = False
+        elif char == "/" and not in_class:
+            pos += 1
+            while pos < len(js) and (js[pos].isalnum() or js[pos] in "_$"):
+                pos += 1
+            return pos
+        pos += 1
+    raise SyntaxError(f"Unterminated regular expression at {pos}")
+
+
+def regex_allowed(tokens: List[Token]) -> bool:
+    """Check whether a `/` after the tokens starts a regular expression
+
+    Args:
+        tokens [List[Token]]: Tokens so far
+
+    Returns:
+        [bool]: Whether a regular expression is allowed
+    """
+    if not tokens:
+        return True
+    last = tokens[-1]
+    if last.kind == "ident":
+        return last.text in REGEX_PREFIX_KEYWORDS
+    if last.kind == "punct":
+        return last.text not in (")", "]", "}", "++", "--")
+    return last.kind == "tpl" and last.text.endswith("${")
+
+
+def short_names(reserved: Set[str]) -> Iterator[str]:
+    """Generate the shortest identifiers not in use
+
+    Args:
+        reserved [Set[str]]: Identifiers that must not be generated
+
+    Yields:
+        [str]: Identifier
+    """
+    for length in count(1):
+        for letters in product(ascii_letters, repeat=length):
+            name = "".join(letters)
+            if name not in reserved and name not in KEYWORDS:
+                yield name
+
+
+def matching(tokens: List[Token], start: int) -> int:
+    """Find the bracket matching the one at `start`
+
+    Args:
+        tokens [List[Token]]: Tokens
+        start  [int]        : Index of an opening or closing bracket
+
+    Returns:
+        [int]: Index of the matching bracket
+    """
+    pairs = {"(": ")", "[": "]", "{": "}"}
+    opening = tokens[start].text
+    if opening in pairs:
+        step, closing = 1, pairs[opening]
+    else:
+        step, closing = -1, {v: k for k, v in pairs.items()}[opening]
+    depth = 0
+    index = start
+    while 0 <= index < len(tokens):
+        token = tokens[index]
+        if token.kind == "punct":
+            if token.text == opening:
+                depth += 1
+            elif token.text == closing:
+                depth -= 1
+                if depth == 0:
+                    return index
+        index += step
+    raise SyntaxError(f"Unbalanced {opening!r}")
+
+
+def function_spans(tokens: List[Token]) -> List[Tuple[int, int]]:
+    """Find the top-level functions, including arrow functions
+
+    Args:
+        tokens [List[Token]]: Tokens
+
+    Returns:
+        [List[Tuple[int, int]]]: Inclusive start and end indices of each function
+    """
+    spans: List[Tuple[int, int]] = []
+    depth = 0
+    index = 0
+    while index < len(tokens):
+        token = tokens[index]
+        if token.kind == "punct" and token.text in "([{":
+            depth += 1
+        elif token.kind == "punct" and token.text in ")]}":
+            depth -= 1
+        elif depth == 0 and token.kind == "ident" and token.text == "function":
+            body = index
+            while tokens[body].text != "{":
+                body += 1
+            end = matching(tokens, body)
+            spans.append((index, end))
+            index = end
+        elif depth <= 1 and token.kind == "punct" and token.text == "=>":
+            start = index - 1
+            if tokens[start].text == ")":
+                start = matching(tokens, start)
+            end = index + 1
+            if tokens[end].text == "{":
+                end = matching(tokens, end)
+            else:
+                level = 0
+                while end + 1 < len(tokens):
+                    text = tokens[end + 1].text
+                    if level == 0 and text in (",", ";", ")", "]", "}"):
+                        break
+                    if text in "([{":
+                        level += 1
+                    elif text in ")]}":
+                        level -= 1
+                    end += 1
+            spans.append((start, end))
+            index = end
+        index += 1
+    return spans
+
+
+def declared_names(tokens: List[Token], start: int, end: int) -> Set[str]:
+    """Collect the simple names declared within a function
+
+    Args:
+        tokens [List[Token]]: Tokens
+        start  [int]        : Index of the first token of the function
+        end    [int]        : Index of the last token of the function
+
+    Returns:
+        [Set[str]]: Declared names
+    """
+    names: Set[str] = set()
+    for index in range(start, end + 1):
+        token = tokens[index]
+        if token.kind != "ident":
+            continue
+        prev = tokens[index - 1].text if index > 0 else ""
+        after = tokens[index + 1].text if index < len(tokens) - 1 else ""
+        if prev in DECLARATION_KEYWORDS or prev == "function":
+            names.add(token.text)
+        elif prev in ("(", ",", "[") and in_parameters(tokens, index, start):
+            names.add(token.text)
+        elif after == "=>":
+            names.add(token.text)
+    return names
+
+
+def in_parameters(tokens: List[Token], index: int, start: int) -> bool:
+    """Check whether a name is a parameter, a `catch` binding or an array
+    destructuring target
+
+    Args:
+        tokens [List[Token]]: Tokens
+        index  [int]        : Index of the name
+        start  [int]        : Index of the first token of the function
+
+    Returns:
+        [bool]: Whether the name is bound there
+    """
+    after = tokens[index + 1].text
+    if after not in (",", ")", "]"):
+        return False
+    # Walk back to the opening bracket of this list
+    level = 0
+    opener = index - 1
+    while opener >= start:
+        text = tokens[opener].text
+        if text in (")", "]", "}"):
+            level += 1
+        elif text in ("(", "[", "{"):
+            if level == 0:
+                break
+            level -= 1
+        opener -= 1
+    else:
+        return False
+    before = tokens[opener - 1].text if opener > 0 else ""
+    if tokens[opener].text == "[":
+        # Array destructuring after a declaration keyword
+        return before in DECLARATION_KEYWORDS
+    if tokens[opener].text != "(":
+        return False
+    if before in ("catch", "function"):
+        return True
+    if opener >= 2 and tokens[opener - 1].kind == "ident" and tokens[opener - 2].text == "function":
+        return True
+    # Arrow function parameters
+    closer = matching(tokens, opener)
+    return closer + 1 < len(tokens) and tokens[closer + 1].text == "=>"
+
+
+def rename_locals(tokens: List[Token]) -> List[Token]:
+    """Shorten the names local to each top-level function
+
+    Args:
+        tokens [List[Token]]: Tokens
+
+    Returns:
+        [List[Token]]: Tokens with local names shortened
+    """
+    log = "[rename_locals]"
+    used = {token.text for token in tokens if token.kind == "ident"}
+    global_names = declared_globals(tokens)
+    renamed = list(tokens)
+    for start, end in function_spans(tokens):
+        span = range(start, end + 1)
+        texts = {tokens[index].text for index in span if tokens[index].kind == "ident"}
+        if "eval" in texts or "with" in texts:
+            continue
+        candidates = declared_names(tokens, start, end) - global_names - KEYWORDS
+        usages: Counter = Counter()
+        for index in span:
+            token = tokens[index]
+            if token.kind != "ident" or token.text not in candidates:
+                continue
+            if is_property(tokens, index):
+                continue
+            if is_shorthand(tokens, index):
+                # `{name}` would change its key
+                candidates.discard(token.text)
+                continue
+            usages[token.text] += 1
+        names = short_names(used)
+        mapping: Dict[str, str] = {}
+        for name, _ in usages.most_common():
+            if name not in candidates:
+                continue
+            short = next(names)
+            if len(short) < len(name):
+                mapping[name] = short
+        for index in span:
+            token = tokens[index]
+            if token.kind == "ident" and token.text in mapping and not is_property(tokens, index):
+                renamed[index] = token._replace(text=mapping[token.text])
+        logger.debug("%s Tokens %s-%s: %s", log, start, end, Abbreviated(mapping))
+    return renamed
+
+
+def declared_globals(tokens: List[Token]) -> Set[str]:
+    """Collect the names declared at top level
+
+    Args:
+        tokens [List[Token]]: Tokens
+
+    Returns:
+        [Set[str]]: Top-level names
+    """
+    names: Set[str] = set()
+    depth = 0
+    for index, token in enumerate(tokens):
+        if token.kind == "punct" and token.text in "([{":
+            depth += 1
+        elif token.kind == "punct" and token.text in ")]}":
+            depth -= 1
+        elif depth == 0 and token.kind == "ident" and index > 0:
+            if tokens[index - 1].text in DECLARATION_KEYWORDS or tokens[index - 1].text == "function":
+                names.add(token.text)
+    return names
+
+
+def is_property(tokens: List[Token], index: int) -> bool:
+    """Check whether a name is a property access or an object key
+
+    Args:
+        tokens [List[Token]]: Tokens
+        index  [int]        : Index of the name
+
+    Returns:
+        [bool]: Whether the name is a property
+    """
+    prev = tokens[index - 1].text if index > 0 else ""
+    after = tokens[index + 1].text if index < len(tokens) - 1 else ""
+    if prev in (".", "?."):
+        return True
+    return after == ":" and prev in ("{", ",")
+
+
+def is_shorthand(tokens: List[Token], index: int) -> bool:
+    """Check whether a name may be a shorthand property
+
+    Args:
+        tokens [List[Token]]: Tokens
+        index  [int]        : Index of the name
+
+    Returns:
+        [bool]: Whether the name may be a shorthand property
+    """
+    prev = tokens[index - 1].text if index > 0 else ""
+    after = tokens[index + 1].text if index < len(tokens) - 1 else ""
+    return prev in ("{", ",") and after in (",", "}") and enclosing(tokens, index) == "{"
+
+
+def enclosing(tokens: List[Token], index: int) -> Optional[str]:
+    """Find the innermost bracket enclosing a token
+
+    Args:
+        tokens [List[Token]]: Tokens
+        index  [int]        : Index of the token
+
+    Returns:
+        [Optional[str]]: The bracket, if any
+    """
+    level = 0
+    for opener in range(index - 1, -1, -1):
+        text = tokens[opener].text
+        if tokens[opener].kind != "punct":
+            continue
+        if text in (")", "]", "}"):
+            level += 1
+        elif text in ("(", "[", "{"):
+            if level == 0:
+                return text
+            level -= 1
+    return None
+
+
+def needs_space(prev: Token, token: Token) -> bool:
+    """Check whether two adjacent tokens need a space between them
+
+    Args:
+        prev  [Token]: The former token
+        token [Token]: The latter token
+
+    Returns:
+        [bool]: Whether a space is needed
+    """
+    if WORD_PATTERN.match(token.text[0]) and (
+        WORD_PATTERN.match(prev.text[-1]) or prev.kind == "regex"
+    ):
+        return True
+    if prev.text[-1] in "+-" and token.text[0] == prev.text[-1]:
+        return True
+    if prev.text[-1] == "/" and token.text[0] in "/*":
+        return True
+    return prev.kind == "num" and token.text[0] == "." and "." not in prev.text
+
+
+def needs_newline(prev: Token, token: Token) -> bool:
+    """Check whether a line break between two tokens must be kept, because
+    automatic semicolon insertion depends on it
+
+    Args:
+        prev  [Token]: The former token
+        token [Token]: The latter token
+
+    Returns:
+        [bool]: Whether the line break is kept
+    """
+    if not token.newline:
+        return False
+    if prev.kind == "ident" and prev.text in RESTRICTED_KEYWORDS:
+        return True
+    if token.kind == "punct" and token.text in ("++", "--"):
+        return True
+    if prev.kind == "punct" and prev.text not in (")", "]", "}", "++", "--"):
+        return False
+    if prev.kind == "tpl" and not prev.text.endswith("`"):
+        return False
+    if token.kind == "punct":
+        return token.text in STATEMENT_START_PUNCTUATORS
+    return token.kind != "tpl" or token.text.startswith("`")
+
+
+def minify(js: str) -> str:
+    """Minify JavaScript
+
+    Args:
+        js [str]: JavaScript source
+
+    Returns:
+        [str]: Minified JavaScript
+    """
+    log = "[minify]"
+    tokens = rename_locals(tokenize(js))
+    parts: List[str] = []
+    prev: Optional[Token] = None
+    for token in tokens:
+        if prev is not None:
+            if needs_newline(prev, token):
+                parts.append("\n")
+            elif needs_space(prev, token):
+                parts.append(" ")
+        parts.append(token.text)
+        prev = token
+    minified = "".join(parts)
+    logger.debug("%s %s -> %s characters", log, len(js), len(minified))
+    return minified
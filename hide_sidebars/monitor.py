@@ -0,0 +1,210 @@
+#!/usr/bin/env python3
+"""A module that measures what the payload costs the renderer
+Each window is sampled once before injection as the baseline, then
+periodically; every sample is logged to `hide_sidebars.monitor.samples` as one JSON line
+"""
+
+import asyncio
+import logging
+from time import monotonic, time
+from typing import TYPE_CHECKING, Dict, Optional
+
+from hide_sidebars.lazy import lazy_import
+from hide_sidebars.action import Action
+from hide_sidebars.log_utils import JsonLine, MONITOR_LOGGER_NAME
+from hide_sidebars.connection import AsyncConnectionPool, Dispatcher
+
+if TYPE_CHECKING:
+    import websockets
+else:
+    websockets = lazy_import("websockets")
+
+logger = logging.getLogger(__name__)
+samples = logging.getLogger(MONITOR_LOGGER_NAME)
+
+Metrics = Dict[str, float]
+
+
+class RendererMonitor:
+    """Samples the heap usage and `Performance` metrics of each window
+
+    Class variables:
+        INTERVAL [float]         : Default seconds between samples
+        SUMMARY  [Dict[str, str]]: Metrics logged when a window stops being sampled, by label
+
+    Instance variables:
+        pool      [AsyncConnectionPool]    : Pool of connections to the windows
+        name      [str]                    : Name of the instance, for the JSON lines
+        interval  [float]                  : Seconds between samples
+        baselines [Dict[str, Metrics]]     : Pre-injection samples by socket URL
+        started   [Dict[str, float]]       : Time of each baseline by socket URL
+        tasks     [Dict[str, asyncio.Task]]: Sampling tasks by socket URL
+    """
+
+    INTERVAL = 5.0
+    SUMMARY = {
+        "heap bytes": "heapUsed",
+        "nodes": "Nodes",
+        "listeners": "JSEventListeners",
+        "layouts": "LayoutCount",
+        "style recalcs": "RecalcStyleCount",
+        "task seconds": "TaskDuration",
+    }
+
+    def __init__(self, pool: AsyncConnectionPool, name: str, interval: float = INTERVAL) -> None:
+        self.pool = pool
+        self.name = name
+        self.interval = interval
+        self.baselines: Dict[str, Metrics] = {}
+        self.started: Dict[str, float] = {}
+        self.tasks: Dict[str, asyncio.Task] = {}
+
+    async def baseline(self, window: Dict[str, str]) -> None:
+        """Sample a window before anything is injected into it
+        Windows already sampled keep their first baseline
+
+        Args:
+            window [Dict[str, str]]: Window info
+        """
+        log = f"[{type(self).__name__}.baseline]"
+        socket_url = window.get(Action.SOCKET_URL_KEY)
+        if (
+            socket_url is None
+            or socket_url in self.baselines
+            or window["title"].lower() in Action.TITLE_BLACKLIST
+        ):
+            return
+        dispatcher = await self.pool.get(socket_url)
+        if dispatcher is None:
+            return
+        try:
+            await dispatcher.send("Performance.enable", {})
+            metrics = await self.sample(dispatcher)
+        except (OSError, websockets.ConnectionClosed) as err:
+            logger.warning("%s WebSocket to \"%s\" failed %s", log, socket_url, err)
+            return
+        if metrics is None:
+            return
+        self.baselines[socket_url] = metrics
+        self.started[socket_url] = monotonic()
+        self.write(window, "baseline", metrics)
+
+    def watch(self, window: Dict[str, str]) -> None:
+        """Start sampling an injected window, if it has a baseline
+
+        Args:
+            window [Dict[str, str]]: Window info
+        """
+        socket_url = window.get(Action.SOCKET_URL_KEY)
+        if socket_url not in self.baselines or socket_url in self.tasks:
+            return
+        self.tasks[socket_url] = asyncio.ensure_future(self.run(window, socket_url))
+
+    async def run(self, window: Dict[str, str], socket_url: str) -> None:
+        """Sample a window until its socket closes
+
+        Args:
+            window     [Dict[str, str]]: Window info
+            socket_url [str]           : Socket URL of the window
+        """
+        log = f"[{type(self).__name__}.run]"
+        metrics: Optional[Metrics] = None
+        try:
+            while True:
+                await asyncio.sleep(self.interval)
+                dispatcher = self.pool.connections.get(socket_url)
+                if dispatcher is None or not dispatcher.open:
+                    break
+                try:
+                    latest = await self.sample(dispatcher)
+                except (OSError, websockets.ConnectionClosed):
+                    break
+                if latest is not None:
+                    metrics = latest
+                    self.write(window, "sample", metrics)
+        finally:
+            self.tasks.pop(socket_url, None)
+            if metrics is not None:
+                delta = self.delta(socket_url, metrics)
+                logger.info(
+                    "%s \"%s\" over %.1fs: %s",
+                    log, window["title"], monotonic() - self.started[socket_url],
+                    ", ".join(
+                        f"{label} {delta[key]:+g}"
+                        for label, key in self.SUMMARY.items() if key in delta
+                    )
+                )
+
+    async def sample(self, dispatcher: Dispatcher) -> Optional[Metrics]:
+        """Get the heap usage and `Performance` metrics of a window
+        Both commands are in flight at once
+
+        Args:
+            dispatcher [Dispatcher]: Connection to the window
+
+        Returns:
+            [Optional[Metrics]]: Metrics by name; `None` if refused
+        """
+        log = f"[{type(self).__name__}.sample]"
+        heap, performance = await asyncio.gather(
+            dispatcher.send("Runtime.getHeapUsage", {}),
+            dispatcher.send("Performance.getMetrics", {}),
+        )
+        for response in (heap, performance):
+            if "error" in response:
+                logger.warning("%s Refused %s", log, response["error"])
+                return
+        metrics: Metrics = {
+            metric["name"]: metric["value"]
+            for metric in performance["result"].get("metrics", [])
+        }
+        metrics["heapUsed"] = heap["result"]["usedSize"]
+        metrics["heapTotal"] = heap["result"]["totalSize"]
+        return metrics
+
+    def delta(self, socket_url: str, metrics: Metrics) -> Metrics:
+        """Compare a sample against the baseline of its window
+
+        Args:
+            socket_url [str]    : Socket URL of the window
+            metrics    [Metrics]: The sample
+
+        Returns:
+            [Metrics]: Change of each metric since the baseline
+        """
+        baseline = self.baselines[socket_url]
+        return {
+            name: round(value - baseline[name], 6)
+            for name, value in metrics.items() if name in baseline
+        }
+
+    def write(self, window: Dict[str, str], phase: str, metrics: Metrics) -> None:
+        """Log a sample as one JSON line
+
+        Args:
+            window  [Dict[str, str]]: Window info
+            phase   [str]           : `baseline` or `sample`
+            metrics [Metrics]       : The sample
+        """
+        socket_url = window[Action.SOCKET_URL_KEY]
+        samples.info("%s", JsonLine({
+            "instance": self.name,
+            "window": window["title"],
+            "target": socket_url,
+            "time": round(time(), 6),
+            "elapsed": round(monotonic() - self.started[socket_url], 3),
+            "phase": phase,
+            "metrics": metrics,
+            "delta": self.delta(socket_url, metrics),
+        }))
+
+    async def wait(self) -> None:
+        """Wait until every window stops being sampled"""
+        while self.tasks:
+            await asyncio.gather(*self.tasks.values(), return_exceptions=True)
+
+    async def close(self) -> None:
+        """Stop sampling"""
+        for task in list(self.tasks.values()):
+            task.cancel()
+        await asyncio.gather(*self.tasks.values(), return_exceptions=True)
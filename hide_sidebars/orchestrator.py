@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+"""A module that runs several Discord builds side by side on one event loop"""
+
+import asyncio
+import logging
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from hide_sidebars.runner_obj import Runner
+from hide_sidebars.process_watch import probe_port
+from hide_sidebars.custom_types import RunnerArgs
+from hide_sidebars.timing import SPANS
+
+logger = logging.getLogger(__name__)
+
+
+def allocate_ports(base: int, number: int, skip_used: bool = True, host: str = "localhost") -> List[int]:
+    """Allocate distinct debug ports from a base port, skipping ports in use
+
+    Args:
+        base      [int] : First port to try
+        number    [int] : Number of ports needed
+        skip_used [bool]: Whether to skip ports in use
+        host      [str] : Host to probe the ports on
+
+    Returns:
+        [List[int]]: Allocated ports
+    """
+    log = "[allocate_ports]"
+    ports: List[int] = []
+    port = base
+    while len(ports) < number:
+        if port > 65535:
+            logger.critical("%s No free ports from %s", log, base)
+            raise ValueError(f"Only {len(ports)} free ports from {base}!")
+        if skip_used and probe_port(host, port):
+            logger.warning("%s Port %s in use; skipped", log, port)
+        else:
+            ports.append(port)
+        port += 1
+    return ports
+
+
+def instance_args(args: RunnerArgs, paths: List[Path], base_port: int) -> List[RunnerArgs]:
+    """Split the arguments into one set per Discord build
+
+    Args:
+        args      [RunnerArgs]        : Parsed command line arguments
+        paths     [List[pathlib.Path]]: Executables of the builds
+        base_port [int]               : First debug port to allocate
+
+    Returns:
+        [List[RunnerArgs]]: Arguments of each instance
+    """
+    # Attaching expects the builds on their usual ports, which are in use
+    ports = allocate_ports(base_port, len(paths), skip_used=not args.attach)
+    return [
+        RunnerArgs(**{
+            **args.args_dict(),
+            "discord_path": path,
+            "port": port,
+            # PTB is told apart by the executable name of each build
+            "ptb": False,
+        })
+        for path, port in zip(paths, ports)
+    ]
+
+
+def seconds(value: Optional[float]) -> str:
+    """Format optional seconds for the report
+
+    Args:
+        value [Optional[float]]: Seconds, if any
+
+    Returns:
+        [str]: Formatted seconds
+    """
+    return "-" if value is None else f"{value:.3f}s"
+
+
+class Orchestrator:
+    """Launches and injects several Discord builds concurrently
+
+    Instance variables:
+        runners  [List[Runner]]  : Runner of each instance
+        injected [Dict[str, bool]]: Whether each instance got injected, by name
+    """
+
+    def __init__(self, runners: List[Runner]) -> None:
+        self.runners = runners
+        self.injected: Dict[str, bool] = {}
+
+    def run(self) -> None:
+        """Injection go brrrr, for every instance"""
+        log = f"[{type(self).__name__}.run]"
+        try:
+            launching = [runner for runner in self.runners if not runner.try_attach()]
+            # Kill everything first, since killing by name may hit other builds
+            for runner in launching:
+                with SPANS.span("kill_running", instance=runner.name):
+                    runner.kill_running()
+            logger.debug("%s Running instances killed", log)
+            for runner in launching:
+                with SPANS.span("start_program", instance=runner.name):
+                    runner.start_program()
+                logger.info(
+                    "%s %s started process %s on port %s",
+                    log, runner.name, runner.process.pid, runner.port
+                )
+            with SPANS.span("inject", instances=len(self.runners)):
+                asyncio.run(self.inject_all())
+            self.stay_up()
+            for runner in self.runners:
+                if runner.boot:
+                    with SPANS.span("patch_boot", instance=runner.name):
+                        runner.patch_boot()
+        finally:
+            for runner in self.runners:
+                runner.close()
+                if runner.restarts is not None:
+                    runner.restarts.summary(runner.name)
+            SPANS.summary()
+
+    def stay_up(self) -> None:
+        """Wait for every instance to exit, each relaunching on its own thread if restarting"""
+        log = f"[{type(self).__name__}.stay_up]"
+        threads = [
+            threading.Thread(target=runner.stay_up, name=runner.name, daemon=True)
+            for runner in self.runners
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        logger.debug("%s Every instance is down", log)
+
+    async def inject_all(self) -> None:
+        """Inject into all instances on this event loop, and report"""
+        log = f"[{type(self).__name__}.inject_all]"
+        await asyncio.gather(*(self.inject(runner) for runner in self.runners))
+        for runner in self.runners:
+            logger.info(
+                "%s %s: ready after %s, injected after %s",
+                log, runner.name, seconds(runner.ready_after), seconds(runner.injected_after)
+            )
+
+    async def inject(self, runner: Runner) -> bool:
+        """Inject into one instance
+
+        Args:
+            runner [Runner]: Runner of the instance
+
+        Returns:
+            [bool]: Whether the injection is successful
+        """
+        log = f"[{type(self).__name__}.inject]"
+        try:
+            if runner.sync:
+                loop = asyncio.get_running_loop()
+                success = await loop.run_in_executor(None, runner.inject_sync)
+            else:
+                success = await runner.inject_async()
+        except Exception:
+            # One instance failing should not take the others down
+            logger.exception("%s %s failed", log, runner.name)
+            success = False
+        self.injected[runner.name] = success
+        logger.info("%s %s injection %s", log, runner.name, "successful" if success else "failed")
+        return success
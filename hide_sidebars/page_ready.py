@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""A module that waits for the document of a window to be ready for the payload
+The payload itself waits for the app shell, so the document only has to be
+past loading, and not the blank page a window starts with
+"""
+
+import asyncio
+import logging
+from string import Template
+from typing import TYPE_CHECKING, Dict
+
+from hide_sidebars.lazy import lazy_import
+from hide_sidebars.connection import Dispatcher, send_command_sync
+
+if TYPE_CHECKING:
+    import websocket
+    import websockets
+else:
+    websocket = lazy_import("websocket")
+    websockets = lazy_import("websockets")
+
+logger = logging.getLogger(__name__)
+
+DOCUMENT_READY = "Page.domContentEventFired"
+READY_EXPRESSION = 'document.readyState !== "loading" && location.href !== "about:blank"'
+# Resolves in the document, for connections that cannot wait for events
+READY_PROMISE_EXPRESSION = Template(f"""new Promise((resolve) => {{
+    if ({READY_EXPRESSION}) resolve(true);
+    document.addEventListener("DOMContentLoaded", () => resolve(true), {{ once: true }});
+    setTimeout(() => resolve(false), ${{timeout}});
+}})""")
+READY_TIMEOUT = 30.0
+
+
+def is_true(response: Dict) -> bool:
+    """Check whether a `Runtime.evaluate` response is `true`
+
+    Args:
+        response [Dict]: The response
+
+    Returns:
+        [bool]: Whether the value is `true`
+    """
+    return response.get("result", {}).get("result", {}).get("value") is True
+
+
+async def wait_document(dispatcher: Dispatcher, timeout: float = READY_TIMEOUT) -> bool:
+    """Wait until the document of a window is past loading, through page events
+
+    Args:
+        dispatcher [Dispatcher]: Connection to the window
+        timeout    [float]     : Seconds to wait at most
+
+    Returns:
+        [bool]: Whether the document is ready; `False` if timed out or disconnected
+    """
+    log = "[wait_document]"
+    # Subscribe first, so the event cannot slip by between checking and waiting
+    events = dispatcher.subscribe(DOCUMENT_READY)
+    try:
+        _, response = await asyncio.gather(
+            dispatcher.send("Page.enable", {}),
+            dispatcher.send("Runtime.evaluate", {"expression": READY_EXPRESSION, "returnByValue": True}),
+        )
+        if is_true(response):
+            return True
+        logger.debug("%s Waiting for the document", log)
+        return await asyncio.wait_for(events.get(), timeout) is not None
+    except asyncio.TimeoutError:
+        logger.warning("%s Document not ready in %ss", log, timeout)
+        return False
+    except (OSError, websockets.ConnectionClosed) as err:
+        logger.warning("%s WebSocket failed %s", log, err)
+        return False
+    finally:
+        dispatcher.unsubscribe(events)
+
+
+def wait_document_sync(ws: "websocket.WebSocket", timeout: float = READY_TIMEOUT) -> bool:
+    """Wait until the document of a window is past loading, in the document itself
+
+    Args:
+        ws      [websocket.WebSocket]: Connection to the window
+        timeout [float]              : Seconds to wait at most
+
+    Returns:
+        [bool]: Whether the document is ready; `False` if it navigated away, timed out or disconnected
+    """
+    log = "[wait_document_sync]"
+    try:
+        ready = is_true(send_command_sync(ws, "Runtime.evaluate", {
+            "expression": READY_PROMISE_EXPRESSION.substitute(timeout=round(timeout * 1000)),
+            "awaitPromise": True,
+            "returnByValue": True,
+        }))
+    except (OSError, websocket.WebSocketException) as err:
+        logger.warning("%s WebSocket failed %s", log, err)
+        return False
+    if not ready:
+        logger.warning("%s Document not ready in %ss", log, timeout)
+    return ready
@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+"""A module that watches the started Discord process for readiness"""
+
+import os
+import re
+import signal
+import socket
+import logging
+import threading
+import subprocess
+from pathlib import Path
+from time import sleep, monotonic
+from typing import IO, List, Optional
+
+from hide_sidebars.log_utils import Abbreviated
+
+logger = logging.getLogger(__name__)
+
+DEVTOOLS_PATTERN = re.compile(rb"DevTools listening on (ws://\S+)")
+PROC_PATH = Path("/proc")
+DELETED_SUFFIX = " (deleted)"
+
+
+class OutputReader:
+    """Drains the output pipes of a process into the log
+    Also signals when the debug endpoint is listening
+
+    Instance variables:
+        ready       [threading.Event]       : Set once the debug endpoint is announced
+        browser_url [Optional[str]]         : Browser-level socket URL, once announced
+        threads     [List[threading.Thread]]: Background reader threads
+    """
+
+    def __init__(self, process: subprocess.Popen) -> None:
+        log = f"[{type(self).__name__}.__init__]"
+        self.ready = threading.Event()
+        self.browser_url: Optional[str] = None
+        self.threads: List[threading.Thread] = []
+        for name, pipe in (("STDOUT", process.stdout), ("STDERR", process.stderr)):
+            if pipe is None:
+                continue
+            thread = threading.Thread(
+                target=self.drain,
+                args=(name, pipe),
+                name=f"{type(self).__name__}-{name}",
+                daemon=True
+            )
+            thread.start()
+            self.threads.append(thread)
+        logger.debug("%s Reading %s pipes", log, len(self.threads))
+
+    def drain(self, name: str, pipe: IO[bytes]) -> None:
+        """Read a pipe line by line until it closes
+
+        Args:
+            name [str]      : Name of the pipe, for logging
+            pipe [IO[bytes]]: The pipe to read
+        """
+        log = f"[{type(self).__name__}.drain]"
+        with pipe:
+            for line in iter(pipe.readline, b""):
+                logger.debug(
+                    "%s Process %s: %s",
+                    log, name, Abbreviated(line.rstrip())
+                )
+                if self.ready.is_set():
+                    continue
+                match = DEVTOOLS_PATTERN.search(line)
+                if match is not None:
+                    self.browser_url = match.group(1).decode()
+                    logger.info("%s DevTools listening on \"%s\"", log, self.browser_url)
+                    self.ready.set()
+        logger.debug("%s Process %s closed", log, name)
+
+
+def probe_port(host: str, port: int, timeout: float = 0.2) -> bool:
+    """Check whether a TCP port accepts connections
+
+    Args:
+        host    [str]  : Host to connect to
+        port    [int]  : Port to connect to
+        timeout [float]: Connection timeout in seconds
+
+    Returns:
+        [bool]: Whether the connection is successful
+    """
+    try:
+        with socket.create_connection((host, port), timeout=timeout):
+            return True
+    except OSError:
+        return False
+
+
+def find_processes(executable: Path) -> List[int]:
+    """Find the processes of an executable by scanning `/proc` (Linux only)
+    A process matches only if its `/proc/<pid>/exe` resolves to the
+    executable; command names are settable by any process, so another build
+    or an unrelated program named alike is never matched
+
+    Args:
+        executable [pathlib.Path]: Path of the executable
+
+    Returns:
+        [List[int]]: PIDs of the processes
+    """
+    log = "[find_processes]"
+    target = executable.resolve()
+    own_pid = os.getpid()
+    pids: List[int] = []
+    for entry in PROC_PATH.iterdir():
+        if not entry.name.isdigit() or int(entry.name) == own_pid:
+            continue
+        try:
+            exe = os.readlink(entry / "exe")
+        except OSError:
+            # Exited since listing, kernel thread, or someone else's process
+            continue
+        # The binary may have been replaced by an update since it started
+        if exe.endswith(DELETED_SUFFIX):
+            exe = exe[:-len(DELETED_SUFFIX)]
+        if Path(exe) == target:
+            pids.append(int(entry.name))
+    logger.debug("%s \"%s\" processes: %s", log, executable, pids)
+    return pids
+
+
+def is_alive(pid: int) -> bool:
+    """Check whether a process is still running (Linux only)
+    Zombies count as gone, since their parent may never reap them
+
+    Args:
+        pid [int]: PID of the process
+
+    Returns:
+        [bool]: Whether the process is running
+    """
+    try:
+        stat = (PROC_PATH / str(pid) / "stat").read_text()
+    except OSError:
+        return False
+    # The command name in parentheses may contain spaces
+    state = stat[stat.rfind(")") + 2:][:1]
+    return state not in ("Z", "X", "")
+
+
+def wait_exited(pids: List[int], timeout: float, interval: float) -> List[int]:
+    """Wait until processes exit or the time is up
+
+    Args:
+        pids     [List[int]]: PIDs of the processes
+        timeout  [float]    : Seconds to wait at most
+        interval [float]    : Seconds between checks
+
+    Returns:
+        [List[int]]: PIDs of the processes still running
+    """
+    deadline = monotonic() + timeout
+    alive = [pid for pid in pids if is_alive(pid)]
+    while alive and monotonic() < deadline:
+        sleep(interval)
+        alive = [pid for pid in alive if is_alive(pid)]
+    return alive
+
+
+def terminate_processes(pids: List[int], timeout: float, interval: float = 0.05) -> None:
+    """Send SIGTERM, wait for a bounded time, then SIGKILL the survivors
+
+    Args:
+        pids     [List[int]]: PIDs of the processes
+        timeout  [float]    : Seconds to wait after SIGTERM
+        interval [float]    : Seconds between checks
+    """
+    log = "[terminate_processes]"
+    for sig, wait in ((signal.SIGTERM, timeout), (signal.SIGKILL, timeout)):
+        if not pids:
+            return
+        for pid in pids:
+            try:
+                os.kill(pid, sig)
+            except ProcessLookupError:
+                pass
+            except PermissionError as err:
+                logger.warning("%s %s to %s not permitted %s", log, sig.name, pid, err)
+        logger.debug("%s %s sent to %s", log, sig.name, pids)
+        pids = wait_exited(pids, wait, interval)
+        if pids:
+            logger.warning("%s %s still running %ss after %s", log, pids, wait, sig.name)
@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+"""A module that hot-reloads the payloads into the injected windows
+The payload sources are watched for changes; a changed payload is rebuilt and
+run again in every injected window over the open connections. The payload
+tears down its earlier injection itself, so Discord is never restarted
+"""
+
+import asyncio
+import logging
+from time import monotonic
+from typing import Dict, List, Optional, Tuple
+
+from hide_sidebars.action import Action, Actions
+from hide_sidebars.connection import AsyncConnectionPool
+from hide_sidebars.supervisor import PageSupervisor
+from hide_sidebars.timing import SPANS
+
+logger = logging.getLogger(__name__)
+
+Stamp = Tuple[int, int]
+
+
+class PayloadReloader:
+    """Polls the payload sources and pushes rebuilt payloads into the windows
+    Sources are checked by modification time and size, which costs one `stat`
+    per payload per check
+
+    Class variables:
+        INTERVAL [float]: Default seconds between checks of the sources
+
+    Instance variables:
+        actions    [Actions]                   : Actions whose payloads are watched
+        pool       [AsyncConnectionPool]       : Pool of connections to the windows
+        name       [str]                       : Name of the instance, for logging
+        interval   [float]                     : Seconds between checks of the sources
+        script_ids [Optional[Dict[str, str]]]  : Compiled script IDs by action and socket URL, if compiling once
+        supervisor [Optional[PageSupervisor]]  : Supervisor of the pages, if supervising
+        stamps     [Dict[str, Optional[Stamp]]]: Last seen modification time and size of each source, by action name
+        windows    [Dict[str, Dict[str, str]]] : Injected windows by socket URL
+        latencies  [List[float]]               : Seconds from noticing each change to every window re-armed
+        task       [Optional[asyncio.Task]]    : Watching task, once started
+    """
+
+    INTERVAL = 0.25
+
+    def __init__(
+        self,
+        actions: Actions,
+        pool: AsyncConnectionPool,
+        name: str,
+        interval: float = INTERVAL,
+        script_ids: Optional[Dict[str, str]] = None,
+        supervisor: Optional[PageSupervisor] = None
+    ) -> None:
+        self.actions = actions
+        self.pool = pool
+        self.name = name
+        self.interval = interval
+        self.script_ids = script_ids
+        self.supervisor = supervisor
+        self.stamps: Dict[str, Optional[Stamp]] = {
+            action.name: self.stamp(action) for action in actions
+        }
+        self.windows: Dict[str, Dict[str, str]] = {}
+        self.latencies: List[float] = []
+        self.task: Optional[asyncio.Task] = None
+
+    @staticmethod
+    def stamp(action: Action) -> Optional[Stamp]:
+        """Get the modification time and size of the source of a payload
+
+        Args:
+            action [Action]: Action of the payload
+
+        Returns:
+            [Optional[Stamp]]: Modification time in nanoseconds and size in bytes; `None` if missing
+        """
+        try:
+            stat = action.js_path.stat()
+        except OSError:
+            return
+        return stat.st_mtime_ns, stat.st_size
+
+    def track(self, window: Dict[str, str]) -> None:
+        """Reload into a window once it is injected
+
+        Args:
+            window [Dict[str, str]]: Window info
+        """
+        self.windows[window[Action.SOCKET_URL_KEY]] = window
+
+    def start(self) -> None:
+        """Start watching the sources, if not yet"""
+        log = f"[{type(self).__name__}.start]"
+        if self.task is not None:
+            return
+        self.task = asyncio.ensure_future(self.run())
+        logger.info(
+            "%s Watching %s every %.2fs",
+            log, ", ".join(f"\"{action.js_path}\"" for action in self.actions), self.interval
+        )
+
+    async def run(self) -> None:
+        """Check the sources until cancelled"""
+        while True:
+            await asyncio.sleep(self.interval)
+            self.prune()
+            for action in self.actions:
+                stamp = self.stamp(action)
+                # A missing source is mid-save; wait for it to reappear
+                if stamp is None or stamp == self.stamps.get(action.name):
+                    continue
+                self.stamps[action.name] = stamp
+                await self.reload(action)
+
+    def prune(self) -> None:
+        """Forget the windows whose sockets have closed"""
+        for socket_url in list(self.windows):
+            dispatcher = self.pool.connections.get(socket_url)
+            if dispatcher is None or not dispatcher.open:
+                del self.windows[socket_url]
+
+    async def reload(self, action: Action) -> None:
+        """Rebuild a payload and run it again in every injected window
+        A payload that fails to build is skipped, and the one already in the
+        windows is kept
+
+        Args:
+            action [Action]: Action whose source changed
+        """
+        log = f"[{type(self).__name__}.reload]"
+        changed = monotonic()
+        loop = asyncio.get_running_loop()
+        with SPANS.span("reload", instance=self.name, action=action.name) as fields:
+            try:
+                await loop.run_in_executor(None, action.reload)
+            except (OSError, SyntaxError) as err:
+                logger.warning("%s \"%s\" not rebuilt %s", log, action.js_path, err)
+                fields["built"] = False
+                return
+            fields["built"] = True
+            if self.script_ids is not None:
+                # The compiled scripts are of the old payload
+                prefix = f"{action.name} "
+                for key in [key for key in self.script_ids if key.startswith(prefix)]:
+                    del self.script_ids[key]
+            windows = list(self.windows.values())
+            reruns = [action.run_async(window, self.pool, self.script_ids) for window in windows]
+            if self.supervisor is not None and self.supervisor.action is action:
+                reruns.append(self.supervisor.reregister())
+            results = await asyncio.gather(*reruns)
+            fields["windows"] = len(windows)
+            fields["reloaded"] = reloaded = sum(result is True for result in results)
+        latency = monotonic() - changed
+        self.latencies.append(latency)
+        logger.info(
+            "%s \"%s\" reloaded into %s/%s windows in %.1fms",
+            log, action.name, reloaded, len(windows), latency * 1000
+        )
+
+    async def wait(self) -> None:
+        """Wait until every injected window closes"""
+        while self.windows:
+            await asyncio.sleep(self.interval)
+            self.prune()
+
+    async def close(self) -> None:
+        """Stop watching and log a summary"""
+        log = f"[{type(self).__name__}.close]"
+        if self.task is not None:
+            self.task.cancel()
+            await asyncio.gather(self.task, return_exceptions=True)
+            self.task = None
+        if self.latencies:
+            logger.info(
+                "%s %s reloads, mean %.1fms, max %.1fms",
+                log,
+                len(self.latencies),
+                sum(self.latencies) / len(self.latencies) * 1000,
+                max(self.latencies) * 1000
+            )
+        else:
+            logger.info("%s No reloads", log)
@@ -0,0 +1,378 @@
+#!/usr/bin/env python3
+"""A module that serves a recorded trace back in place of Discord's debug endpoint
+Responses and frames are served in their recorded order, at the recorded
+pace or a multiple of it, so a real-world session can be rerun as often as
+needed
+
+Run as `python -m hide_sidebars.replay TRACE --remote-debugging-port=PORT`
+"""
+
+import re
+import sys
+import json
+import http
+import asyncio
+import logging
+from pathlib import Path
+from time import monotonic
+from argparse import ArgumentParser
+from typing import Dict, List, Optional, Set, Tuple
+
+import websockets
+
+from hide_sidebars.trace import Trace, TraceSession, SENT, RECEIVED, read_trace
+
+logger = logging.getLogger(__name__)
+
+# Socket URLs in the recorded bodies point at the recorded endpoint
+SOCKET_HOST_PATTERN = re.compile(r"ws://[^/\"]+/")
+
+Headers = List[Tuple[str, str]]
+Reply = Tuple[float, Optional[Dict]]
+# Time, number of commands sent before it and message of an event
+Event = Tuple[float, int, str]
+
+
+def command_key(command: Dict) -> str:
+    """Get what identifies a command regardless of its ID
+
+    Args:
+        command [Dict]: The command
+
+    Returns:
+        [str]: Its method and parameters
+    """
+    return json.dumps([command.get("method"), command.get("params", {})], sort_keys=True)
+
+
+def split_session(session: TraceSession) -> Tuple[List[Dict], Dict[int, Reply], List[Event]]:
+    """Split a recorded connection into commands, their replies and events
+
+    Args:
+        session [TraceSession]: Recorded connection
+
+    Returns:
+        [Tuple[List[Dict], Dict[int, Reply], List[Event]]]:
+            Commands in order, latency and reply by command ID, and events in order
+    """
+    commands: List[Dict] = []
+    sent_at: Dict[int, float] = {}
+    replies: Dict[int, Reply] = {}
+    events: List[Event] = []
+    for offset, kind, message in session.frames:
+        if kind == SENT:
+            command: Dict = json.loads(message)
+            commands.append(command)
+            sent_at[command["id"]] = offset
+            continue
+        reply: Dict = json.loads(message)
+        if "id" not in reply:
+            events.append((offset, len(commands), message))
+        elif reply["id"] in sent_at:
+            replies[reply["id"]] = (offset - sent_at[reply["id"]], reply)
+    return commands, replies, events
+
+
+class ReplayServer:
+    """Serves a trace
+    Each path's responses are served in turn, the last one repeated, none
+    before its recorded time. The n-th connection to a socket path replays the
+    n-th recorded connection: commands are matched to the recorded commands by
+    method and parameters, their IDs rewritten, and each reply is sent as long
+    after its command as it took the endpoint
+
+    Class variables:
+        HOST         [str]: Host to listen on
+        BROWSER_PATH [str]: Path of the browser-level socket if the trace has none
+
+    Instance variables:
+        trace    [Trace]           : The trace
+        port     [int]             : Port to listen on
+        speed    [float]           : Multiple of the recorded pace; 0 for no waits
+        started  [float]           : Time the server started listening
+        served   [Dict[str, int]]  : Number of responses or connections served, by path
+        borrowed [Dict[str, Reply]]: First recorded reply to each command on any connection, by command key
+    """
+
+    HOST = "127.0.0.1"
+    BROWSER_PATH = "/devtools/browser/replay"
+
+    def __init__(self, trace: Trace, port: int, speed: float = 1.0) -> None:
+        self.trace = trace
+        self.port = port
+        self.speed = speed
+        self.started = monotonic()
+        self.served: Dict[str, int] = {}
+        self.borrowed: Dict[str, Reply] = {}
+        for sessions in trace.sessions.values():
+            for session in sessions:
+                commands, replies, _ = split_session(session)
+                for command in commands:
+                    if command["id"] in replies:
+                        self.borrowed.setdefault(command_key(command), replies[command["id"]])
+
+    async def wait_until(self, since: float, offset: float) -> None:
+        """Wait until an offset from the recording has passed, scaled to the speed
+
+        Args:
+            since  [float]: Time the offset counts from
+            offset [float]: Recorded seconds
+        """
+        if self.speed <= 0:
+            return
+        delay = since + offset / self.speed - monotonic()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    def next_index(self, path: str, count: int) -> int:
+        """Get the recorded response or connection to serve next for a path
+
+        Args:
+            path  [str]: Requested path
+            count [int]: Number of recorded responses or connections of the path
+
+        Returns:
+            [int]: Its index
+        """
+        index = self.served.get(path, 0)
+        self.served[path] = index + 1
+        return min(index, count - 1)
+
+    def rehost(self, body: str) -> str:
+        """Point the socket URLs of a recorded body at this server
+
+        Args:
+            body [str]: Recorded body
+
+        Returns:
+            [str]: The body to serve
+        """
+        return SOCKET_HOST_PATTERN.sub(f"ws://{self.HOST}:{self.port}/", body)
+
+    async def process_request(self, path: str, headers) -> Optional[Tuple[http.HTTPStatus, Headers, bytes]]:
+        """Serve the recorded HTTP responses; let recorded sockets through
+
+        Args:
+            path    [str]                              : Requested path
+            headers [websockets.datastructures.Headers]: Request headers
+
+        Returns:
+            [Optional[Tuple[http.HTTPStatus, Headers, bytes]]]: HTTP response, or `None` to upgrade
+        """
+        log = f"[{type(self).__name__}.process_request]"
+        if path in self.trace.sessions:
+            return
+        responses = self.trace.responses.get(path)
+        if not responses:
+            logger.debug("%s \"%s\" not in the trace", log, path)
+            return http.HTTPStatus.NOT_FOUND, [], b""
+        offset, status, body = responses[self.next_index(path, len(responses))]
+        await self.wait_until(self.started, offset)
+        return (
+            http.HTTPStatus(status),
+            [("Content-Type", "application/json")],
+            self.rehost(body).encode()
+        )
+
+    async def handle(self, ws: websockets.WebSocketServerProtocol, path: str) -> None:
+        """Replay the recorded connection due next on a socket path
+
+        Args:
+            ws   [websockets.WebSocketServerProtocol]: Connection to the client
+            path [str]                               : Socket path
+        """
+        log = f"[{type(self).__name__}.handle]"
+        sessions = self.trace.sessions[path]
+        index = self.served.get(path, 0)
+        if index >= len(sessions):
+            logger.warning("%s \"%s\" connected more often than recorded", log, path)
+            await ws.close(1011, "Not in the trace")
+            return
+        self.served[path] = index + 1
+        await SessionReplay(self, ws, sessions[index]).run()
+
+    async def serve(self) -> None:
+        """Listen until cancelled"""
+        async with websockets.serve(
+            self.handle,
+            self.HOST,
+            self.port,
+            process_request=self.process_request,
+            max_size=None,
+            ping_interval=None
+        ):
+            self.started = monotonic()
+            browser_paths = [path for path in self.trace.sessions if path.startswith("/devtools/browser/")]
+            browser_path = browser_paths[0] if browser_paths else self.BROWSER_PATH
+            # Same announcement as Chromium, for readiness detection
+            print(
+                f"DevTools listening on ws://{self.HOST}:{self.port}{browser_path}",
+                file=sys.stderr,
+                flush=True
+            )
+            await asyncio.Future()
+
+
+class SessionReplay:
+    """Replays one recorded connection over a live one
+    Each response is sent from its own task, so a command the client never
+    sends holds up nothing else. An event is sent at its recorded offset, but
+    not before as many commands have arrived as had been sent before it, e.g.
+    a page event not before `Page.enable`, so that even without waits the
+    client is ready for it
+
+    Instance variables:
+        server    [ReplayServer]                      : Server, for the pace and borrowed replies
+        ws        [websockets.WebSocketServerProtocol]: Connection to the client
+        session   [TraceSession]                      : Recorded connection
+        opened    [float]                             : Time the live connection opened
+        commands  [List[Dict]]                        : Recorded commands not matched yet
+        recorded  [int]                               : Number of recorded commands
+        replies   [Dict[int, Reply]]                  : Recorded reply to each command, by recorded ID
+        events    [List[Event]]                       : Recorded events in order
+        responses [Set[asyncio.Task]]                 : Responses waiting to be sent
+        arrivals  [int]                               : Number of live commands arrived
+        arrived   [asyncio.Condition]                 : Notified on each live command
+    """
+
+    def __init__(
+        self,
+        server: ReplayServer,
+        ws: websockets.WebSocketServerProtocol,
+        session: TraceSession
+    ) -> None:
+        self.server = server
+        self.ws = ws
+        self.session = session
+        self.opened = monotonic()
+        self.commands, self.replies, self.events = split_session(session)
+        self.recorded = len(self.commands)
+        self.responses: Set[asyncio.Task] = set()
+        self.arrivals = 0
+        self.arrived = asyncio.Condition()
+
+    def match(self, command: Dict) -> Optional[Reply]:
+        """Take the recorded reply to a live command
+        A command recorded with the same method and parameters on this
+        connection is matched first, then one recorded on another connection,
+        e.g. when another window resolved the class names this time, then one
+        with the same method on this connection
+
+        Args:
+            command [Dict]: Live command
+
+        Returns:
+            [Optional[Reply]]: Latency and reply, the reply `None` if never recorded; `None` if unmatched
+        """
+        key = command_key(command)
+        for recorded in self.commands:
+            if command_key(recorded) == key:
+                self.commands.remove(recorded)
+                return self.replies.get(recorded["id"], (0.0, None))
+        borrowed = self.server.borrowed.get(key)
+        if borrowed is not None:
+            return borrowed
+        for recorded in self.commands:
+            if recorded.get("method") == command.get("method"):
+                self.commands.remove(recorded)
+                return self.replies.get(recorded["id"], (0.0, None))
+
+    async def respond(self, command_id: int, arrived: float, latency: float, reply: Dict) -> None:
+        """Send a recorded reply as long after its command as it took the endpoint
+
+        Args:
+            command_id [int]  : Live ID of the command
+            arrived    [float]: Time the command arrived
+            latency    [float]: Recorded seconds from the command to the reply
+            reply      [Dict] : Recorded reply
+        """
+        await self.server.wait_until(arrived, latency)
+        try:
+            await self.ws.send(json.dumps({**reply, "id": command_id}))
+        except websockets.ConnectionClosed:
+            pass
+
+    async def receive(self) -> None:
+        """Answer every live command until the client closes"""
+        log = f"[{type(self).__name__}.receive]"
+        async for message in self.ws:
+            command: Dict = json.loads(message)
+            async with self.arrived:
+                self.arrivals += 1
+                self.arrived.notify_all()
+            matched = self.match(command)
+            if matched is None:
+                logger.warning("%s \"%s\" %s not in the trace", log, self.session.path, command.get("method"))
+                await self.ws.send(json.dumps({
+                    "id": command.get("id"),
+                    "error": {"code": -32601, "message": f"'{command.get('method')}' not in the trace"},
+                }))
+                continue
+            latency, reply = matched
+            if reply is None:
+                # The endpoint never answered it either
+                continue
+            task = asyncio.ensure_future(self.respond(command.get("id"), monotonic(), latency, reply))
+            self.responses.add(task)
+            task.add_done_callback(self.responses.discard)
+
+    async def wait_for_commands(self, count: int) -> None:
+        """Wait until a number of live commands have arrived
+
+        Args:
+            count [int]: Number of commands
+        """
+        async with self.arrived:
+            await self.arrived.wait_for(lambda: self.arrivals >= count)
+
+    async def emit(self) -> None:
+        """Send the recorded events in order, then close if the endpoint did"""
+        for offset, after, message in self.events:
+            await self.wait_for_commands(after)
+            await self.server.wait_until(self.opened, offset - self.session.opened)
+            await self.ws.send(message)
+        if self.session.closed is not None:
+            await self.wait_for_commands(self.recorded)
+            await self.server.wait_until(self.opened, self.session.closed - self.session.opened)
+            await self.ws.close()
+
+    async def run(self) -> None:
+        """Replay until either side closes"""
+        receiver = asyncio.ensure_future(self.receive())
+        emitter = asyncio.ensure_future(self.emit())
+        try:
+            await receiver
+        except websockets.ConnectionClosed:
+            pass
+        finally:
+            emitter.cancel()
+            responses = list(self.responses)
+            for task in responses:
+                task.cancel()
+            await asyncio.gather(emitter, *responses, return_exceptions=True)
+
+
+def main() -> None:
+    """Parse arguments like Discord would get them, and serve the trace"""
+    parser = ArgumentParser(description="Replay a recorded Discord debug endpoint")
+    parser.add_argument("trace", type=Path, help="Path of the trace")
+    parser.add_argument("--remote-debugging-port", type=int, required=True, dest="port")
+    parser.add_argument(
+        "--speed", type=float, default=1.0,
+        help="Multiple of the recorded pace, e.g. 10 for ten times as fast; 0 for no waits"
+    )
+    args, _ = parser.parse_known_args()
+    try:
+        trace = read_trace(args.trace)
+    except (OSError, ValueError) as err:
+        print(f"Trace not read: {err}", file=sys.stderr)
+        sys.exit(2)
+    server = ReplayServer(trace, args.port, args.speed)
+    try:
+        asyncio.run(server.serve())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""A module that decides when a Discord that went down is relaunched
+Relaunches back off exponentially while Discord keeps going down soon after
+starting. A run that stays up long enough resets the backoff and the budget
+"""
+
+import logging
+import statistics
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class RestartPolicy:
+    """Backoff, budget and bookkeeping of the relaunches of one instance
+
+    Class variables:
+        BUDGET        [int]  : Default number of relaunches allowed in a row
+        INITIAL_DELAY [float]: Seconds before the second relaunch in a row; the first is immediate
+        MAX_DELAY     [float]: Maximum seconds before a relaunch
+        STABLE_AFTER  [float]: Seconds up after which a run no longer counts toward the budget
+
+    Instance variables:
+        budget    [int]        : Number of relaunches allowed in a row
+        streak    [int]        : Relaunches in a row so far
+        restarts  [int]        : Relaunches in total
+        crashes   [int]        : Exits with a failure code or signal in total
+        downtimes [List[float]]: Seconds from each exit to the re-injection
+    """
+
+    BUDGET = 5
+    INITIAL_DELAY = 1.0
+    MAX_DELAY = 60.0
+    STABLE_AFTER = 300.0
+
+    def __init__(self, budget: int = BUDGET) -> None:
+        self.budget = budget
+        self.streak = 0
+        self.restarts = 0
+        self.crashes = 0
+        self.downtimes: List[float] = []
+
+    @staticmethod
+    def crashed(exit_code: Optional[int]) -> bool:
+        """Check whether an exit code means a crash
+
+        Args:
+            exit_code [Optional[int]]: Exit code, negative for a signal; `None` if unknown, e.g. when attached
+
+        Returns:
+            [bool]: Whether Discord crashed rather than exited
+        """
+        return exit_code is not None and exit_code != 0
+
+    def next_delay(self, uptime: float, exit_code: Optional[int]) -> Optional[float]:
+        """Count a relaunch and get how long to wait before it
+
+        Args:
+            uptime    [float]        : Seconds Discord was up
+            exit_code [Optional[int]]: Exit code of Discord, if known
+
+        Returns:
+            [Optional[float]]: Seconds to wait; `None` if the budget is spent
+        """
+        if self.crashed(exit_code):
+            self.crashes += 1
+        if uptime >= self.STABLE_AFTER:
+            self.streak = 0
+        if self.streak >= self.budget:
+            return
+        delay = 0.0 if self.streak == 0 else min(
+            self.INITIAL_DELAY * 2 ** (self.streak - 1), self.MAX_DELAY
+        )
+        self.streak += 1
+        self.restarts += 1
+        return delay
+
+    def recovered(self, downtime: float) -> None:
+        """Record the downtime of a relaunch that got injected
+
+        Args:
+            downtime [float]: Seconds from the exit to the re-injection
+        """
+        self.downtimes.append(downtime)
+
+    def summary(self, name: str) -> Dict[str, float]:
+        """Log and return the statistics of the relaunches
+
+        Args:
+            name [str]: Name of the instance
+
+        Returns:
+            [Dict[str, float]]: Counts, and total, mean and max seconds of downtime
+        """
+        log = f"[{type(self).__name__}.summary]"
+        summary = {
+            "restarts": self.restarts,
+            "crashes": self.crashes,
+            "recovered": len(self.downtimes),
+            "downtime_total": round(sum(self.downtimes), 3),
+            "downtime_mean": round(statistics.mean(self.downtimes), 3) if self.downtimes else 0.0,
+            "downtime_max": round(max(self.downtimes), 3) if self.downtimes else 0.0,
+        }
+        logger.info("%s %s: %s", log, name, summary)
+        return summary
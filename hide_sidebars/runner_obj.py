@@ -2,16 +2,31 @@
 """Module that contains the objects for each operating system."""
 
 import os.path
+import asyncio
 import subprocess
 import logging
 from pathlib import Path
+from http.client import HTTPException
 from string import Template
-from time import sleep
+from itertools import count
+from time import sleep, monotonic
 from typing import List, Dict, Optional
 
-import requests
-
-from hide_sidebars.action import ACTIONS
+from hide_sidebars.action import ACTIONS, Action
+from hide_sidebars.class_names import ClassNameResolver, hashed_names
+from hide_sidebars.log_utils import Abbreviated
+from hide_sidebars.connection import ConnectionPool, AsyncConnectionPool
+from hide_sidebars.http_json import JsonClient, JsonResponse
+from hide_sidebars.discovery import TargetDiscovery
+from hide_sidebars.executables import newest_executable
+from hide_sidebars.process_watch import OutputReader, probe_port, find_processes, terminate_processes
+from hide_sidebars.supervisor import PageSupervisor
+from hide_sidebars.targets import TargetRegistry
+from hide_sidebars.monitor import RendererMonitor
+from hide_sidebars.reloader import PayloadReloader
+from hide_sidebars.page_ready import wait_document, wait_document_sync
+from hide_sidebars.restart import RestartPolicy
+from hide_sidebars.timing import SPANS
 from hide_sidebars.custom_types import RunnerArgs
 
 logger = logging.getLogger(__name__)
@@ -25,19 +40,52 @@ class Runner:
         DEFAULT_STABLE_PATH_PATTERN [Optional[str]]         : Glob pattern of default path of Discord executable
         DEFAULT_PTB_PATH_PATTERN    [Optional[str]]         : Glob pattern of default path of DiscordPTB executable
         DEFAULT_PORT                [int]                   : Default port for the debugging session to run
+        DEFAULT_HOST                [str]                   : Host the debugging session is served on
         DEBUG_PARAMETER             [Template]              : Parameter template to trigger Discord debugging mode
         MINIMIZED_PARAMETR          [str]                   : Parameter to ask Discord to start minimized
         URL                         [Template]              : URL template of the debugging session
+        VERSION_URL                 [Template]              : URL template of the browser version info
+        CREATION_FLAGS              [int]                   : Flags to start the Discord process with
+        READY_TIMEOUT               [float]                 : Seconds to wait for the debug endpoint
+        PROBE_INITIAL_DELAY         [float]                 : Initial seconds between port probes
+        PROBE_MAX_DELAY             [float]                 : Maximum seconds between port probes
+        RETRY_INITIAL_DELAY         [float]                 : Initial seconds between injection attempts
+        RETRY_MAX_DELAY             [float]                 : Maximum seconds between injection attempts
+        EXIT_POLL_INTERVAL          [float]                 : Seconds between checks that an attached Discord is still up
 
     Instance variables:
         discord_path [pathlib.Path]              : Path of Discord executable
         is_ptb       [bool]                      : Whether the Discord executable is PTB
+        host         [str]                       : Host the debugging session is served on
         port         [int]                       : Port for the debugging session to run
         url          [str]                       : URL of the debugging session
+        version_url  [str]                       : URL of the browser version info
+        http         [JsonClient]                : Kept-alive connection to the debug endpoint
         minimized    [bool]                      : Whether to start Discord minimized
         boot         [bool]                      : Whether to patch registry to override boot
         boot_path    [Optional[pathlib.Path]]    : Path of the boot script file, if not default
+        sync         [bool]                      : Whether to use the synchronous injection engine
+        attach       [bool]                      : Whether to attach to a running Discord if possible
+        attached     [bool]                      : Whether attached to a running Discord instead of starting one
+        actions      [Actions]                   : Actions of this instance, adapted to its class names
+        class_names  [ClassNameResolver]         : Resolver of the live class names
+        class_names_used [bool]                  : Whether the actions use the resolved class names
+        pool         [ConnectionPool]            : Pool of synchronous connections to the windows
+        async_pool   [AsyncConnectionPool]       : Pool of asynchronous connections to the windows
+        target_states [TargetRegistry]           : States of the windows across polls
+        script_ids   [Optional[Dict[str, str]]]  : Compiled script IDs by action and socket URL, if compiling once
+        supervisor   [Optional[PageSupervisor]]  : Supervisor of the pages, if supervising
+        monitor      [Optional[RendererMonitor]] : Sampler of the renderer metrics, if monitoring
+        reloader     [Optional[PayloadReloader]] : Hot reloader of the payloads, if watching
+        restarts     [Optional[RestartPolicy]]   : Relaunch policy and counts, if restarting
+        command      [Optional[List[str]]]       : Command Discord was started with, kept for relaunches
+        down_since   [Optional[float]]           : Time Discord went down, until a relaunch is injected
+        name         [str]                       : Name of the instance, for logging
         process [Optional[subprocess.Popen[str]]]: The started Discord process
+        output_reader [Optional[OutputReader]]   : Reader of the started Discord process output
+        launched     [Optional[float]]           : Time the process was started, if started
+        ready_after  [Optional[float]]           : Seconds from start to debug endpoint readiness, if ready
+        injected_after [Optional[float]]         : Seconds from start to the first injection, if injected
     """
 
     DEFAULT_PATH_ROOT: Optional[Path] = None
@@ -46,15 +94,24 @@ class Runner:
     DEFAULT_PORT = 34726
     DEBUG_PARAMETER = Template("--remote-debugging-port=${port}")
     MINIMIZED_PARAMETER = "--start-minimized"
-    URL = Template("http://localhost:${port}/json")
+    DEFAULT_HOST = "localhost"
+    URL = Template("http://${host}:${port}/json")
+    VERSION_URL = Template("http://${host}:${port}/json/version")
+    CREATION_FLAGS = 0
+    READY_TIMEOUT = 60.0
+    PROBE_INITIAL_DELAY = 0.05
+    PROBE_MAX_DELAY = 1.0
+    RETRY_INITIAL_DELAY = 0.05
+    RETRY_MAX_DELAY = 1.0
+    EXIT_POLL_INTERVAL = 1.0
 
     def __new__(cls, *args, **kwargs):
         """Prevents `Runner` from being directly initialized"""
         log = f"[{cls.__name__}.__new__]"
         if cls is Runner:
             logger.critical(
-                f"{log} Initiation has to be specialized by operating system",
-                stack_info=True
+                "%s Initiation has to be specialized by operating system",
+                log, stack_info=True
             )
             raise NotImplementedError(
                 "Initiation has to be specialized by operating system!"
@@ -66,16 +123,16 @@ class Runner:
         self.is_ptb: bool = False
         # No path provided. Check defaults
         if args.discord_path is None:
-            logger.info(f"{log} No \"discord_path\" provided")
+            logger.info("%s No \"discord_path\" provided", log)
             root = self.DEFAULT_PATH_ROOT
             stable_glob = self.DEFAULT_STABLE_PATH_PATTERN
             ptb_glob = self.DEFAULT_PTB_PATH_PATTERN
-            logger.debug(f"{log} Default path root: \"{root}\"")
-            logger.debug(f"{log} Default glob stable: \"{stable_glob}\"")
-            logger.debug(f"{log} Default glob PTB: \"{ptb_glob}\"")
+            logger.debug("%s Default path root: \"%s\"", log, root)
+            logger.debug("%s Default glob stable: \"%s\"", log, stable_glob)
+            logger.debug("%s Default glob PTB: \"%s\"", log, ptb_glob)
             # No defaults
             if root is None or all(g is None for g in [stable_glob, ptb_glob]):
-                logger.critical(f"{log} No Discord executable path provided")
+                logger.critical("%s No Discord executable path provided", log)
                 raise ValueError("No Discord executable path provided!")
             # Check default stable
             if not args.ptb and (path := self.default_path(root, stable_glob)) is not None:
@@ -86,28 +143,29 @@ class Runner:
                 self.discord_path = path
             # No executable found
             else:
-                logger.critical(
-                    f"{log} No Discord executable found in default paths"
-                )
+                logger.critical("%s No Discord executable found in default paths", log)
                 raise FileNotFoundError(
                     f"No Discord executable found in root \"{root}\" with patterns {[stable_glob, ptb_glob]} and ptb flag {args.ptb}"
                 )
         # Test provided path validity
         elif not args.discord_path.is_file():
-            logger.critical(f"{log} Provided `discord_path` is not a file")
+            logger.critical("%s Provided `discord_path` is not a file", log)
             raise FileNotFoundError(f"\"{args.discord_path}\" is not a file!")
         # Check if provided path is potentially PTB
         else:
-            logger.info(f"{log} Provided `discord_path` used")
+            logger.info("%s Provided `discord_path` used", log)
             self.discord_path = args.discord_path
             self.is_ptb = "ptb" in self.discord_path.name.lower()
         # PTB flag override
         if args.ptb:
-            logger.info(f"{log} PTB flag overridden")
+            logger.info("%s PTB flag overridden", log)
             self.is_ptb = args.ptb
         # Other variables
+        self.host = self.DEFAULT_HOST
         self.port = args.port or self.DEFAULT_PORT
-        self.url = self.URL.substitute(port=self.port)
+        self.url = self.URL.substitute(host=self.host, port=self.port)
+        self.version_url = self.VERSION_URL.substitute(host=self.host, port=self.port)
+        self.http = JsonClient()
         self.minimized = args.minimized
         self.boot: bool = False
         self.boot_path: Optional[Path] = None
@@ -115,11 +173,69 @@ class Runner:
             self.boot = True
             if isinstance(args.boot, str):
                 self.boot_path = Path(args.boot)
+        self.sync = args.sync
+        self.attach = args.attach
+        self.attached = False
+        self.actions = ACTIONS.copy()
+        self.class_names = ClassNameResolver({
+            name: prefix
+            for action in self.actions
+            for name, prefix in hashed_names(action.built_js).items()
+        })
+        self.class_names_used = False
+        self.pool = ConnectionPool()
+        self.async_pool = AsyncConnectionPool()
+        self.target_states = TargetRegistry()
+        self.script_ids: Optional[Dict[str, str]] = {} if args.compile_once else None
+        self.supervisor: Optional[PageSupervisor] = None
+        if args.supervise:
+            self.supervisor = PageSupervisor(
+                self.actions.init, self.async_pool, self.script_ids
+            )
+        self.name = f"{self.discord_path.stem}:{self.port}"
+        self.monitor: Optional[RendererMonitor] = None
+        if args.monitor is not None:
+            if args.sync:
+                logger.warning("%s Monitoring needs the asynchronous engine; ignored", log)
+            else:
+                self.monitor = RendererMonitor(self.async_pool, self.name, args.monitor)
+        self.reloader: Optional[PayloadReloader] = None
+        if args.watch is not None:
+            if args.sync:
+                logger.warning("%s Watching needs the asynchronous engine; ignored", log)
+            else:
+                self.reloader = PayloadReloader(
+                    self.actions, self.async_pool, self.name, args.watch,
+                    self.script_ids, self.supervisor
+                )
+        self.restarts: Optional[RestartPolicy] = None
+        if args.restart is not None:
+            self.restarts = RestartPolicy(args.restart)
+        self.command: Optional[List[str]] = None
+        self.down_since: Optional[float] = None
         self.process: Optional[subprocess.Popen[str]] = None
-        logger.debug(f"{log} Initialized: {self.__dict__}")
+        self.output_reader: Optional[OutputReader] = None
+        self.launched: Optional[float] = None
+        self.ready_after: Optional[float] = None
+        self.injected_after: Optional[float] = None
+        logger.debug("%s Initialized: %s", log, Abbreviated(dict(self.__dict__)))
 
-    def default_path(self, root: Path, pattern: Optional[str]) -> Optional[Path]:
-        """Get the default path , set the vars, and return whether it exists
+    @classmethod
+    def default_builds(cls) -> List[Path]:
+        """Get the executables of all Discord builds installed in default paths
+
+        Returns:
+            [List[pathlib.Path]]: Stable and PTB executables found
+        """
+        if cls.DEFAULT_PATH_ROOT is None:
+            return []
+        patterns = [cls.DEFAULT_STABLE_PATH_PATTERN, cls.DEFAULT_PTB_PATH_PATTERN]
+        paths = (cls.default_path(cls.DEFAULT_PATH_ROOT, pattern) for pattern in patterns)
+        return [path for path in paths if path is not None]
+
+    @classmethod
+    def default_path(cls, root: Path, pattern: Optional[str]) -> Optional[Path]:
+        """Get the newest executable in the default path, if it exists
 
         Args:
             root    [pathlib.Path] : Root path to run the pattern in
@@ -128,74 +244,619 @@ class Runner:
         Returns:
             [Optional[pathlib.Path]]: A path if it is found; `None` otherwise
         """
-        log = f"[{type(self).__name__}.default_path]"
+        log = f"[{cls.__name__}.default_path]"
         if pattern is None:
-            logger.warn(f"{log} Empty pattern")
+            logger.warning("%s Empty pattern", log)
             return
-        paths = list(root.glob(pattern))
-        if not paths:
-            logger.warn(
-                f"{log} No Discord executable found in \"{root}\" with pattern \"{pattern}\""
+        path = newest_executable(root, pattern)
+        if path is None:
+            logger.warning(
+                "%s No Discord executable found in \"%s\" with pattern \"%s\"",
+                log, root, pattern
             )
-            return
-        return paths[-1]
+        return path
 
     def run(self) -> None:
         """Injection go brrrr"""
         log = f"[{type(self).__name__}.run]"
-        self.kill_running()
-        logger.debug(f"{log} Running instances killed")
-        self.start_program()
-        logger.debug(
-            f"{log} Discord started process {self.process.pid}"
-        )
-        while True:
-            sleep(1)
+        try:
+            if not self.try_attach():
+                with SPANS.span("kill_running"):
+                    self.kill_running()
+                logger.debug("%s Running instances killed", log)
+                with SPANS.span("start_program"):
+                    self.start_program()
+                logger.debug("%s Discord started process %s", log, self.process.pid)
+            self.inject()
+            self.stay_up()
+            if self.boot:
+                with SPANS.span("patch_boot"):
+                    self.patch_boot()
+        finally:
+            self.close()
+            if self.restarts is not None:
+                self.restarts.summary(self.name)
+            SPANS.summary()
+
+    def close(self) -> None:
+        """Close the keep-alive endpoint client and any connections left open
+        The asynchronous connections belong to the event loop of each
+        injection, and `inject_async` closes them before it ends
+        """
+        log = f"[{type(self).__name__}.close]"
+        self.http.close()
+        self.pool.close_all()
+        if self.async_pool.connections:
+            logger.warning(
+                "%s %s asynchronous connections outlived their event loop",
+                log, len(self.async_pool.connections)
+            )
+            self.async_pool.connections.clear()
+
+    def inject(self) -> bool:
+        """Inject with the engine asked for
+
+        Returns:
+            [bool]: Whether the injection is successful
+        """
+        with SPANS.span("inject", sync=self.sync) as fields:
+            if self.sync:
+                fields["injected"] = injected = self.inject_sync()
+            else:
+                fields["injected"] = injected = asyncio.run(self.inject_async())
+        return injected
+
+    def stay_up(self) -> None:
+        """Wait for Discord to exit, relaunching it for as long as restarting"""
+        while self.recover():
+            pass
+
+    def recover(self) -> bool:
+        """Wait for Discord to exit, then relaunch and re-inject it if restarting
+        The built payload, resolved class names and command are reused, so
+        a relaunch costs about as much as Discord's own startup
+
+        Returns:
+            [bool]: Whether Discord was relaunched; `False` once it is to stay down
+        """
+        log = f"[{type(self).__name__}.recover]"
+        if self.restarts is None:
+            if self.process is not None:
+                self.process.wait()
+            return False
+        exit_code = self.wait_exit()
+        exited = monotonic()
+        uptime = exited - (self.launched or exited)
+        if self.restarts.crashed(exit_code):
+            logger.warning("%s %s crashed with %s after %.1fs", log, self.name, exit_code, uptime)
+        else:
+            logger.info("%s %s exited after %.1fs", log, self.name, uptime)
+        delay = self.restarts.next_delay(uptime, exit_code)
+        if delay is None:
+            logger.warning(
+                "%s %s relaunched %s times in a row; staying down",
+                log, self.name, self.restarts.streak
+            )
+            return False
+        with SPANS.span(
+            "relaunch", instance=self.name, restart=self.restarts.restarts,
+            exit_code=exit_code, delay=delay
+        ):
+            logger.info("%s Relaunching %s in %.2fs", log, self.name, delay)
+            sleep(delay)
+            self.reset_session()
+            self.down_since = exited
+            with SPANS.span("kill_running", instance=self.name):
+                self.kill_running()
+            self.relaunch()
+        self.inject()
+        return True
+
+    def wait_exit(self) -> Optional[int]:
+        """Wait until Discord exits
+        An attached Discord is not a child process, so its debug port is
+        watched until it closes instead
+
+        Returns:
+            [Optional[int]]: Exit code, negative for a signal; `None` if attached
+        """
+        if self.process is not None:
+            return self.process.wait()
+        while probe_port(self.host, self.port):
+            sleep(self.EXIT_POLL_INTERVAL)
+        return None
+
+    def reset_session(self) -> None:
+        """Forget the windows and connections of the Discord that went down"""
+        self.pool = ConnectionPool()
+        self.async_pool = AsyncConnectionPool()
+        self.target_states = TargetRegistry()
+        if self.script_ids is not None:
+            self.script_ids = {}
+        if self.supervisor is not None:
+            self.supervisor = PageSupervisor(
+                self.actions.init, self.async_pool, self.script_ids
+            )
+        if self.monitor is not None:
+            self.monitor = RendererMonitor(self.async_pool, self.name, self.monitor.interval)
+        if self.reloader is not None:
+            self.reloader = PayloadReloader(
+                self.actions, self.async_pool, self.name, self.reloader.interval,
+                self.script_ids, self.supervisor
+            )
+        self.attached = False
+
+    def relaunch(self) -> None:
+        """Start Discord again with the command of the first start
+        The executable is looked up again only if it is gone, e.g. after an update"""
+        log = f"[{type(self).__name__}.relaunch]"
+        if not self.discord_path.is_file() and self.DEFAULT_PATH_ROOT is not None:
+            pattern = self.DEFAULT_PTB_PATH_PATTERN if self.is_ptb else self.DEFAULT_STABLE_PATH_PATTERN
+            path = self.default_path(self.DEFAULT_PATH_ROOT, pattern)
+            if path is not None:
+                logger.info("%s \"%s\" gone; now \"%s\"", log, self.discord_path, path)
+                self.discord_path = path
+                self.command = None
+        with SPANS.span("start_program", instance=self.name):
+            self.start_program()
+        logger.info("%s %s started process %s", log, self.name, self.process.pid)
+
+    def try_attach(self) -> bool:
+        """Attach to a Discord already serving the debug endpoint, if asked to
+
+        Returns:
+            [bool]: Whether attached; if not, Discord has to be started
+        """
+        log = f"[{type(self).__name__}.try_attach]"
+        if not self.attach:
+            return False
+        with SPANS.span("attach", instance=self.name) as fields:
+            fields["attached"] = self.attached = (
+                probe_port(self.host, self.port) and self.get_info() is not None
+            )
+        if not self.attached:
+            logger.info("%s Nothing to attach to on port %s; starting Discord", log, self.port)
+            return False
+        self.launched = monotonic()
+        logger.info("%s Attached to port %s", log, self.port)
+        return True
+
+    def process_exited(self) -> bool:
+        """Check whether Discord is gone
+        When attached, there is no process to poll; the caller only asks
+        once the debug endpoint has stopped answering
+
+        Returns:
+            [bool]: Whether Discord has exited
+        """
+        return self.process is None or self.process.poll() is not None
+
+    def inject_sync(self) -> bool:
+        """Poll the windows and inject into them one at a time
+
+        Returns:
+            [bool]: Whether the injection is successful
+        """
+        log = f"[{type(self).__name__}.inject_sync]"
+        try:
+            return self.poll_and_inject_sync()
+        finally:
+            self.pool.close_all()
+            logger.debug("%s Connections closed", log)
+
+    def poll_and_inject_sync(self) -> bool:
+        """Synchronous polling loop
+
+        Returns:
+            [bool]: Whether the injection is successful
+        """
+        log = f"[{type(self).__name__}.poll_and_inject_sync]"
+        self.wait_ready()
+        delay = self.RETRY_INITIAL_DELAY
+        for attempt in count():
+            if attempt:
+                sleep(delay)
+                delay = min(delay * 2, self.RETRY_MAX_DELAY)
             info = self.get_info()
             if info is None:
-                if self.process.poll() is None:
+                if not self.process_exited():
                     # No info got; retry
-                    logger.warn(f"{log} No info got")
+                    logger.warning("%s No info got", log)
                     continue
                 else:
                     # Process terminated; exit loop
-                    logger.warn(f"{log} Process terminated")
-                    break
-            for window in info:
-                if ACTIONS.init.run(window):
+                    logger.warning("%s Process terminated", log)
+                    return False
+            self.pool.prune(window.get(Action.SOCKET_URL_KEY) for window in info)
+            for window in self.target_states.pending(info):
+                success = self.document_ready_sync(window)
+                if success:
+                    self.resolve_class_names_sync(window)
+                    success = all(action.run(window, self.pool) for action in self.actions)
+                self.target_states.conclude(window, success)
+                if success:
                     # Injection successful
-                    logger.info(f"{log} Injection successful")
-                    break
+                    logger.info("%s Injection successful", log)
+                    self.note_injected()
+                    return True
+
+    async def inject_async(self) -> bool:
+        """Discover the windows and inject into all of them concurrently
+
+        Returns:
+            [bool]: Whether the injection is successful
+        """
+        log = f"[{type(self).__name__}.inject_async]"
+        discovery = TargetDiscovery()
+        try:
+            if self.reloader is not None:
+                self.reloader.start()
+            success = await self.poll_and_inject_async(discovery)
+            if self.monitor is not None:
+                # Keep sampling until the windows close
+                await self.monitor.wait()
+            if self.reloader is not None:
+                # Keep reloading until the windows close
+                await self.reloader.wait()
+            return success
+        finally:
+            await discovery.close()
+            if self.reloader is not None:
+                await self.reloader.close()
+            if self.supervisor is not None:
+                await self.supervisor.close()
+            if self.monitor is not None:
+                await self.monitor.close()
+            await self.async_pool.close_all()
+            logger.debug("%s Connections closed", log)
+
+    async def poll_and_inject_async(self, discovery: TargetDiscovery) -> bool:
+        """Asynchronous polling loop
+        Switches to event-driven discovery once the browser endpoint is up
+        Runs until the process exits if supervising
+
+        Args:
+            discovery [TargetDiscovery]: Browser-level target discovery
+
+        Returns:
+            [bool]: Whether the injection is successful
+        """
+        log = f"[{type(self).__name__}.poll_and_inject_async]"
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, self.wait_ready)
+        delay = self.RETRY_INITIAL_DELAY
+        for attempt in count():
+            if attempt:
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, self.RETRY_MAX_DELAY)
+            if discovery.available:
+                version = await self.get_version_async()
+                if version is not None:
+                    browser_url = version.get(TargetDiscovery.SOCKET_URL_KEY)
+                    if browser_url is None:
+                        # Fall back to polling for good
+                        logger.warning("%s No browser endpoint; polling", log)
+                        discovery.available = False
+                    elif await discovery.connect(browser_url):
+                        injected = await self.discover_and_inject_async(discovery)
+                        if injected and self.supervisor is None:
+                            return True
+                        continue
+            info = await loop.run_in_executor(None, self.get_info)
+            if info is None:
+                if not self.process_exited():
+                    # No info got; retry
+                    logger.warning("%s No info got", log)
+                    continue
+                else:
+                    # Process terminated; exit loop
+                    logger.warning("%s Process terminated", log)
+                    return False
+            await self.async_pool.prune(
+                window.get(Action.SOCKET_URL_KEY) for window in info
+            )
+            if await self.inject_windows(self.target_states.pending(info)) and self.supervisor is None:
+                # Injection successful
+                logger.info("%s Injection successful", log)
+                return True
+
+    async def discover_and_inject_async(self, discovery: TargetDiscovery) -> bool:
+        """Inject into windows as soon as the browser reports them
+        Runs until the browser socket closes if supervising
+
+        Args:
+            discovery [TargetDiscovery]: Connected browser-level target discovery
+
+        Returns:
+            [bool]: Whether the injection is successful
+        """
+        log = f"[{type(self).__name__}.discover_and_inject_async]"
+        loop = asyncio.get_running_loop()
+        injected = asyncio.Event()
+        tasks = set()
+        # Failed targets get no further events, so each is retried on a timer
+        timers: Dict[str, asyncio.TimerHandle] = {}
+        stopped = False
+
+        def start(window: Dict[str, str]) -> None:
+            task = asyncio.ensure_future(inject(window))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+
+        def schedule_retry(window: Dict[str, str]) -> None:
+            delay = self.target_states.retry_in(window)
+            if delay is not None and not stopped:
+                timers[self.target_states.target_id(window)] = loop.call_later(delay, retry, window)
+
+        def retry(window: Dict[str, str]) -> None:
+            # Claimed, injected or destroyed since, if no longer failed
+            if stopped or self.target_states.retry_in(window) is None:
+                return
+            if self.target_states.claim(window):
+                start(window)
+            else:
+                schedule_retry(window)
+
+        async def inject(window: Dict[str, str]) -> None:
+            if await self.inject_window(window):
+                injected.set()
+            else:
+                schedule_retry(window)
+
+        async def watch() -> None:
+            async for event, window in discovery.watch():
+                if event == discovery.DESTROYED:
+                    self.target_states.forget(window["id"])
+                    await self.async_pool.evict(window[Action.SOCKET_URL_KEY])
+                    continue
+                if self.target_states.claim(window):
+                    start(window)
+
+        watcher = asyncio.ensure_future(watch())
+        waiter = asyncio.ensure_future(injected.wait())
+        if self.supervisor is None:
+            await asyncio.wait({watcher, waiter}, return_when=asyncio.FIRST_COMPLETED)
+        else:
+            await watcher
+        watcher.cancel()
+        waiter.cancel()
+        stopped = True
+        for timer in timers.values():
+            timer.cancel()
+        # Let injections into other windows finish
+        await asyncio.gather(*tasks, return_exceptions=True)
+        if self.supervisor is not None:
+            logger.info("%s Browser socket closed while supervising", log)
+            return injected.is_set()
+        if injected.is_set():
+            logger.info("%s Injection successful", log)
+            return True
+        logger.warning("%s Browser socket lost before injection", log)
+        return False
+
+    async def inject_windows(self, info: List[Dict[str, str]]) -> bool:
+        """Inject into windows concurrently
+
+        Args:
+            info [List[Dict[str, str]]]: Window infos
+
+        Returns:
+            [bool]: Whether the injection is successful in any window
+        """
+        log = f"[{type(self).__name__}.inject_windows]"
+        tasks = [asyncio.ensure_future(self.inject_window(window)) for window in info]
+        success = False
+        for task in asyncio.as_completed(tasks):
+            if await task and not success:
+                logger.info("%s First window injected", log)
+                success = True
+        return success
+
+    async def inject_window(self, window: Dict[str, str]) -> bool:
+        """Inject into a window once its document is ready, or keep it
+        supervised if supervising
+        Samples the window before and after if monitoring, and reloads into
+        it if watching
+
+        The outcome is recorded in `target_states`, which claimed the window
+
+        Args:
+            window [Dict[str, str]]: Window info
+
+        Returns:
+            [bool]: Whether the injection is successful
+        """
+        success = False
+        try:
+            if not await self.document_ready(window):
+                return False
+            if self.monitor is not None:
+                await self.monitor.baseline(window)
+            await self.resolve_class_names(window)
+            if self.supervisor is not None:
+                success = await self.supervisor.attach(window)
+            else:
+                results = await self.actions.run_async(window, self.async_pool, script_ids=self.script_ids)
+                success = all(results.values())
+        finally:
+            self.target_states.conclude(window, success)
+        if success:
+            self.note_injected()
+            if self.monitor is not None:
+                self.monitor.watch(window)
+            if self.reloader is not None:
+                self.reloader.track(window)
+        return success
+
+    async def document_ready(self, window: Dict[str, str]) -> bool:
+        """Wait until the document of a window is ready for the payload
+
+        Args:
+            window [Dict[str, str]]: Window info
+
+        Returns:
+            [bool]: Whether the document is ready; `True` for ineligible windows, which the actions turn down
+        """
+        if not self.target_states.eligible(window):
+            return True
+        dispatcher = await self.async_pool.get(window[Action.SOCKET_URL_KEY])
+        if dispatcher is None:
+            return False
+        with SPANS.span("document_ready", instance=self.name) as fields:
+            fields["ready"] = ready = await wait_document(dispatcher)
+        return ready
+
+    def document_ready_sync(self, window: Dict[str, str]) -> bool:
+        """Wait until the document of a window is ready for the payload,
+        through a synchronous connection
+
+        Args:
+            window [Dict[str, str]]: Window info
+
+        Returns:
+            [bool]: Whether the window is eligible and its document is ready
+        """
+        if not self.target_states.eligible(window):
+            return False
+        ws = self.pool.get(window[Action.SOCKET_URL_KEY])
+        if ws is None:
+            return False
+        with SPANS.span("document_ready", instance=self.name) as fields:
+            fields["ready"] = ready = wait_document_sync(ws)
+        return ready
+
+    async def resolve_class_names(self, window: Dict[str, str]) -> None:
+        """Resolve the live class names in a window, once, and use them
+
+        Args:
+            window [Dict[str, str]]: Window info
+        """
+        if self.class_names_used or not self.target_states.eligible(window):
+            return
+        dispatcher = await self.async_pool.get(window[Action.SOCKET_URL_KEY])
+        if dispatcher is None:
+            return
+        with SPANS.span("resolve_class_names", instance=self.name):
+            resolved = await self.class_names.resolve(dispatcher)
+        self.use_class_names(resolved)
+
+    def resolve_class_names_sync(self, window: Dict[str, str]) -> None:
+        """Resolve the live class names in a window, once, and use them,
+        through a synchronous connection
+
+        Args:
+            window [Dict[str, str]]: Window info
+        """
+        if self.class_names_used or not self.target_states.eligible(window):
+            return
+        ws = self.pool.get(window[Action.SOCKET_URL_KEY])
+        if ws is None:
+            return
+        with SPANS.span("resolve_class_names", instance=self.name):
+            resolved = self.class_names.resolve_sync(ws)
+        self.use_class_names(resolved)
+
+    def use_class_names(self, resolved: Optional[Dict[str, str]]) -> None:
+        """Substitute the resolved class names into every action, once
+
+        Args:
+            resolved [Optional[Dict[str, str]]]: Live class name by hashed class name, if resolved
+        """
+        if resolved is None or self.class_names_used:
+            return
+        for action in self.actions:
+            action.use_class_names(resolved)
+        self.class_names_used = True
+
+    def note_injected(self) -> None:
+        """Note the time of the first injection, and the downtime if relaunched"""
+        log = f"[{type(self).__name__}.note_injected]"
+        if self.injected_after is None and self.launched is not None:
+            self.injected_after = monotonic() - self.launched
+        if self.down_since is not None and self.restarts is not None:
+            downtime = monotonic() - self.down_since
+            self.down_since = None
+            self.restarts.recovered(downtime)
+            logger.info("%s %s back after %.3fs down", log, self.name, downtime)
+
+    def wait_ready(self) -> bool:
+        """Wait until the debug endpoint exists
+        Discord announces it on STDERR; probe the port with exponential
+        backoff in case it does not
+
+        Returns:
+            [bool]: Whether the debug endpoint is ready
+        """
+        log = f"[{type(self).__name__}.wait_ready]"
+        with SPANS.span("wait_ready", instance=self.name) as fields:
+            fields["ready"] = ready = self.poll_ready()
+        if ready and self.launched is not None:
+            self.ready_after = monotonic() - self.launched
+            logger.info("%s %s ready after %.3fs", log, self.name, self.ready_after)
+        return ready
+
+    def poll_ready(self) -> bool:
+        """Poll for the debug endpoint until it exists or times out
+
+        Returns:
+            [bool]: Whether the debug endpoint is ready
+        """
+        log = f"[{type(self).__name__}.poll_ready]"
+        delay = self.PROBE_INITIAL_DELAY
+        deadline = monotonic() + self.READY_TIMEOUT
+        while monotonic() < deadline:
+            if self.output_reader is not None and self.output_reader.ready.is_set():
+                logger.info("%s Debug endpoint announced", log)
+                return True
+            if probe_port(self.host, self.port):
+                logger.info("%s Debug port %s open", log, self.port)
+                return True
+            if self.process_exited():
+                logger.warning("%s Process terminated", log)
+                return False
+            if self.output_reader is None:
+                sleep(delay)
             else:
-                continue
-            break
-        self.process.wait()
-        if self.boot:
-            self.patch_boot()
+                self.output_reader.ready.wait(delay)
+            delay = min(delay * 2, self.PROBE_MAX_DELAY)
+        logger.warning("%s Debug endpoint not ready in %ss", log, self.READY_TIMEOUT)
+        return False
 
     def kill_running(self) -> None:
         log = f"[{type(self).__name__}.kill_running]"
-        logger.critical(f"{log} Unimplemented `kill_running`")
+        logger.critical("%s Unimplemented `kill_running`", log)
         raise NotImplementedError(
             f"Class `{type(self).__name__}` does not have `kill_running` method!"
         )
 
-    def start_program(self) -> None:
-        """Start Discord program"""
-        log = f"[{type(self).__name__}.start_program]"
+    def program_command(self) -> List[str]:
+        """Get the command to start Discord with
+
+        Returns:
+            [List[str]]: The command
+        """
         command: List[str] = [
             str(self.discord_path),
             self.DEBUG_PARAMETER.substitute(port=self.port)
         ]
         if self.minimized:
             command.append(self.MINIMIZED_PARAMETER)
-        logger.debug(f"{log} Command: `{command}`")
+        return command
+
+    def start_program(self) -> None:
+        """Start Discord program"""
+        log = f"[{type(self).__name__}.start_program]"
+        if self.command is None:
+            self.command = self.program_command()
+        logger.debug("%s Command: `%s`", log, self.command)
+        self.launched = monotonic()
         self.process = subprocess.Popen(
-            command,
+            self.command,
             stdout=subprocess.PIPE,
             stderr=subprocess.PIPE,
-            creationflags=subprocess.CREATE_NEW_PROCESS_GROUP
+            creationflags=self.CREATION_FLAGS
         )
+        self.output_reader = OutputReader(self.process)
 
     def get_info(self) -> Optional[List[Dict[str, str]]]:
         """Get window infos
@@ -204,38 +865,73 @@ class Runner:
             [Optional[List[Dict[str, str]]]]: The response JSON object, if any
         """
         log = f"[{type(self).__name__}.get_info]"
-        response = self.get_req(self.url)
+        with SPANS.span("get_info"):
+            response = self.get_req(self.url)
         if response is None:
-            logger.warn(f"{log} No response got from \"{self.url}\"")
+            logger.warning("%s No response got from \"%s\"", log, self.url)
             return
         response_obj: List[Dict[str, str]] = response.json()
         logger.debug(
-            f"{log} Got response data from \"{self.url}\": {response_obj}"
+            "%s Got response data from \"%s\": %s",
+            log, self.url, Abbreviated(response.text)
         )
         return response_obj
 
-    def get_req(self, url: str) -> Optional[requests.Response]:
+    def get_version(self) -> Optional[Dict[str, str]]:
+        """Get browser version info, which has the browser-level socket URL
+
+        Returns:
+            [Optional[Dict[str, str]]]: The response JSON object, if any
+        """
+        log = f"[{type(self).__name__}.get_version]"
+        response = self.get_req(self.version_url)
+        if response is None:
+            logger.warning("%s No response got from \"%s\"", log, self.version_url)
+            return
+        if response.status_code != 200:
+            # Endpoint is up but has no browser info
+            logger.warning("%s \"%s\" returned %s", log, self.version_url, response.status_code)
+            return {}
+        response_obj: Dict[str, str] = response.json()
+        logger.debug(
+            "%s Got response data from \"%s\": %s",
+            log, self.version_url, Abbreviated(response.text)
+        )
+        return response_obj
+
+    async def get_version_async(self) -> Optional[Dict[str, str]]:
+        """Get browser version info, preferring the announced socket URL
+
+        Returns:
+            [Optional[Dict[str, str]]]: The browser version info, if any
+        """
+        if self.output_reader is not None and self.output_reader.browser_url is not None:
+            return {TargetDiscovery.SOCKET_URL_KEY: self.output_reader.browser_url}
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, self.get_version)
+
+    def get_req(self, url: str) -> Optional[JsonResponse]:
         """GET URL, with proper error handling
 
         Args:
             url [str]: URL to GET
 
         Returns:
-            [Optional[requests.Response]]: Response object, if any
+            [Optional[JsonResponse]]: Response object, if any
         """
         log = f"[{type(self).__name__}.get_req]"
         try:
-            response = requests.get(url)
-        except requests.exceptions.ConnectionError as err:
+            response = self.http.get(url)
+        except (OSError, HTTPException) as err:
             # Possibly the program has exited
-            logger.warn(f"{log} JSON from \"{url}\" connection error {err}")
+            logger.warning("%s JSON from \"%s\" connection error %s", log, url, err)
             return
-        logger.debug(f"{log} Got response from \"{url}\": {response}")
+        logger.debug("%s Got status %s from \"%s\"", log, response.status_code, url)
         return response
 
     def patch_boot(self) -> None:
         log = f"[{type(self).__name__}.patch_boot]"
-        logger.critical(f"{log} Unimplemented `patch_boot`")
+        logger.critical("%s Unimplemented `patch_boot`", log)
         raise NotImplementedError(
             f"Class `{type(self).__name__}` does not have `patch_boot` method!"
         )
@@ -253,6 +949,7 @@ class WinRunner(Runner):
     DEFAULT_PATH_ROOT = Path(os.path.expandvars(r"%LocalAppData%"))
     DEFAULT_STABLE_PATH_PATTERN = r"Discord\*\Discord.exe"
     DEFAULT_PTB_PATH_PATTERN = r"DiscordPTB\*\DiscordPTB.exe"
+    CREATION_FLAGS = getattr(subprocess, "CREATE_NEW_PROCESS_GROUP", 0)
     BOOT_BAT_DIR = Path(__file__).parent.parent / "scripts" / "windows"
     STABLE_BOOT_BAT_PATH = BOOT_BAT_DIR / "autostartreg.bat"
     PTB_BOOT_BAT_PATH = BOOT_BAT_DIR / "autostartregPTB.bat"
@@ -261,17 +958,17 @@ class WinRunner(Runner):
         """Kill all running Discord processes"""
         log = f"[{type(self).__name__}.kill_running]"
         DISCORD_EXECUTABLE_NAME = "DiscordPTB.exe" if self.is_ptb else "Discord.exe"
-        logger.debug(f"{log} Process name: \"{DISCORD_EXECUTABLE_NAME}\"")
+        logger.debug("%s Process name: \"%s\"", log, DISCORD_EXECUTABLE_NAME)
         command = ["taskkill", "/F", "/IM", DISCORD_EXECUTABLE_NAME, "/T"]
-        logger.debug(f"{log} Command: `{command}`")
+        logger.debug("%s Command: `%s`", log, command)
         process = subprocess.Popen(
             command,
             stdout=subprocess.PIPE,
             stderr=subprocess.PIPE,
         )
         out, err = process.communicate()
-        logger.debug(f"{log} Process STDOUT: {out.strip()}")
-        logger.warn(f"{log} Process STDERR: {err.strip()}")
+        logger.debug("%s Process STDOUT: %s", log, out.strip())
+        logger.warning("%s Process STDERR: %s", log, err.strip())
 
     def patch_boot(self) -> None:
         """Patch boot"""
@@ -286,15 +983,15 @@ class WinRunner(Runner):
             if any(char != "\"" for char in [boot[0], boot[-1]]):
                 boot = f"\"{boot}\""
             command.append(boot)
-        logger.debug(f"{log} Command: `{command}`")
+        logger.debug("%s Command: `%s`", log, command)
         process = subprocess.Popen(
             command,
             stdout=subprocess.PIPE,
             stderr=subprocess.PIPE
         )
         out, err = process.communicate()
-        logger.debug(f"{log} Process STDOUT: {out.strip()}")
-        logger.warn(f"{log} Process STDERR: {err.strip()}")
+        logger.debug("%s Process STDOUT: %s", log, out.strip())
+        logger.warning("%s Process STDERR: %s", log, err.strip())
 
 
 class MacOsRunner(Runner):
@@ -304,46 +1001,47 @@ class MacOsRunner(Runner):
         """Kill all running Discord processes"""
         log = f"[{type(self).__name__}.kill_running]"
         DISCORD_EXECUTABLE_NAME = "DiscordPTB" if self.is_ptb else "Discord"
-        logger.debug(f"{log} Process name: \"{DISCORD_EXECUTABLE_NAME}\"")
+        logger.debug("%s Process name: \"%s\"", log, DISCORD_EXECUTABLE_NAME)
         command = ["pkill", "-a", DISCORD_EXECUTABLE_NAME]
-        logger.debug(f"{log} Command: `{command}`")
+        logger.debug("%s Command: `%s`", log, command)
         process = subprocess.Popen(
             command,
             stdout=subprocess.PIPE,
             stderr=subprocess.PIPE
         )
         out, err = process.communicate()
-        logger.debug(f"{log} {out.strip()}")
-        logger.warn(f"{log} {err.strip()}")
+        logger.debug("%s %s", log, out.strip())
+        logger.warning("%s %s", log, err.strip())
 
     def patch_boot(self) -> None:
         """Patch boot, not written yet"""
         log = f"[{type(self).__name__}.patch_boot]"
-        logger.warn(f"{log} Patching boot is currently unavailable on macOS")
+        logger.warning("%s Patching boot is currently unavailable on macOS", log)
         print("Patching boot is currently unavailable on macOS")
 
 
 class LinuxRunner(Runner):
-    """Special variables/functions for Linux"""
+    """Special variables/functions for Linux
+
+    Class variables:
+        KILL_TIMEOUT [float]: Seconds to wait for each of SIGTERM and SIGKILL to take effect
+    """
+
+    KILL_TIMEOUT = 5.0
 
     def kill_running(self) -> None:
-        """Kill all running Discord processes"""
+        """Kill the running processes of this Discord executable, and wait until they are gone"""
         log = f"[{type(self).__name__}.kill_running]"
-        DISCORD_EXECUTABLE_NAME = "DiscordPTB" if self.is_ptb else "Discord"
-        logger.debug(f"{log} Process name: \"{DISCORD_EXECUTABLE_NAME}\"")
-        command = ["pkill", "-a", DISCORD_EXECUTABLE_NAME]
-        logger.debug(f"{log} Command: `{command}`")
-        process = subprocess.Popen(
-            command,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE
-        )
-        out, err = process.communicate()
-        logger.debug(f"{log} {out.strip()}")
-        logger.warn(f"{log} {err.strip()}")
+        logger.debug("%s Executable: \"%s\"", log, self.discord_path)
+        pids = find_processes(self.discord_path)
+        if not pids:
+            logger.debug("%s No running instances", log)
+            return
+        logger.info("%s Terminating %s", log, pids)
+        terminate_processes(pids, self.KILL_TIMEOUT)
 
     def patch_boot(self) -> None:
         """Patch boot, not written yet"""
         log = f"[{type(self).__name__}.patch_boot]"
-        logger.warn(f"{log} Patching boot is currently unavailable on Linux")
+        logger.warning("%s Patching boot is currently unavailable on Linux", log)
         print("Patching boot is currently unavailable on Linux")
@@ -0,0 +1,211 @@
+#!/usr/bin/env python3
+"""A module that keeps the payload live in the pages for the process lifetime"""
+
+import asyncio
+import logging
+from time import monotonic
+from typing import TYPE_CHECKING, Dict, List, Optional, Set
+
+from hide_sidebars.lazy import lazy_import
+from hide_sidebars.action import Action
+from hide_sidebars.log_utils import Abbreviated
+from hide_sidebars.connection import AsyncConnectionPool, Dispatcher
+
+if TYPE_CHECKING:
+    import websockets
+else:
+    websockets = lazy_import("websockets")
+
+logger = logging.getLogger(__name__)
+
+
+class PageSupervisor:
+    """Registers the payload to run on every new document of each page,
+    and tracks the reloads
+
+    Class variables:
+        STARTED   [str]: Event name for a frame starting to load
+        NAVIGATED [str]: Event name for a frame navigated to a new document
+
+    Instance variables:
+        action       [Action]                  : Action whose payload is kept live
+        pool         [AsyncConnectionPool]     : Pool of connections to the windows
+        script_ids   [Optional[Dict[str, str]]]: Compiled script IDs by action and socket URL, if compiling once
+        identifiers  [Dict[str, str]]          : New-document script identifiers by socket URL
+        attaching    [Set[str]]                : Socket URLs being attached
+        tasks        [Dict[str, asyncio.Task]] : Reload watching tasks by socket URL
+        latencies    [List[float]]             : Seconds from each reload start to re-injection
+    """
+
+    STARTED = "Page.frameStartedLoading"
+    NAVIGATED = "Page.frameNavigated"
+
+    def __init__(
+        self,
+        action: Action,
+        pool: AsyncConnectionPool,
+        script_ids: Optional[Dict[str, str]] = None
+    ) -> None:
+        self.action = action
+        self.pool = pool
+        self.script_ids = script_ids
+        self.identifiers: Dict[str, str] = {}
+        self.attaching: Set[str] = set()
+        self.tasks: Dict[str, asyncio.Task] = {}
+        self.latencies: List[float] = []
+
+    async def attach(self, window: Dict[str, str]) -> bool:
+        """Register the payload on a window, run it now and watch for reloads
+
+        Args:
+            window [Dict[str, str]]: Window info
+
+        Returns:
+            [bool]: Whether the window is supervised
+        """
+        socket_url = window.get(Action.SOCKET_URL_KEY)
+        if socket_url is None or window["title"].lower() in Action.TITLE_BLACKLIST:
+            return False
+        if socket_url in self.tasks:
+            return True
+        if socket_url in self.attaching:
+            # Another event of the same window is being handled
+            return False
+        self.attaching.add(socket_url)
+        try:
+            return await self.register_and_run(window, socket_url)
+        finally:
+            self.attaching.discard(socket_url)
+
+    async def register_and_run(self, window: Dict[str, str], socket_url: str) -> bool:
+        """Register the payload on a window if not yet, and run it now
+
+        Args:
+            window     [Dict[str, str]]: Window info
+            socket_url [str]           : Socket URL of the window
+
+        Returns:
+            [bool]: Whether the window is supervised
+        """
+        log = f"[{type(self).__name__}.register_and_run]"
+        dispatcher = await self.pool.get(socket_url)
+        if dispatcher is None:
+            return False
+        # Subscribe first, so no reload slips by between registering and watching
+        events = dispatcher.subscribe(self.STARTED, self.NAVIGATED)
+        if socket_url not in self.identifiers:
+            try:
+                # Pipelined; neither waits for the other's round trip
+                _, response = await asyncio.gather(
+                    dispatcher.send("Page.enable", {}),
+                    dispatcher.send(
+                        "Page.addScriptToEvaluateOnNewDocument",
+                        {"source": self.action.js}
+                    )
+                )
+            except (OSError, websockets.ConnectionClosed) as err:
+                logger.warning("%s WebSocket to \"%s\" failed %s", log, socket_url, err)
+                dispatcher.unsubscribe(events)
+                await self.pool.evict(socket_url)
+                return False
+            result: Dict = response.get("result", {})
+            if "identifier" not in result:
+                logger.warning(
+                    "%s \"%s\" registration failed: %s",
+                    log, window["title"], Abbreviated(response)
+                )
+                dispatcher.unsubscribe(events)
+                return False
+            self.identifiers[socket_url] = result["identifier"]
+            logger.info("%s \"%s\" registered", log, window['title'])
+        if not await self.action.run_async(window, self.pool, self.script_ids):
+            dispatcher.unsubscribe(events)
+            return False
+        self.tasks[socket_url] = asyncio.ensure_future(self.watch(window, dispatcher, events))
+        return True
+
+    async def watch(self, window: Dict[str, str], dispatcher: Dispatcher, events: asyncio.Queue) -> None:
+        """Log every reload of a window until its socket closes
+
+        Args:
+            window     [Dict[str, str]]: Window info
+            dispatcher [Dispatcher]    : Connection to the window
+            events     [asyncio.Queue] : Queue of the page load events
+        """
+        log = f"[{type(self).__name__}.watch]"
+        socket_url = window[Action.SOCKET_URL_KEY]
+        started: Optional[float] = None
+        try:
+            while (event := await events.get()) is not None:
+                method = event.get("method")
+                if method == self.STARTED:
+                    started = monotonic()
+                elif method == self.NAVIGATED and "parentId" not in event["params"]["frame"]:
+                    # The new document has run the registered payload
+                    latency = monotonic() - started if started is not None else 0.0
+                    self.latencies.append(latency)
+                    started = None
+                    logger.info(
+                        "%s \"%s\" re-injected #%s %.1fms after reload",
+                        log, window['title'], len(self.latencies), latency * 1000
+                    )
+            logger.info("%s \"%s\" socket closed", log, window['title'])
+        finally:
+            dispatcher.unsubscribe(events)
+            self.tasks.pop(socket_url, None)
+            self.identifiers.pop(socket_url, None)
+            await self.pool.evict(socket_url)
+
+    async def reregister(self) -> None:
+        """Replace the payload registered on every window with the current one,
+        so reloads after a rebuild run the new payload"""
+        log = f"[{type(self).__name__}.reregister]"
+
+        async def replace(socket_url: str, identifier: str) -> None:
+            dispatcher = self.pool.connections.get(socket_url)
+            if dispatcher is None or not dispatcher.open:
+                return
+            try:
+                # Pipelined; the new document never runs both payloads
+                _, response = await asyncio.gather(
+                    dispatcher.send(
+                        "Page.removeScriptToEvaluateOnNewDocument",
+                        {"identifier": identifier}
+                    ),
+                    dispatcher.send(
+                        "Page.addScriptToEvaluateOnNewDocument",
+                        {"source": self.action.js}
+                    )
+                )
+            except (OSError, websockets.ConnectionClosed) as err:
+                logger.warning("%s WebSocket to \"%s\" failed %s", log, socket_url, err)
+                return
+            result: Dict = response.get("result", {})
+            if "identifier" not in result:
+                logger.warning("%s \"%s\" re-registration failed: %s", log, socket_url, Abbreviated(response))
+                self.identifiers.pop(socket_url, None)
+                return
+            self.identifiers[socket_url] = result["identifier"]
+
+        await asyncio.gather(*(
+            replace(socket_url, identifier)
+            for socket_url, identifier in list(self.identifiers.items())
+        ))
+
+    async def close(self) -> None:
+        """Stop watching all windows and log a summary"""
+        log = f"[{type(self).__name__}.close]"
+        tasks = list(self.tasks.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        if self.latencies:
+            logger.info(
+                "%s %s re-injections, mean %.1fms, max %.1fms",
+                log,
+                len(self.latencies),
+                sum(self.latencies) / len(self.latencies) * 1000,
+                max(self.latencies) * 1000
+            )
+        else:
+            logger.info("%s No re-injections", log)
@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+"""A module that tracks the state of each debugging target across polls
+Targets are keyed by target ID. Injected and ineligible targets are skipped
+before any socket is opened, and failed ones are retried with backoff
+"""
+
+import logging
+from time import monotonic
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional
+
+from hide_sidebars.action import Action
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class TargetRecord:
+    """What is known of one target
+
+    Instance variables:
+        state      [str]  : One of the states of `TargetRegistry`
+        socket_url [str]  : Socket URL of the target, when recorded
+        url        [str]  : Page URL of the target, when recorded
+        failures   [int]  : Number of failed injections in a row
+        retry_at   [float]: Time a failed target may be retried
+    """
+
+    state: str
+    socket_url: str
+    url: str
+    failures: int = 0
+    retry_at: float = 0.0
+
+
+class TargetRegistry:
+    """States of the debugging targets by target ID
+
+    Class variables:
+        INJECTING            [str]      : State of a target being injected
+        INJECTED             [str]      : State of an injected target
+        FAILED               [str]      : State of a target whose injection failed
+        INELIGIBLE           [str]      : State of a target not to be injected
+        PAGE_TYPE            [str]      : Target type of a window
+        IGNORED_URL_PREFIXES [List[str]]: URL prefixes of browser-internal pages
+        RETRY_INITIAL_DELAY  [float]    : Initial seconds before retrying a failed target
+        RETRY_MAX_DELAY      [float]    : Maximum seconds before retrying a failed target
+
+    Instance variables:
+        records [Dict[str, TargetRecord]]: Records by target ID
+    """
+
+    INJECTING = "injecting"
+    INJECTED = "injected"
+    FAILED = "failed"
+    INELIGIBLE = "ineligible"
+    PAGE_TYPE = "page"
+    IGNORED_URL_PREFIXES = ["devtools://", "chrome://", "chrome-extension://"]
+    RETRY_INITIAL_DELAY = 0.25
+    RETRY_MAX_DELAY = 5.0
+
+    def __init__(self) -> None:
+        self.records: Dict[str, TargetRecord] = {}
+
+    @staticmethod
+    def target_id(window: Dict[str, str]) -> str:
+        """Get the target ID of a window
+
+        Args:
+            window [Dict[str, str]]: Window info
+
+        Returns:
+            [str]: The target ID, or the socket URL if there is none
+        """
+        return window.get("id") or window.get(Action.SOCKET_URL_KEY, "")
+
+    @classmethod
+    def eligible(cls, window: Dict[str, str]) -> bool:
+        """Check whether a window is to be injected, without connecting to it
+
+        Args:
+            window [Dict[str, str]]: Window info
+
+        Returns:
+            [bool]: Whether the window is a page with a socket, not blacklisted and not browser-internal
+        """
+        return (
+            window.get("type", cls.PAGE_TYPE) == cls.PAGE_TYPE
+            and Action.SOCKET_URL_KEY in window
+            and window["title"].lower() not in Action.TITLE_BLACKLIST
+            and not window.get("url", "").startswith(tuple(cls.IGNORED_URL_PREFIXES))
+        )
+
+    def claim(self, window: Dict[str, str]) -> bool:
+        """Check whether a window needs work now, and mark it as being injected if so
+        A target that changed socket or page URL since it was recorded is
+        reconsidered at once
+
+        Args:
+            window [Dict[str, str]]: Window info
+
+        Returns:
+            [bool]: Whether the caller is to inject into the window
+        """
+        log = f"[{type(self).__name__}.claim]"
+        target_id = self.target_id(window)
+        socket_url = window.get(Action.SOCKET_URL_KEY, "")
+        url = window.get("url", "")
+        record = self.records.get(target_id)
+        if record is not None and record.socket_url != socket_url:
+            record = None
+        if record is not None and record.state in (self.INJECTING, self.INJECTED):
+            return False
+        if not self.eligible(window):
+            if record is None or record.state != self.INELIGIBLE:
+                logger.debug("%s \"%s\" (%s) ineligible", log, window.get("title"), target_id)
+            self.records[target_id] = TargetRecord(self.INELIGIBLE, socket_url, url)
+            return False
+        if record is not None and record.state == self.FAILED:
+            if record.url == url and monotonic() < record.retry_at:
+                return False
+            record.state = self.INJECTING
+            record.url = url
+            return True
+        self.records[target_id] = TargetRecord(self.INJECTING, socket_url, url)
+        return True
+
+    def pending(self, windows: Iterable[Dict[str, str]]) -> List[Dict[str, str]]:
+        """Get the windows that need work now out of a full `/json` list,
+        and forget the targets no longer in it
+
+        Args:
+            windows [Iterable[Dict[str, str]]]: Window infos
+
+        Returns:
+            [List[Dict[str, str]]]: The windows to inject into, each marked as being injected
+        """
+        windows = list(windows)
+        self.prune(self.target_id(window) for window in windows)
+        return [window for window in windows if self.claim(window)]
+
+    def conclude(self, window: Dict[str, str], success: bool) -> None:
+        """Record the outcome of an injection
+        Failed targets back off exponentially
+
+        Args:
+            window  [Dict[str, str]]: Window info
+            success [bool]          : Whether the injection is successful
+        """
+        log = f"[{type(self).__name__}.conclude]"
+        target_id = self.target_id(window)
+        record = self.records.get(target_id)
+        if record is None:
+            return
+        if success:
+            record.state = self.INJECTED
+            record.failures = 0
+            return
+        record.state = self.FAILED
+        record.failures += 1
+        delay = min(self.RETRY_INITIAL_DELAY * 2 ** (record.failures - 1), self.RETRY_MAX_DELAY)
+        record.retry_at = monotonic() + delay
+        logger.debug(
+            "%s \"%s\" (%s) failed %s times; retry in %.2fs",
+            log, window.get("title"), target_id, record.failures, delay
+        )
+
+    def retry_in(self, window: Dict[str, str]) -> Optional[float]:
+        """Get the seconds until a failed target may be retried
+
+        Args:
+            window [Dict[str, str]]: Window info
+
+        Returns:
+            [Optional[float]]: The seconds, or None if the target is not failed
+        """
+        record = self.records.get(self.target_id(window))
+        if record is None or record.state != self.FAILED:
+            return None
+        return max(0.0, record.retry_at - monotonic())
+
+    def forget(self, target_id: str) -> None:
+        """Drop the record of a destroyed target
+
+        Args:
+            target_id [str]: Target ID
+        """
+        self.records.pop(target_id, None)
+
+    def prune(self, target_ids: Iterable[str]) -> None:
+        """Drop the records of targets that are gone
+
+        Args:
+            target_ids [Iterable[str]]: IDs of the live targets
+        """
+        live = set(target_ids)
+        for target_id in [target_id for target_id in self.records if target_id not in live]:
+            del self.records[target_id]
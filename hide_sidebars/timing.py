@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""A module that times the phases of a run
+Each span is logged to `hide_sidebars.timing` as one JSON line
+"""
+
+import logging
+import threading
+from time import monotonic, time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List
+
+from hide_sidebars.log_utils import JsonLine
+
+logger = logging.getLogger(__name__)
+
+
+class Spans:
+    """Collector of timed spans
+
+    Instance variables:
+        durations [Dict[str, List[float]]]: Seconds of each finished span by name
+        lock      [threading.Lock]        : Guards `durations` across executor threads
+    """
+
+    def __init__(self) -> None:
+        self.durations: Dict[str, List[float]] = {}
+        self.lock = threading.Lock()
+
+    @contextmanager
+    def span(self, name: str, **fields: Any) -> Iterator[Dict[str, Any]]:
+        """Time the enclosed block
+        Works around `await` as well, since only wall time is measured
+
+        Args:
+            name   [str]: Name of the span
+            fields [Any]: Extra fields for the JSON line
+
+        Yields:
+            [Dict[str, Any]]: The extra fields, which the block may add to
+        """
+        started = monotonic()
+        ok = False
+        try:
+            yield fields
+            ok = True
+        finally:
+            duration = monotonic() - started
+            with self.lock:
+                self.durations.setdefault(name, []).append(duration)
+            logger.info("%s", JsonLine({
+                "span": name,
+                "start": round(time() - duration, 6),
+                "ms": round(duration * 1000, 3),
+                "ok": ok,
+                **fields,
+            }))
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        """Log and return the statistics of all spans
+
+        Returns:
+            [Dict[str, Dict[str, float]]]: Count, total, mean and max milliseconds by span name
+        """
+        with self.lock:
+            summary = {
+                name: {
+                    "count": len(durations),
+                    "total_ms": round(sum(durations) * 1000, 3),
+                    "mean_ms": round(sum(durations) / len(durations) * 1000, 3),
+                    "max_ms": round(max(durations) * 1000, 3),
+                }
+                for name, durations in self.durations.items()
+            }
+        logger.info("%s", JsonLine({"summary": summary}))
+        return summary
+
+
+SPANS = Spans()
@@ -0,0 +1,299 @@
+#!/usr/bin/env python3
+"""A module that records the traffic with the debug endpoint into a trace
+Every `/json` response and WebSocket frame is one compact JSON line,
+timestamped in seconds since the recording started, for
+`hide_sidebars.replay` to serve back. Lines are written by a background
+thread, and a trace path ending in `.gz` is compressed
+
+Record kinds, with their keys besides the time `t` and kind `k`:
+    http : path `p`, status `s` and body `m` of a response
+    open : connection number `c` and socket path `p` of a new connection
+    send : connection number `c` and message `m` sent to the endpoint
+    recv : connection number `c` and message `m` received from the endpoint
+    close: connection number `c`, and `r` if the endpoint closed it
+"""
+
+import json
+import gzip
+import queue
+import logging
+import threading
+from pathlib import Path
+from time import monotonic, time
+from itertools import count
+from weakref import WeakKeyDictionary
+from urllib.parse import urlsplit
+from dataclasses import dataclass, field
+from typing import IO, Any, Dict, Iterator, List, Optional, Tuple, Union
+
+logger = logging.getLogger(__name__)
+
+TRACE_VERSION = 1
+HTTP = "http"
+OPEN = "open"
+SENT = "send"
+RECEIVED = "recv"
+CLOSE = "close"
+
+Message = Union[str, bytes]
+
+
+def open_trace(path: Path, mode: str) -> IO[str]:
+    """Open a trace file as text, compressed if its name ends in `.gz`
+
+    Args:
+        path [pathlib.Path]: Path of the trace
+        mode [str]         : `r` or `w`
+
+    Returns:
+        [IO[str]]: The file
+    """
+    if path.suffix == ".gz":
+        return gzip.open(path, f"{mode}t", encoding="utf-8")
+    return path.open(mode, encoding="utf-8")
+
+
+class TraceRecorder:
+    """Records the traffic of every connection into one trace file
+    Nothing is recorded until started, and a call costs one check until then
+
+    Instance variables:
+        path    [Optional[pathlib.Path]]      : Path of the trace, once started
+        started [float]                       : Time the recording started
+        records [queue.SimpleQueue]           : Records waiting to be written; `None` stops the writer
+        writer  [Optional[threading.Thread]]  : Writing thread, once started
+        sockets [WeakKeyDictionary[Any, int]] : Connection number by socket object
+        numbers [Iterator[int]]               : Connection number counter
+        lock    [threading.Lock]              : Guards `sockets` across executor threads
+    """
+
+    def __init__(self) -> None:
+        self.path: Optional[Path] = None
+        self.started = 0.0
+        self.records: queue.SimpleQueue = queue.SimpleQueue()
+        self.writer: Optional[threading.Thread] = None
+        self.sockets: "WeakKeyDictionary[Any, int]" = WeakKeyDictionary()
+        self.numbers = count(1)
+        self.lock = threading.Lock()
+
+    @property
+    def recording(self) -> bool:
+        """Whether the traffic is being recorded"""
+        return self.writer is not None
+
+    def start(self, path: Path) -> None:
+        """Start recording into a trace file, replacing any file there
+
+        Args:
+            path [pathlib.Path]: Path of the trace
+        """
+        log = f"[{type(self).__name__}.start]"
+        if self.recording:
+            return
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self.path = path
+        self.started = monotonic()
+        self.records.put({"trace": TRACE_VERSION, "wall": round(time(), 6)})
+        self.writer = threading.Thread(target=self.write, name="trace-writer", daemon=True)
+        self.writer.start()
+        logger.info("%s Recording into \"%s\"", log, path)
+
+    def write(self) -> None:
+        """Write records until told to stop"""
+        with open_trace(self.path, "w") as file:
+            while (record := self.records.get()) is not None:
+                file.write(json.dumps(record, separators=(",", ":")))
+                file.write("\n")
+
+    def put(self, kind: str, **fields: Any) -> None:
+        """Timestamp a record and queue it for writing
+
+        Args:
+            kind   [str]: Record kind
+            fields [Any]: Other keys of the record
+        """
+        self.records.put({"t": round(monotonic() - self.started, 6), "k": kind, **fields})
+
+    def http(self, url: str, status: int, body: str) -> None:
+        """Record a response of the debug endpoint
+
+        Args:
+            url    [str]: Requested URL
+            status [int]: HTTP status
+            body   [str]: Body
+        """
+        if self.recording:
+            self.put(HTTP, p=urlsplit(url).path, s=status, m=body)
+
+    def opened(self, ws: Any, url: str) -> None:
+        """Record a new connection
+
+        Args:
+            ws  [Any]: The socket object, which later calls identify the connection by
+            url [str]: Socket URL
+        """
+        if not self.recording:
+            return
+        with self.lock:
+            number = self.sockets[ws] = next(self.numbers)
+        self.put(OPEN, c=number, p=urlsplit(url).path)
+
+    def frame(self, kind: str, ws: Any, message: Message) -> None:
+        """Record a message over a recorded connection
+
+        Args:
+            kind    [str]    : `SENT` or `RECEIVED`
+            ws      [Any]    : The socket object
+            message [Message]: The message
+        """
+        if not self.recording:
+            return
+        number = self.sockets.get(ws)
+        if number is None:
+            return
+        if isinstance(message, bytes):
+            message = message.decode("utf-8", "replace")
+        self.put(kind, c=number, m=message)
+
+    def sent(self, ws: Any, message: Message) -> None:
+        """Record a message sent to the endpoint
+
+        Args:
+            ws      [Any]    : The socket object
+            message [Message]: The message
+        """
+        self.frame(SENT, ws, message)
+
+    def received(self, ws: Any, message: Message) -> None:
+        """Record a message received from the endpoint
+
+        Args:
+            ws      [Any]    : The socket object
+            message [Message]: The message
+        """
+        self.frame(RECEIVED, ws, message)
+
+    def closed(self, ws: Any, remote: bool = False) -> None:
+        """Record the end of a connection, once
+
+        Args:
+            ws     [Any] : The socket object
+            remote [bool]: Whether the endpoint closed it
+        """
+        if not self.recording:
+            return
+        with self.lock:
+            number = self.sockets.pop(ws, None)
+        if number is None:
+            return
+        if remote:
+            self.put(CLOSE, c=number, r=1)
+        else:
+            self.put(CLOSE, c=number)
+
+    def close(self) -> None:
+        """Stop recording and flush the trace"""
+        log = f"[{type(self).__name__}.close]"
+        if self.writer is None:
+            return
+        self.records.put(None)
+        self.writer.join()
+        self.writer = None
+        logger.info("%s Trace written to \"%s\"", log, self.path)
+
+
+def lines(file: IO[str]) -> Iterator[str]:
+    """Iterate over the complete lines of a trace
+    A recording that was killed leaves its last line, or the end of its
+    compressed stream, cut short; what came before is kept
+
+    Args:
+        file [IO[str]]: The trace file
+
+    Yields:
+        [str]: Each complete line
+    """
+    log = "[lines]"
+    try:
+        for line in file:
+            if not line.endswith("\n"):
+                logger.warning("%s Last line cut short; ignored", log)
+                return
+            yield line
+    except EOFError:
+        logger.warning("%s Compressed stream cut short; the rest ignored", log)
+
+
+@dataclass
+class TraceSession:
+    """One recorded connection
+
+    Instance variables:
+        path   [str]                          : Socket path
+        opened [float]                        : Seconds into the trace the connection opened
+        frames [List[Tuple[float, str, str]]] : Time, kind and message of each frame, in order
+        closed [Optional[float]]              : Seconds into the trace the endpoint closed it, if it did
+    """
+
+    path: str
+    opened: float
+    frames: List[Tuple[float, str, str]] = field(default_factory=list)
+    closed: Optional[float] = None
+
+
+@dataclass
+class Trace:
+    """A recorded session with the debug endpoint
+
+    Instance variables:
+        responses [Dict[str, List[Tuple[float, int, str]]]]: Time, status and body of each response, by path
+        sessions  [Dict[str, List[TraceSession]]]          : Connections in order of opening, by socket path
+    """
+
+    responses: Dict[str, List[Tuple[float, int, str]]] = field(default_factory=dict)
+    sessions: Dict[str, List[TraceSession]] = field(default_factory=dict)
+
+
+def read_trace(path: Path) -> Trace:
+    """Read a trace file
+
+    Args:
+        path [pathlib.Path]: Path of the trace
+
+    Returns:
+        [Trace]: The trace
+
+    Raises:
+        [OSError]   : The file cannot be read
+        [ValueError]: The file is not a trace of this version
+    """
+    trace = Trace()
+    connections: Dict[int, TraceSession] = {}
+    with open_trace(path, "r") as file:
+        try:
+            header: Dict = json.loads(file.readline() or "{}")
+        except (ValueError, EOFError, OSError):
+            header = {}
+        if header.get("trace") != TRACE_VERSION:
+            raise ValueError(f"\"{path}\" is not a version {TRACE_VERSION} trace!")
+        for number, line in enumerate(lines(file), 2):
+            try:
+                record: Dict = json.loads(line)
+                kind = record["k"]
+                if kind == HTTP:
+                    trace.responses.setdefault(record["p"], []).append(
+                        (record["t"], record["s"], record["m"])
+                    )
+                elif kind == OPEN:
+                    session = connections[record["c"]] = TraceSession(record["p"], record["t"])
+                    trace.sessions.setdefault(session.path, []).append(session)
+                elif kind in (SENT, RECEIVED):
+                    connections[record["c"]].frames.append((record["t"], kind, record["m"]))
+                elif kind == CLOSE and record.get("r"):
+                    connections[record["c"]].closed = record["t"]
+            except (KeyError, ValueError) as err:
+                raise ValueError(f"\"{path}\":{number} is not a trace record: {err}") from None
+    return trace
+
+
+TRACE = TraceRecorder()
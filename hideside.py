@@ -1,31 +1,23 @@
 #!/usr/bin/env python3
+import atexit
 import logging
 from pathlib import Path
 
 from hide_sidebars.main import main
+from hide_sidebars.log_utils import start_logging, SPANS_LOGGER_NAME, MONITOR_LOGGER_NAME
 
 LOG_FILE = Path(__file__).resolve().parent / "logs" / "dhs.log"
+SPANS_FILE = Path(__file__).resolve().parent / "logs" / "dhs.spans.jsonl"
+MONITOR_FILE = Path(__file__).resolve().parent / "logs" / "dhs.monitor.jsonl"
 # Change this to `logging.WARN` and redact all personal information before sharing logs!
 LOG_LEVEL = logging.DEBUG
 
-# Main logger
+# Main logger, written by a background thread into rotating files
 logger = logging.getLogger("hide_sidebars")
-logger.setLevel(LOG_LEVEL)
-# Main logging file handler
-fh = logging.FileHandler(LOG_FILE, "w")
-fh.setLevel(LOG_LEVEL)
-# Main logging console handler
-# ch = logging.StreamHandler()
-# ch.setLevel(logging.ERROR)
-# Main logging formatter
-fm = logging.Formatter(
-    "%(asctime)s.%(msecs)03d %(levelname)-8s [%(name)s]: %(message)s",
-    r"%Y-%m-%d %H:%M:%S"
+listener = start_logging(
+    logger, LOG_FILE, {SPANS_LOGGER_NAME: SPANS_FILE, MONITOR_LOGGER_NAME: MONITOR_FILE}, LOG_LEVEL
 )
-fh.setFormatter(fm)
-# ch.setFormatter(fm)
-logger.addHandler(fh)
-# logger.addHandler(ch)
+atexit.register(listener.stop)
 
 if __name__ == "__main__":
     main()
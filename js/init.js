@@ -1,4 +1,6 @@
 "use strict";
+if (typeof window.discordHideSidebarTeardown === "function")
+    window.discordHideSidebarTeardown();
 var persist = undefined;
 var cache = undefined;
 var meServerName = "@me";
@@ -25,10 +27,13 @@ var buttonAttributes = {
     "tabindex": "0",
 };
 var mutationObConf = { childList: true };
+var appObConf = { childList: true, subtree: true };
 var hiddenWidth = "20px";
 var hiddenHeight = "calc(100vh - 22px)";
 var firstRunSuccess = false;
 var timeoutId = undefined;
+var hideTimeoutId = undefined;
+var restoreTimeoutId = undefined;
 var processingFlag = false;
 var preSvg = '<svg width="24" height="24" viewBox="0 0 24 24"><path fill="currentColor" d="';
 var postSvg = '"></path></svg>';
@@ -39,6 +44,7 @@ var buttonDiv = undefined;
 var sidebarOb = undefined;
 var rightsideOb = undefined;
 var combinedOb = undefined;
+var appOb = undefined;
 var animTime = 0.2;
 var animTimeMs = animTime * 1000;
 function discordHideSidebar() {
@@ -96,6 +102,7 @@ function toggleSidebar() {
 }
 function hideSide() {
     setCache("1");
+    clearTimeout(restoreTimeoutId);
     if (buttonDiv === undefined || sidebarDiv === undefined)
         return;
     buttonDiv.classList.add(hiddenClassName);
@@ -108,7 +115,7 @@ function hideSide() {
     newSidebarDiv.style.width = hiddenWidth;
     const baseDiv = sidebarDiv.parentElement.parentElement;
     const newContentDiv = document.createElement("div");
-    setTimeout(() => {
+    hideTimeoutId = setTimeout(() => {
         sidebarDiv.parentElement.insertBefore(newSidebarDiv, sidebarDiv);
         newContentDiv.appendChild(sidebarDiv);
         newContentDiv.style.position = "absolute";
@@ -117,6 +124,7 @@ function hideSide() {
         sidebarDiv.addEventListener("mouseenter", mouseEnterHandler);
         sidebarDiv.addEventListener("mouseleave", mouseLeaveHandler);
         sidebarDiv.classList.add(sidebarMarkClassName);
+        hideTimeoutId = undefined;
     }, animTimeMs);
 }
 ;
@@ -126,6 +134,10 @@ function showSide() {
         return;
     buttonDiv.classList.remove(hiddenClassName);
     buttonDiv.innerHTML = svgLeft;
+    restoreSidebar();
+}
+;
+function restoreSidebar() {
     if (!sidebarDiv.classList.contains(sidebarMarkClassName)) {
         sidebarDiv.style.width = "";
         return;
@@ -136,9 +148,10 @@ function showSide() {
         throw new ReferenceError("Invalid showSide parent");
     contentDiv.removeChild(contentDiv.firstElementChild);
     contentDiv.insertBefore(sidebarDiv, contentDiv.firstElementChild);
-    setTimeout(() => {
-        sidebarDiv.style.width = "";
-        sidebarDiv.style.height = "";
+    const restoredDiv = sidebarDiv;
+    restoreTimeoutId = setTimeout(() => {
+        restoredDiv.style.width = "";
+        restoredDiv.style.height = "";
     }, 100);
     sidebarDiv.removeEventListener("mouseenter", mouseEnterHandler);
     sidebarDiv.removeEventListener("mouseleave", mouseLeaveHandler);
@@ -273,16 +286,68 @@ function setCombinedMutationCheck() {
     combinedOb = new MutationObserver(checkRightsideMutation);
     combinedOb.observe(mutationObCombinedTarget, mutationObConf);
 }
-var sleep = (time) => new Promise((res) => setTimeout(res, time));
+function waitForApp() {
+    return new Promise((res) => {
+        discordHideSidebar();
+        if (firstRunSuccess) {
+            res();
+            return;
+        }
+        appOb = new MutationObserver(() => {
+            discordHideSidebar();
+            if (!firstRunSuccess)
+                return;
+            appOb.disconnect();
+            appOb = undefined;
+            res();
+        });
+        appOb.observe(document.documentElement, appObConf);
+    });
+}
+function teardown(handlers) {
+    for (const observer of [appOb, sidebarOb, rightsideOb, combinedOb]) {
+        if (observer !== undefined)
+            observer.disconnect();
+    }
+    appOb = sidebarOb = rightsideOb = combinedOb = undefined;
+    clearTimeout(timeoutId);
+    clearTimeout(hideTimeoutId);
+    document.removeEventListener("keydown", handlers.keyHandler);
+    document.body.classList.remove(keyMarkClassName);
+    if (sidebarDiv !== undefined) {
+        sidebarDiv.removeEventListener("mouseenter", handlers.mouseEnterHandler);
+        sidebarDiv.removeEventListener("mouseleave", handlers.mouseLeaveHandler);
+        try {
+            restoreSidebar();
+        }
+        catch (_a) {
+        }
+        clearTimeout(restoreTimeoutId);
+        sidebarDiv.style.width = "";
+        sidebarDiv.style.height = "";
+        sidebarDiv.style.transition = "";
+    }
+    if (buttonDiv !== undefined) {
+        buttonDiv.removeEventListener("click", handlers.toggleSidebar);
+        buttonDiv.remove();
+    }
+    for (const toolbar of Array.from(document.getElementsByClassName(initClassName))) {
+        toolbar.classList.remove(initClassName);
+    }
+    delete window.discordHideSidebarTeardown;
+}
+window.discordHideSidebarTeardown = teardown.bind(undefined, {
+    keyHandler,
+    toggleSidebar,
+    mouseEnterHandler,
+    mouseLeaveHandler,
+});
 (async () => {
     persist = await navigator.storage.persist();
     if (!persist)
         console.log("%cOh no no save", "color:red;font-size:96px;-webkit-text-stroke:2px yellow;");
     cache = await caches.open(hiddenClassName);
-    while (!firstRunSuccess) {
-        await sleep(1000);
-        discordHideSidebar();
-    }
+    await waitForApp();
     setSidebarMutationCheck();
     setCombinedMutationCheck();
     setRightsideMutationCheck();
@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""Tests of the class name resolution"""
+
+import json
+from pathlib import Path
+from typing import Dict, List
+
+import pytest
+
+from hide_sidebars import cache
+from hide_sidebars.class_names import ClassNameResolver, apply, choose, hashed_names, parse_version
+
+NAMES = {
+    "sidebar-2K8pFh": "sidebar",
+    "toolbar-1t6TWx": "toolbar",
+    "wrapper-1Rf91z": "wrapper",
+    "chat-3bRxxu": "chat",
+}
+
+
+def test_hashed_names_in_quotes_only() -> None:
+    js = "a.querySelector(`.${'sidebar-2K8pFh'}`); b.classList.add(\"chat-3bRxxu\"); c = not-a1b2c3"
+    assert hashed_names(js) == {"sidebar-2K8pFh": "sidebar", "chat-3bRxxu": "chat"}
+
+
+def test_parse_version() -> None:
+    assert parse_version("Mozilla/5.0 discord/1.0.9003 Chrome/91.0") == "1.0.9003"
+    assert parse_version("Mozilla/5.0 Chrome/91.0") == "Mozilla/5.0 Chrome/91.0"
+
+
+def test_choose() -> None:
+    found = {
+        "sidebar": ["sidebar-f4k3Cd"],
+        "toolbar": ["toolbar-1t6TWx", "toolbar-f4k3Ab"],
+        "wrapper": ["wrapper-f4k3Ef", "wrapper-f4k3Gh"],
+    }
+    assert choose(NAMES, found) == {
+        # The only candidate is taken
+        "sidebar-2K8pFh": "sidebar-f4k3Cd",
+        # A name still in the DOM is kept, however many candidates
+        "toolbar-1t6TWx": "toolbar-1t6TWx",
+    }
+
+
+def test_apply_keeps_quotes_and_unresolved_names() -> None:
+    js = "x('sidebar-2K8pFh', \"wrapper-1Rf91z\")"
+    assert apply(js, {"sidebar-2K8pFh": "sidebar-f4k3Cd"}) == "x('sidebar-f4k3Cd', \"wrapper-1Rf91z\")"
+
+
+def response(found: Dict[str, List[str]]) -> Dict:
+    """Make the `Runtime.evaluate` response of a DOM query"""
+    return {"id": 1, "result": {"result": {"type": "object", "value": found}}}
+
+
+@pytest.fixture
+def resolver(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> ClassNameResolver:
+    """Make a resolver of `NAMES` caching into a temporary directory"""
+    monkeypatch.setattr(cache, "cache_dir_path", tmp_path)
+    return ClassNameResolver(NAMES)
+
+
+def test_conclude_caches_resolved_and_unresolved(resolver: ClassNameResolver, tmp_path: Path) -> None:
+    resolved = resolver.conclude("1.0", {}, response({"sidebar": ["sidebar-f4k3Cd"], "chat": ["chat-3bRxxu"]}))
+    assert resolved == {"sidebar-2K8pFh": "sidebar-f4k3Cd", "chat-3bRxxu": "chat-3bRxxu"}
+    assert json.loads((tmp_path / "class_names.json").read_text(encoding="utf-8")) == {"1.0": {
+        "sidebar-2K8pFh": "sidebar-f4k3Cd",
+        "toolbar-1t6TWx": None,
+        "wrapper-1Rf91z": None,
+        "chat-3bRxxu": "chat-3bRxxu",
+    }}
+    cached = resolver.lookup("1.0")
+    assert cached == resolved
+    # Only the unresolved names are looked up again
+    unresolved = resolver.unresolved(cached)
+    assert unresolved == {"toolbar-1t6TWx": "toolbar", "wrapper-1Rf91z": "wrapper"}
+    assert '"prefixes": ["toolbar", "wrapper"]' in resolver.query_params(unresolved)["expression"]
+    resolved = resolver.conclude("1.0", cached, response({"toolbar": ["toolbar-f4k3Ab"]}))
+    assert len(resolved) == 3
+    assert resolver.unresolved(resolver.lookup("1.0")) == {"wrapper-1Rf91z": "wrapper"}
+
+
+def test_conclude_keeps_other_versions(resolver: ClassNameResolver) -> None:
+    resolver.conclude("1.0", {}, response({"chat": ["chat-3bRxxu"]}))
+    resolver.conclude("2.0", {}, response({}))
+    assert resolver.lookup("1.0") == {"chat-3bRxxu": "chat-3bRxxu"}
+    assert resolver.lookup("2.0") == {}
+
+
+def test_failed_query_is_not_cached(resolver: ClassNameResolver, tmp_path: Path) -> None:
+    assert resolver.conclude("1.0", {}, {"id": 1, "error": {"message": "gone"}}) is None
+    assert not (tmp_path / "class_names.json").exists()
+
+
+def test_unwritable_cache_still_resolves(resolver: ClassNameResolver, tmp_path: Path) -> None:
+    (tmp_path / "class_names.json").mkdir()
+    assert resolver.conclude("1.0", {}, response({"chat": ["chat-3bRxxu"]})) == {"chat-3bRxxu": "chat-3bRxxu"}
+    assert [path.name for path in tmp_path.iterdir()] == ["class_names.json"]
@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+"""Tests of the Discord executable index"""
+
+from pathlib import Path, PurePath
+
+import pytest
+
+from hide_sidebars import cache
+from hide_sidebars.executables import Version, newest_executable, parse_version, scan, watched_dir
+
+
+@pytest.mark.parametrize("path, version", [
+    ("app-1.0.9003/Discord.exe", (1, 0, 9003)),
+    ("0.0.17/modules/discord", (0, 0, 17)),
+    ("app-1.0.9003/resources/app-0.2", (0, 2)),
+    ("Discord", ()),
+])
+def test_parse_version(path: str, version: Version) -> None:
+    assert parse_version(PurePath(path)) == version
+
+
+def test_versions_order_numerically() -> None:
+    assert parse_version(PurePath("app-1.0.10")) > parse_version(PurePath("app-1.0.9"))
+    assert parse_version(PurePath("app-1.0.9")) > parse_version(PurePath("app-1.0"))
+
+
+def test_watched_dir_stops_at_first_wildcard(tmp_path: Path) -> None:
+    assert watched_dir(tmp_path, "Discord/app-*/Discord.exe") == tmp_path / "Discord"
+    assert watched_dir(tmp_path, "app-?/Discord.exe") == tmp_path
+
+
+def make_builds(root: Path, *versions: str) -> None:
+    """Make an empty executable in each `app-VERSION` directory"""
+    for version in versions:
+        (root / f"app-{version}").mkdir()
+        (root / f"app-{version}" / "Discord").touch()
+
+
+def test_scan_sorts_oldest_first(tmp_path: Path) -> None:
+    make_builds(tmp_path, "1.0.10", "1.0.9", "0.9.100")
+    assert [entry["version"] for entry in scan(tmp_path, "app-*/Discord")] == [
+        [0, 9, 100], [1, 0, 9], [1, 0, 10],
+    ]
+
+
+def test_newest_executable_through_the_index(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(cache, "cache_dir_path", tmp_path / "cache")
+    root = tmp_path / "Discord"
+    root.mkdir()
+    make_builds(root, "1.0.9", "1.0.10")
+    assert newest_executable(root, "app-*/Discord") == root / "app-1.0.10" / "Discord"
+    assert (tmp_path / "cache" / "executables.json").is_file()
+    # A new build changes the directory's mtime, which invalidates the index
+    make_builds(root, "1.0.11")
+    assert newest_executable(root, "app-*/Discord") == root / "app-1.0.11" / "Discord"
+    assert newest_executable(tmp_path / "missing", "app-*/Discord") is None
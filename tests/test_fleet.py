@@ -0,0 +1,38 @@
+#!/usr/bin/env python3
+"""Tests of the fleet endpoint parsing"""
+
+from pathlib import Path
+
+import pytest
+
+from hide_sidebars.fleet import Endpoint, parse_endpoint, read_endpoints
+
+
+@pytest.mark.parametrize("text, endpoint", [
+    ("discord-vm:9222", Endpoint("discord-vm", 9222)),
+    ("127.0.0.1:9222", Endpoint("127.0.0.1", 9222)),
+    ("[::1]:9222", Endpoint("::1", 9222)),
+    ("[fe80::1]:1", Endpoint("fe80::1", 1)),
+])
+def test_parse_endpoint(text: str, endpoint: Endpoint) -> None:
+    assert parse_endpoint(text) == endpoint
+    assert str(endpoint) == text
+
+
+@pytest.mark.parametrize("text", ["discord-vm", "discord-vm:", ":9222", "::1:9222", "host:abc", "host:99999"])
+def test_parse_endpoint_rejects(text: str) -> None:
+    with pytest.raises(ValueError):
+        parse_endpoint(text)
+
+
+def test_read_endpoints_skips_comments_and_duplicates(tmp_path: Path) -> None:
+    path = tmp_path / "endpoints.txt"
+    path.write_text("# lab\nvm1:9222  # first\n\n[::1]:9222\nvm1:9222\n", encoding="utf-8")
+    assert read_endpoints(path) == [Endpoint("vm1", 9222), Endpoint("::1", 9222)]
+
+
+def test_read_endpoints_names_the_bad_line(tmp_path: Path) -> None:
+    path = tmp_path / "endpoints.txt"
+    path.write_text("vm1:9222\nvm2\n", encoding="utf-8")
+    with pytest.raises(ValueError, match=r"endpoints\.txt:2"):
+        read_endpoints(path)
@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""Tests of the payload minifier"""
+
+from typing import List, Tuple
+
+import pytest
+
+from hide_sidebars.minify import minify, tokenize
+
+
+def kinds(js: str) -> List[Tuple[str, str]]:
+    """Get the kind and text of each token"""
+    return [(token.kind, token.text) for token in tokenize(js)]
+
+
+def test_tokenize_drops_comments_and_whitespace() -> None:
+    assert kinds("a /* block */ = // line\n 1") == [("ident", "a"), ("punct", "="), ("num", "1")]
+
+
+def test_tokenize_marks_line_breaks() -> None:
+    assert [token.newline for token in tokenize("a\n/* \n */ b c")] == [False, True, False]
+
+
+def test_tokenize_keeps_comment_markers_in_strings() -> None:
+    assert kinds("'// no' + \"/* no */\"") == [("str", "'// no'"), ("punct", "+"), ("str", "\"/* no */\"")]
+
+
+def test_tokenize_reads_nested_templates() -> None:
+    assert kinds("`a ${b + `c ${d}`} e`") == [
+        ("tpl", "`a ${"), ("ident", "b"), ("punct", "+"),
+        ("tpl", "`c ${"), ("ident", "d"), ("tpl", "}`"), ("tpl", "} e`"),
+    ]
+
+
+def test_tokenize_prefers_longest_punctuator() -> None:
+    assert kinds("a >>>= b ?? c") == [
+        ("ident", "a"), ("punct", ">>>="), ("ident", "b"), ("punct", "??"), ("ident", "c"),
+    ]
+
+
+@pytest.mark.parametrize("js", ["x = a / b / c", "x = (a) / 2", "x = a[0] / 2", "x = 1 / 2"])
+def test_slash_after_operand_is_division(js: str) -> None:
+    assert "regex" not in [kind for kind, _ in kinds(js)]
+
+
+@pytest.mark.parametrize("js, regex", [
+    ("x = /ab+c/g", "/ab+c/g"),
+    ("f(/[/]/)", "/[/]/"),
+    ("return /=/.test(y)", "/=/"),
+    ("a && /\\//.test(b)", "/\\//"),
+])
+def test_slash_after_operator_or_keyword_is_regex(js: str, regex: str) -> None:
+    assert ("regex", regex) in kinds(js)
+
+
+@pytest.mark.parametrize("js", ["'open", "`open", "/* open", "x = /open"])
+def test_tokenize_rejects_unterminated(js: str) -> None:
+    with pytest.raises(SyntaxError):
+        tokenize(js)
+
+
+def test_minify_strips_whitespace_and_comments() -> None:
+    assert minify("var a = 1 / 2 / 3; // three\n") == "var a=1/2/3;"
+
+
+def test_minify_keeps_space_between_words_and_signs() -> None:
+    assert minify("var x = a ++ + b; var y = a - -b;") == "var x=a++ +b;var y=a- -b;"
+
+
+def test_minify_keeps_line_break_after_return() -> None:
+    # `return` then a line break returns undefined; joining the lines would return 1
+    assert minify("function f() {\n  return\n  1;\n}") == "function f(){return\n1;}"
+
+
+def test_minify_keeps_line_break_before_increment() -> None:
+    # The line break binds `++` to `b`; joining the lines would bind it to `a`
+    assert minify("a\n++b") == "a\n++b"
+
+
+def test_minify_joins_lines_without_asi() -> None:
+    assert minify("x = a\n/b/g.exec(s)") == "x=a/b/g.exec(s)"
+
+
+def test_minify_renames_locals_but_not_globals() -> None:
+    assert minify(
+        "function outer(longName) { var anotherLong = longName + 1; return anotherLong; }"
+    ) == "function outer(a){var b=a+1;return b;}"
+
+
+def test_minify_keeps_properties_and_shorthands() -> None:
+    assert minify(
+        "var o = { longKey: 1 }; function g(longArg) { return { longArg, o: o.longKey }; }"
+    ) == "var o={longKey:1};function g(longArg){return{longArg,o:o.longKey};}"
@@ -0,0 +1,47 @@
+#!/usr/bin/env python3
+"""Tests of the port allocation for side-by-side builds"""
+
+import socket
+from typing import Set
+
+import pytest
+
+from hide_sidebars import orchestrator
+from hide_sidebars.orchestrator import allocate_ports
+
+
+@pytest.fixture
+def used(monkeypatch: pytest.MonkeyPatch) -> Set[int]:
+    """Pretend the ports in the returned set are in use"""
+    ports: Set[int] = set()
+    monkeypatch.setattr(orchestrator, "probe_port", lambda host, port: port in ports)
+    return ports
+
+
+def test_consecutive_when_free(used: Set[int]) -> None:
+    assert allocate_ports(9222, 3) == [9222, 9223, 9224]
+
+
+def test_skips_ports_in_use(used: Set[int]) -> None:
+    used.update({9222, 9224})
+    assert allocate_ports(9222, 3) == [9223, 9225, 9226]
+
+
+def test_keeps_ports_in_use_when_told(used: Set[int]) -> None:
+    used.update({9222, 9223})
+    assert allocate_ports(9222, 2, skip_used=False) == [9222, 9223]
+
+
+def test_runs_out_of_ports(used: Set[int]) -> None:
+    used.add(65535)
+    assert allocate_ports(65534, 1) == [65534]
+    with pytest.raises(ValueError):
+        allocate_ports(65534, 2)
+
+
+def test_probes_a_listening_socket() -> None:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        sock.listen()
+        port = sock.getsockname()[1]
+        assert port not in allocate_ports(port, 1, host="127.0.0.1")
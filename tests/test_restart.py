@@ -0,0 +1,51 @@
+#!/usr/bin/env python3
+"""Tests of the relaunch policy"""
+
+from hide_sidebars.restart import RestartPolicy
+
+
+def test_first_relaunch_is_immediate_then_backs_off() -> None:
+    policy = RestartPolicy(budget=10)
+    delays = [policy.next_delay(1.0, 1) for _ in range(9)]
+    assert delays == [0.0, 1.0, 2.0, 4.0, 8.0, 16.0, 32.0, 60.0, 60.0]
+
+
+def test_budget_is_spent_by_quick_exits() -> None:
+    policy = RestartPolicy(budget=2)
+    assert policy.next_delay(1.0, 1) == 0.0
+    assert policy.next_delay(1.0, 1) == 1.0
+    assert policy.next_delay(1.0, 1) is None
+    assert policy.restarts == 2
+
+
+def test_stable_run_resets_backoff_and_budget() -> None:
+    policy = RestartPolicy(budget=2)
+    policy.next_delay(1.0, 1)
+    policy.next_delay(1.0, 1)
+    assert policy.next_delay(RestartPolicy.STABLE_AFTER, 1) == 0.0
+    assert policy.streak == 1
+    assert policy.restarts == 3
+
+
+def test_only_failures_count_as_crashes() -> None:
+    policy = RestartPolicy()
+    for exit_code in (0, None, 1, -11):
+        policy.next_delay(RestartPolicy.STABLE_AFTER, exit_code)
+    assert policy.crashes == 2
+
+
+def test_summary_of_downtimes() -> None:
+    policy = RestartPolicy()
+    assert policy.summary("Discord")["downtime_mean"] == 0.0
+    policy.next_delay(1.0, 1)
+    policy.recovered(1.0)
+    policy.next_delay(1.0, 0)
+    policy.recovered(2.0)
+    assert policy.summary("Discord") == {
+        "restarts": 2,
+        "crashes": 1,
+        "recovered": 2,
+        "downtime_total": 3.0,
+        "downtime_mean": 1.5,
+        "downtime_max": 2.0,
+    }
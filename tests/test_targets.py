@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""Tests of the target state registry"""
+
+from typing import Dict, List
+
+import pytest
+
+from hide_sidebars import targets
+from hide_sidebars.targets import TargetRegistry
+
+
+def window(target_id: str = "A", **fields: str) -> Dict[str, str]:
+    """Make a window info as `/json` lists it"""
+    return {
+        "id": target_id,
+        "type": "page",
+        "title": "Discord",
+        "url": "https://discord.com/channels/@me",
+        "webSocketDebuggerUrl": f"ws://127.0.0.1:9222/devtools/page/{target_id}",
+        **fields,
+    }
+
+
+@pytest.fixture
+def clock(monkeypatch: pytest.MonkeyPatch) -> List[float]:
+    """Freeze the registry's clock; set `clock[0]` to move it"""
+    now = [100.0]
+    monkeypatch.setattr(targets, "monotonic", lambda: now[0])
+    return now
+
+
+def test_claim_once_until_concluded() -> None:
+    registry = TargetRegistry()
+    assert registry.claim(window())
+    assert registry.records["A"].state == TargetRegistry.INJECTING
+    assert not registry.claim(window())
+
+
+def test_injected_is_skipped() -> None:
+    registry = TargetRegistry()
+    registry.claim(window())
+    registry.conclude(window(), True)
+    assert registry.records["A"].state == TargetRegistry.INJECTED
+    assert not registry.claim(window())
+    assert registry.retry_in(window()) is None
+
+
+@pytest.mark.parametrize("fields", [
+    {"type": "service_worker"},
+    {"title": "Discord Updater"},
+    {"url": "devtools://devtools/bundled/inspector.html"},
+])
+def test_ineligible_is_never_claimed(fields: Dict[str, str]) -> None:
+    registry = TargetRegistry()
+    assert not registry.claim(window(**fields))
+    assert registry.records["A"].state == TargetRegistry.INELIGIBLE
+
+
+def test_failed_backs_off_exponentially(clock: List[float]) -> None:
+    registry = TargetRegistry()
+    delays = []
+    for _ in range(7):
+        assert registry.claim(window())
+        registry.conclude(window(), False)
+        delays.append(registry.retry_in(window()))
+        assert not registry.claim(window())
+        clock[0] = registry.records["A"].retry_at
+    assert delays == [0.25, 0.5, 1.0, 2.0, 4.0, 5.0, 5.0]
+
+
+def test_failed_is_retried_at_once_on_navigation(clock: List[float]) -> None:
+    registry = TargetRegistry()
+    registry.claim(window())
+    registry.conclude(window(), False)
+    assert registry.claim(window(url="https://discord.com/channels/1/2"))
+
+
+def test_new_socket_resets_the_record(clock: List[float]) -> None:
+    registry = TargetRegistry()
+    registry.claim(window())
+    registry.conclude(window(), False)
+    registry.conclude(window(), False)
+    assert registry.claim(window(webSocketDebuggerUrl="ws://127.0.0.1:9222/devtools/page/B"))
+    assert registry.records["A"].failures == 0
+
+
+def test_success_resets_failures(clock: List[float]) -> None:
+    registry = TargetRegistry()
+    registry.claim(window())
+    registry.conclude(window(), False)
+    clock[0] += 1
+    registry.claim(window())
+    registry.conclude(window(), True)
+    assert registry.records["A"].failures == 0
+
+
+def test_pending_prunes_gone_targets() -> None:
+    registry = TargetRegistry()
+    assert registry.pending([window("A"), window("B")]) == [window("A"), window("B")]
+    registry.conclude(window("A"), True)
+    assert registry.pending([window("A"), window("C")]) == [window("C")]
+    assert set(registry.records) == {"A", "C"}
+
+
+def test_forget_allows_reclaim() -> None:
+    registry = TargetRegistry()
+    registry.claim(window())
+    registry.conclude(window(), True)
+    registry.forget("A")
+    assert registry.claim(window())
@@ -5,6 +5,14 @@ interface HTMLCollectionOf<T extends Element> {
     [Symbol.iterator](): Iterator<T>;
 }
 
+// Teardown of the current injection, for a later injection to call
+interface Window {
+    discordHideSidebarTeardown?: () => void;
+}
+
+// Tear down an earlier injection first; its variables still hold its state here
+if (typeof window.discordHideSidebarTeardown === "function") window.discordHideSidebarTeardown();
+
 // Whether `Cache` allows persistent storage
 var persist: boolean | undefined = undefined;
 // Use `Cache` because `localStorage` does not exist
@@ -40,11 +48,14 @@ var buttonAttributes = {                    // Attributes for the button
 };
 
 var mutationObConf = { childList: true };   // MutationObserver config
+var appObConf = { childList: true, subtree: true };  // MutationObserver config while the app loads
 var hiddenWidth = "20px";                   // Width for hidden sidebar
 var hiddenHeight = "calc(100vh - 22px)";    // Height for hidden sidebar, has to specify due to absolute position
 
 var firstRunSuccess = false;                // Whether first run is successful
 var timeoutId: number | undefined = undefined;  // ID of MouseEnter setTimeOut
+var hideTimeoutId: number | undefined = undefined;      // ID of hideSide setTimeOut
+var restoreTimeoutId: number | undefined = undefined;   // ID of restoreSidebar setTimeOut
 var processingFlag = false;                 // Whether an action is being processed
 
 var preSvg = '<svg width="24" height="24" viewBox="0 0 24 24"><path fill="currentColor" d="';
@@ -58,6 +69,7 @@ var buttonDiv: HTMLDivElement | undefined = undefined;      // The div that cont
 var sidebarOb: MutationObserver | undefined = undefined;    // Sidebar mutation observer
 var rightsideOb: MutationObserver | undefined = undefined;  // Right side mutation observer
 var combinedOb: MutationObserver | undefined = undefined;   // Combined div mutation observer
+var appOb: MutationObserver | undefined = undefined;        // Mutation observer while the app loads
 
 var animTime = 0.2;                 // Animation time in seconds
 var animTimeMs = animTime * 1000;   // Animation time in milliseconds
@@ -136,6 +148,7 @@ function toggleSidebar(): void {
  */
 function hideSide(): void {
     setCache("1");
+    clearTimeout(restoreTimeoutId);
     if (buttonDiv === undefined || sidebarDiv === undefined) return;
     buttonDiv.classList.add(hiddenClassName);
     buttonDiv.innerHTML = svgRight;
@@ -146,7 +159,7 @@ function hideSide(): void {
     newSidebarDiv.style.width = hiddenWidth;
     const baseDiv = <HTMLDivElement>sidebarDiv.parentElement!.parentElement!;
     const newContentDiv = document.createElement("div");
-    setTimeout((): void => {
+    hideTimeoutId = setTimeout((): void => {
         sidebarDiv!.parentElement!.insertBefore(newSidebarDiv, sidebarDiv!);
         newContentDiv.appendChild(sidebarDiv!);
         newContentDiv.style.position = "absolute";
@@ -155,6 +168,7 @@ function hideSide(): void {
         sidebarDiv!.addEventListener("mouseenter", mouseEnterHandler);
         sidebarDiv!.addEventListener("mouseleave", mouseLeaveHandler);
         sidebarDiv!.classList.add(sidebarMarkClassName);
+        hideTimeoutId = undefined;
     }, animTimeMs);
 };
 
@@ -167,18 +181,28 @@ function showSide(): void {
     if (buttonDiv === undefined || sidebarDiv === undefined) return;
     buttonDiv.classList.remove(hiddenClassName);
     buttonDiv.innerHTML = svgLeft;
-    if (!sidebarDiv.classList.contains(sidebarMarkClassName)) {
-        sidebarDiv.style.width = "";
+    restoreSidebar();
+};
+
+/**
+ * Put the sidebar back in place
+ * @throws {ReferenceError} The window does not have the element of interest
+ */
+function restoreSidebar(): void {
+    if (!sidebarDiv!.classList.contains(sidebarMarkClassName)) {
+        sidebarDiv!.style.width = "";
         return;
     }
-    const baseDiv = <HTMLDivElement>sidebarDiv.parentElement!.parentElement!;
+    const baseDiv = <HTMLDivElement>sidebarDiv!.parentElement!.parentElement!;
     const contentDiv = <HTMLDivElement>baseDiv.children[baseDiv.childElementCount - 2];
     if (contentDiv.childElementCount !== 2) throw new ReferenceError("Invalid showSide parent");
     contentDiv.removeChild(contentDiv.firstElementChild!);
     contentDiv.insertBefore(sidebarDiv!, contentDiv.firstElementChild);
-    setTimeout((): void => {
-        sidebarDiv!.style.width = "";
-        sidebarDiv!.style.height = "";
+    // The sidebar may be replaced before this fires
+    const restoredDiv = sidebarDiv!;
+    restoreTimeoutId = setTimeout((): void => {
+        restoredDiv.style.width = "";
+        restoredDiv.style.height = "";
     }, 100);
     sidebarDiv!.removeEventListener("mouseenter", mouseEnterHandler);
     sidebarDiv!.removeEventListener("mouseleave", mouseLeaveHandler);
@@ -390,10 +414,77 @@ function setCombinedMutationCheck(): void {
 }
 
 /**
- * Pause for certain time
- * @param {number} time Time to pause in milliseconds
+ * Wait until the first run succeeds, retrying on every DOM change
+ *   Mutation observers fire before the next paint, so this succeeds within a
+ *   frame of the toolbar appearing
+ */
+function waitForApp(): Promise<void> {
+    return new Promise((res): void => {
+        discordHideSidebar();
+        if (firstRunSuccess) {
+            res();
+            return;
+        }
+        appOb = new MutationObserver((): void => {
+            discordHideSidebar();
+            if (!firstRunSuccess) return;
+            appOb!.disconnect();
+            appOb = undefined;
+            res();
+        });
+        appOb.observe(document.documentElement, appObConf);
+    });
+}
+
+/**
+ * Undo this injection: disconnect its observers, remove its listeners and
+ *   button, and put the sidebar back
+ * @param handlers The event handlers of this injection
  */
-var sleep = (time: number): Promise<void> => new Promise((res): number => setTimeout(res, time));
+function teardown(handlers: {
+    keyHandler: (ev: KeyboardEvent) => void,
+    toggleSidebar: () => void,
+    mouseEnterHandler: (ev: MouseEvent) => void,
+    mouseLeaveHandler: (ev: MouseEvent) => void,
+}): void {
+    for (const observer of [appOb, sidebarOb, rightsideOb, combinedOb]) {
+        if (observer !== undefined) observer.disconnect();
+    }
+    appOb = sidebarOb = rightsideOb = combinedOb = undefined;
+    clearTimeout(timeoutId);
+    clearTimeout(hideTimeoutId);
+    document.removeEventListener("keydown", handlers.keyHandler);
+    document.body.classList.remove(keyMarkClassName);
+    if (sidebarDiv !== undefined) {
+        sidebarDiv.removeEventListener("mouseenter", handlers.mouseEnterHandler);
+        sidebarDiv.removeEventListener("mouseleave", handlers.mouseLeaveHandler);
+        try {
+            restoreSidebar();
+        } catch {
+            // The page has moved on; Discord re-renders the sidebar anyway
+        }
+        clearTimeout(restoreTimeoutId);
+        sidebarDiv.style.width = "";
+        sidebarDiv.style.height = "";
+        sidebarDiv.style.transition = "";
+    }
+    if (buttonDiv !== undefined) {
+        buttonDiv.removeEventListener("click", handlers.toggleSidebar);
+        buttonDiv.remove();
+    }
+    for (const toolbar of Array.from(document.getElementsByClassName(initClassName))) {
+        toolbar.classList.remove(initClassName);
+    }
+    delete window.discordHideSidebarTeardown;
+}
+
+// Bound to this injection's handlers, which a later injection redeclares
+window.discordHideSidebarTeardown = teardown.bind(undefined, {
+    keyHandler,
+    toggleSidebar,
+    mouseEnterHandler,
+    mouseLeaveHandler,
+});
 
 // Initialization
 (async (): Promise<void> => {
@@ -403,10 +494,7 @@ var sleep = (time: number): Promise<void> => new Promise((res): number => setTim
     // Make the cache object
     cache = await caches.open(hiddenClassName);
     // First run
-    while (!firstRunSuccess) {
-        await sleep(1000);
-        discordHideSidebar();
-    }
+    await waitForApp();
     setSidebarMutationCheck();
     setCombinedMutationCheck();
     setRightsideMutationCheck();